@@ -1,3 +1,16 @@
-from importlib.metadata import version
+import functools
 
-__version__ = version("askcc")
+
+@functools.cache
+def _resolve_version() -> str:
+    from importlib.metadata import version  # noqa: PLC0415
+
+    return version("askcc")
+
+
+def __getattr__(name: str) -> str:
+    # resolved lazily: importlib.metadata is one of the slowest imports on the CLI startup path
+    if name == "__version__":
+        return _resolve_version()
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
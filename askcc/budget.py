@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import logging
+from dataclasses import dataclass
+from itertools import chain, zip_longest
+from typing import TYPE_CHECKING
+
+from .functions import filter_comments, format_issue_content, format_references, iter_comment_sections
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from .definitions import CommentFilter, GithubIssue, IssueComment
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4  # rough average for English text and code, good enough for budgeting
+COMMENT_SEPARATOR = "\n---\n"
+TRIMMED_MARKER = "[... {count} comment(s) trimmed to fit the prompt budget ...]"
+MARKER_TOKENS = len(TRIMMED_MARKER) // CHARS_PER_TOKEN + 1
+MAX_LISTED_DROPPED = 10
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheaply estimate the number of tokens in a text."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+@dataclass(frozen=True)
+class BudgetReport:
+    max_tokens: int
+    original_tokens: int
+    final_tokens: int
+    kept_comments: int
+    dropped: tuple[IssueComment, ...] = ()
+
+    def summary(self) -> str:
+        summary = (
+            f"~{self.final_tokens} of ~{self.original_tokens} issue token(s) kept (limit {self.max_tokens}), "
+            f"{self.kept_comments} comment(s) kept, {len(self.dropped)} trimmed"
+        )
+        if self.dropped:
+            listed = [
+                f"@{comment.author} {comment.created_at}".strip() for comment in self.dropped[:MAX_LISTED_DROPPED]
+            ]
+            if len(self.dropped) > MAX_LISTED_DROPPED:
+                listed.append(f"and {len(self.dropped) - MAX_LISTED_DROPPED} more")
+            summary += ": " + ", ".join(listed)
+        return summary
+
+
+def _priority_order(comments: Sequence[IssueComment]) -> list[int]:
+    """Return comment indexes alternating between the newest and the most-reacted comments."""
+    newest = sorted(range(len(comments)), key=lambda i: (comments[i].created_at, i), reverse=True)
+    most_reacted = sorted(newest, key=lambda i: comments[i].reactions, reverse=True)
+    order = dict.fromkeys(
+        index for index in chain.from_iterable(zip_longest(newest, most_reacted)) if index is not None
+    )
+    return list(order)
+
+
+def budget_issue_content(
+    issue: GithubIssue, *, max_tokens: int, comment_filter: CommentFilter | None = None
+) -> tuple[str, BudgetReport]:
+    """
+    Combine the issue into a single string that fits in roughly `max_tokens`.
+
+    The issue body and the summaries of referenced issues are always kept. Comments are kept newest and
+    most-reacted first, and each run of dropped comments is collapsed into a single trimmed-section marker.
+    """
+    comments = list(filter_comments(issue.comments, comment_filter) if comment_filter else issue.comments)
+    sections = list(iter_comment_sections(comments))
+    content = format_issue_content(issue, comment_filter)
+    original_tokens = estimate_tokens(content)
+    if original_tokens <= max_tokens or not comments:
+        return content, BudgetReport(max_tokens, original_tokens, original_tokens, len(comments))
+
+    issue_text = f"{issue.title}\n{issue.body}".strip()
+    header = f"Issue #{issue.number}:\n{issue_text}\n\nComments:\n"
+    footer = f"\n\n{format_references(issue.references)}" if issue.references else ""
+    remaining = max_tokens - estimate_tokens(header + footer)
+    if remaining < 0:
+        logger.warning("Issue #%d body alone exceeds the prompt budget of %d token(s)", issue.number, max_tokens)
+    kept: set[int] = set()
+    for index in _priority_order(comments):
+        # each kept comment may split a run of dropped comments, so reserve room for one more marker
+        cost = estimate_tokens(sections[index] + COMMENT_SEPARATOR) + MARKER_TOKENS
+        if cost <= remaining - MARKER_TOKENS:
+            kept.add(index)
+            remaining -= cost
+
+    parts = []
+    dropped_run = 0
+    for index, section in enumerate(sections):
+        if index not in kept:
+            dropped_run += 1
+            continue
+        if dropped_run:
+            parts.append(TRIMMED_MARKER.format(count=dropped_run))
+            dropped_run = 0
+        parts.append(section)
+    if dropped_run:
+        parts.append(TRIMMED_MARKER.format(count=dropped_run))
+
+    content = header + COMMENT_SEPARATOR.join(parts) + footer
+    dropped = tuple(comment for index, comment in enumerate(comments) if index not in kept)
+    return content, BudgetReport(max_tokens, original_tokens, estimate_tokens(content), len(kept), dropped)
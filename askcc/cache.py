@@ -0,0 +1,210 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+from .definitions import GithubIssue, IssueComment
+from .settings import CACHE_DIR, ISSUE_CACHE_MAX_BYTES, ISSUE_MEMORY_CACHE_ENTRIES, RESULT_CACHE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class CachedIssue:
+    issue: GithubIssue
+    etag: str
+    engine: str = ""  # the ISSUE_FETCH_ENGINES entry that fetched it, only "graphql" records is_minimized
+
+
+def _issue_from_dict(data: dict) -> GithubIssue:
+    return GithubIssue(
+        **{
+            **data,
+            "labels": tuple(data.get("labels", ())),
+            "comments": tuple(IssueComment(**comment) for comment in data.get("comments", ())),
+            "references": (),
+        }
+    )
+
+
+class _MemoryCache:
+    """
+    In-process LRU of cache entries read from disk, keyed by path.
+
+    An entry is only returned while the file it was read from is still in place: a put by another process
+    replaces the file (a new inode) and eviction removes it, either way the entry is read from disk again.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._entries: OrderedDict[Path, tuple[tuple[int, int], CachedIssue]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, path: Path) -> CachedIssue | None:
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry is None:
+            return None
+        identity, cached = entry
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            stat = None
+        with self._lock:
+            if stat is None or (stat.st_ino, stat.st_size) != identity:
+                self._entries.pop(path, None)
+                return None
+            self._entries.move_to_end(path)
+        return cached
+
+    def put(self, path: Path, identity: tuple[int, int], cached: CachedIssue) -> None:
+        with self._lock:
+            self._entries[path] = (identity, cached)
+            self._entries.move_to_end(path)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+_memory_cache: _MemoryCache | None = None
+
+
+def enable_memory_cache(max_entries: int = ISSUE_MEMORY_CACHE_ENTRIES) -> None:
+    """Keep up to `max_entries` issues in memory in front of the on-disk IssueCache, for long-running processes."""
+    global _memory_cache  # noqa: PLW0603
+    _memory_cache = _MemoryCache(max_entries) if max_entries > 0 else None
+
+
+class IssueCache:
+    """On-disk cache of fetched issues keyed by (owner, repo, number), evicted least-recently-used first."""
+
+    def __init__(self, directory: Path | None = None, max_bytes: int = ISSUE_CACHE_MAX_BYTES) -> None:
+        self.directory = (directory or CACHE_DIR) / "issues"
+        self.max_bytes = max_bytes
+
+    def _path(self, owner: str, repo: str, issue_number: int) -> Path:
+        return self.directory / owner.lower() / repo.lower() / f"{issue_number}.json"
+
+    def get(self, owner: str, repo: str, issue_number: int) -> CachedIssue | None:
+        """Return the cached issue, or None if it is missing or unreadable."""
+        path = self._path(owner, repo, issue_number)
+        cached = _memory_cache.get(path) if _memory_cache else None
+        if cached is None:
+            try:
+                stat = path.stat()  # before reading, a concurrent replacement is then detected by the next get
+                data = json.loads(path.read_text())
+                cached = CachedIssue(
+                    issue=_issue_from_dict(data["issue"]), etag=data["etag"], engine=data.get("engine", "")
+                )
+            except FileNotFoundError:
+                return None
+            except (KeyError, TypeError, ValueError):
+                logger.warning("Ignoring corrupt cache entry: %s", path)
+                return None
+            if _memory_cache:
+                _memory_cache.put(path, (stat.st_ino, stat.st_size), cached)
+        _mark_used(path)
+        return cached
+
+    def put(self, issue: GithubIssue, etag: str, engine: str = "") -> None:
+        """Store an issue with its ETag and fetch engine, then evict old entries if the cache exceeds max_bytes."""
+        path = self._path(issue.owner, issue.repo, issue.number)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"etag": etag, "engine": engine, "updated_at": issue.updated_at, "issue": asdict(issue)}
+        write_atomically(path, json.dumps(entry))
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least-recently-used entries until the cache fits in max_bytes."""
+        _evict_least_recently_used(self.directory, self.max_bytes)
+
+
+def write_atomically(path: Path, payload: str) -> None:
+    """Replace `path` with `payload` through a temporary file, keeping its permissions if it exists."""
+    # concurrent readers never see a partial entry
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, suffix=".tmp", delete=False) as f:
+        f.write(payload)
+    with contextlib.suppress(FileNotFoundError):
+        Path(f.name).chmod(path.stat().st_mode & 0o7777)
+    Path(f.name).replace(path)
+
+
+def _mark_used(path: Path) -> None:
+    """Update the mtime, which doubles as the LRU access time, unless the entry was evicted since it was read."""
+    # unlike touch(), utime never recreates a concurrently evicted entry as an empty file
+    with contextlib.suppress(FileNotFoundError):
+        os.utime(path)
+
+
+def _evict_least_recently_used(directory: Path, max_bytes: int) -> None:
+    """Remove the least recently used (oldest mtime) entries under `directory` until they fit in max_bytes."""
+    entries = []
+    for path in directory.rglob("*.json"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total_bytes = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_bytes <= max_bytes:
+            break
+        try:
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        total_bytes -= size
+        logger.debug("Evicted cache entry %s", path)
+
+
+@dataclass(frozen=True)
+class CachedResult:
+    exit_code: int
+    output: str
+    created_at: float = 0.0
+
+
+def result_key(agent_name: str, system_prompt: str, prompt: str, head: str | None) -> str:
+    """Hash everything that determines a claude run's result: the agent, both prompts and the checked out commit."""
+    return hashlib.sha256(json.dumps([agent_name, system_prompt, prompt, head or ""]).encode()).hexdigest()
+
+
+class ResultCache:
+    """On-disk store of claude results keyed by `result_key()`, evicted least-recently-used first."""
+
+    def __init__(self, directory: Path | None = None, max_bytes: int = RESULT_CACHE_MAX_BYTES) -> None:
+        self.directory = (directory or CACHE_DIR) / "results"
+        self.max_bytes = max_bytes
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def get(self, key: str) -> CachedResult | None:
+        """Return the stored result, or None if it is missing or unreadable."""
+        path = self._path(key)
+        try:
+            cached = CachedResult(**json.loads(path.read_text()))
+        except FileNotFoundError:
+            return None
+        except (TypeError, ValueError):
+            logger.warning("Ignoring corrupt cache entry: %s", path)
+            return None
+        _mark_used(path)
+        return cached
+
+    def put(self, key: str, exit_code: int, output: str) -> None:
+        """Store a result, then evict old entries if the store exceeds max_bytes."""
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_atomically(path, json.dumps(asdict(CachedResult(exit_code, output, time.time()))))
+        self.evict()
+
+    def evict(self) -> None:
+        """Remove least-recently-used entries until the store fits in max_bytes."""
+        _evict_least_recently_used(self.directory, self.max_bytes)
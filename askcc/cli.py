@@ -1,54 +1,122 @@
 import argparse
-import json
 import logging
-import subprocess
 import sys
+from datetime import datetime
 from pathlib import Path
-from string import Template
 
-from . import __version__
-from .definitions import AgentConfig, AgentType
-from .functions import bootstrap_templates, fetch_github_issue, install_skills, load_agent_config
-from .settings import configure_logging
+from .definitions import (
+    AGENT_CONFIGS,
+    DEFAULT_BATCH_JOBS,
+    DEFAULT_HISTORY_LIMIT,
+    DEFAULT_MAX_PROMPT_TOKENS,
+    SINCE_AUTO,
+    AgentConfig,
+    AgentType,
+    BatchResult,
+    CommentFilter,
+    FetchOptions,
+    JobRequest,
+)
+from .settings import METRICS_PATH, SOCKET_PATH, configure_logging
 
 logger = logging.getLogger(__name__)
 
 DEFAULT_PERMISSION_MODE = "acceptEdits"
 
 
-def _run_claude(prompt: str, config: AgentConfig, *, cwd: Path | None = None) -> int:
-    """Run claude CLI with the given prompt, streaming output to stdout/stderr."""
-    agent_definition = {config.agent_name: {"description": config.description, "prompt": config.system_prompt}}
+class _VersionAction(argparse.Action):
+    """Print the package version, resolving it from the installed metadata only when requested."""
 
-    cmd = [
-        "claude",
-        "-p",
-        prompt,
-        "--output-format",
-        "text",
-        "--dangerously-skip-permissions",
-        "--agents",
-        json.dumps(agent_definition),
-    ]
+    def __init__(self, option_strings: list[str], dest: str = argparse.SUPPRESS, **kwargs) -> None:
+        super().__init__(option_strings, dest, nargs=0, default=argparse.SUPPRESS, **kwargs)
 
-    logger.info("Requesting '%s' from Claude Code ...", config.agent_name)
-    result = subprocess.run(  # noqa: S603
-        cmd,
-        text=True,
-        check=False,
-        cwd=cwd,
+    def __call__(self, parser: argparse.ArgumentParser, *_args: object, **_kwargs: object) -> None:
+        from . import __version__  # noqa: PLC0415
+
+        parser.exit(message=f"askcc {__version__}\n")
+
+
+def _iso_timestamp(value: str) -> str:
+    try:
+        datetime.fromisoformat(value)
+    except ValueError:
+        msg = f"invalid ISO 8601 timestamp: {value!r}"
+        raise argparse.ArgumentTypeError(msg) from None
+    return value
+
+
+def _reference_depth(value: str) -> int:
+    depth = value.removeprefix("depth=")
+    if not depth.isdigit() or int(depth) < 1:
+        msg = f"invalid reference depth: {value!r}, expected depth=N with N >= 1"
+        raise argparse.ArgumentTypeError(msg)
+    return int(depth)
+
+
+def _since(value: str) -> str:
+    return value if value == SINCE_AUTO else _iso_timestamp(value)
+
+
+def _add_issue_source(subparser: argparse.ArgumentParser, action: str) -> None:
+    """Add the options selecting the issues an agent command runs on: one issue URL or a repository sweep."""
+    source = subparser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--github-issue-url", help=f"GitHub issue URL to {action}.")
+    source.add_argument("--repo", help=f"Sweep the open issues of an owner/name repository and {action} each one.")
+    subparser.add_argument(
+        "--label",
+        action="append",
+        default=[],
+        help="Only sweep issues with this label, repeat to require several (--repo only).",
+    )
+    subparser.add_argument(
+        "--since",
+        type=_since,
+        default=None,
+        help=(
+            "Only sweep issues updated since this ISO 8601 timestamp, or 'auto' to continue from the last "
+            "sweep of this repository with this agent (--repo only)."
+        ),
+    )
+    subparser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_BATCH_JOBS,
+        help=f"Maximum number of issues processed concurrently (--repo only, default: {DEFAULT_BATCH_JOBS}).",
     )
-    logger.info("Claude Code finished (exit code: %d)", result.returncode)
-    return result.returncode
 
 
-def main() -> None:
-    configure_logging()
+def _agent_list(value: str) -> list[AgentType]:
+    try:
+        return [AgentType(name.strip()) for name in value.split(",") if name.strip()]
+    except ValueError:
+        msg = f"invalid agent list: {value!r} (choose from {', '.join(AgentType)})"
+        raise argparse.ArgumentTypeError(msg) from None
+
+
+def _add_history_parser(subparsers: argparse._SubParsersAction) -> None:
+    history_parser = subparsers.add_parser("history", help="List past claude runs, or print the output of one.")
+    history_parser.add_argument(
+        "run_id", nargs="?", help="Print the archived output of this run (a unique prefix of its id is enough)."
+    )
+    history_parser.add_argument(
+        "--agent", choices=[agent.value for agent in AgentType], help="Only list runs of this agent."
+    )
+    history_parser.add_argument("--github-issue-url", help="Only list runs on this GitHub issue.")
+    history_parser.add_argument(
+        "--limit", type=int, default=DEFAULT_HISTORY_LIMIT, help=f"Runs to list (default: {DEFAULT_HISTORY_LIMIT})."
+    )
+    history_parser.add_argument("--stderr", action="store_true", help="Print the run's stderr instead of its stdout.")
+    history_parser.add_argument(
+        "--prune", action="store_true", help="Delete the runs beyond the archive's size and age limits now."
+    )
+
+
+def _build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(description="A one-shot Claude Code CLI executor.")
     parser.add_argument(
         "--version",
-        action="version",
-        version=f"askcc {__version__}",
+        action=_VersionAction,
+        help="Show the askcc version and exit.",
     )
 
     parser.add_argument(
@@ -57,25 +125,91 @@ def main() -> None:
         default=None,
         help="Working directory for the claude subprocess (defaults to current directory).",
     )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream claude's output as stream-json events, logging tool calls and token usage per run.",
+    )
+    parser.add_argument(
+        "--metrics-file",
+        type=Path,
+        default=METRICS_PATH,
+        help="Append timing spans of each phase to this JSON-lines file (default: $ASKCC_METRICS, unset disables).",
+    )
+
+    # options shared by every command that fetches issues
+    fetch_parser = argparse.ArgumentParser(add_help=False)
+    fetch_parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Do not read or write the on-disk issue cache, and do not replay stored results (implies --force).",
+    )
+    fetch_parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="Ignore cached issues and fetch them again (the cache is still updated).",
+    )
+    fetch_parser.add_argument("--skip-bots", action="store_true", help="Leave out comments written by bots.")
+    fetch_parser.add_argument(
+        "--skip-minimized", action="store_true", help="Leave out comments hidden (minimized) on GitHub."
+    )
+    fetch_parser.add_argument(
+        "--comments-since",
+        type=_iso_timestamp,
+        default=None,
+        help="Leave out comments created before this ISO 8601 timestamp (e.g. 2026-01-31 or 2026-01-31T12:00:00Z).",
+    )
+    fetch_parser.add_argument(
+        "--with-references",
+        type=_reference_depth,
+        nargs="?",
+        const=1,
+        default=0,
+        metavar="depth=N",
+        help=(
+            "Also fetch the issues and pull requests the issue references, N references deep (default: 1), "
+            "and add a summary of each to the prompt."
+        ),
+    )
+    fetch_parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Run claude even if a result stored for the same prompts and commit could be replayed.",
+    )
+    fetch_parser.add_argument(
+        "--max-prompt-tokens",
+        type=int,
+        default=None,
+        help=(
+            "Estimated token budget for the prompt, older and less-reacted comments are trimmed to fit "
+            f"(default: per agent, {DEFAULT_MAX_PROMPT_TOKENS}; 0 disables trimming)."
+        ),
+    )
 
     subparsers = parser.add_subparsers(dest="command", required=True)
 
-    plan_parser = subparsers.add_parser("plan", help="Run Claude in plan mode (read-only analysis).")
-    plan_parser.add_argument("--github-issue-url", required=True, help="GitHub issue URL to plan.")
+    plan_parser = subparsers.add_parser(
+        "plan", parents=[fetch_parser], help="Run Claude in plan mode (read-only analysis)."
+    )
+    _add_issue_source(plan_parser, "plan")
 
-    develop_parser = subparsers.add_parser("develop", help="Run Claude in development mode.")
-    develop_parser.add_argument("--github-issue-url", required=True, help="GitHub issue URL to develop.")
+    develop_parser = subparsers.add_parser("develop", parents=[fetch_parser], help="Run Claude in development mode.")
+    _add_issue_source(develop_parser, "develop")
 
-    review_parser = subparsers.add_parser("review", help="Run Claude in review mode (issue quality review).")
-    review_parser.add_argument("--github-issue-url", required=True, help="GitHub issue URL to review.")
+    review_parser = subparsers.add_parser(
+        "review", parents=[fetch_parser], help="Run Claude in review mode (issue quality review)."
+    )
+    _add_issue_source(review_parser, "review")
 
     explore_parser = subparsers.add_parser(
-        "explore", help="Run Claude in explore mode (investigate and propose solutions)."
+        "explore", parents=[fetch_parser], help="Run Claude in explore mode (investigate and propose solutions)."
     )
-    explore_parser.add_argument("--github-issue-url", required=True, help="GitHub issue URL to explore.")
+    _add_issue_source(explore_parser, "explore")
 
-    diagnose_parser = subparsers.add_parser("diagnose", help="Run Claude in diagnose mode (root cause analysis).")
-    diagnose_parser.add_argument("--github-issue-url", required=True, help="GitHub issue URL to diagnose.")
+    diagnose_parser = subparsers.add_parser(
+        "diagnose", parents=[fetch_parser], help="Run Claude in diagnose mode (root cause analysis)."
+    )
+    _add_issue_source(diagnose_parser, "diagnose")
 
     install_parser = subparsers.add_parser("install", help="Install bundled skills to the agent workspace.")
     install_parser.add_argument(
@@ -84,23 +218,350 @@ def main() -> None:
         default=None,
         help="Target directory for skills (defaults to ~/.openclaw/workspace/skills).",
     )
+    install_parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Report skill files and registry entries that are out of date without writing anything; "
+        "exits with 1 if there are any.",
+    )
 
-    args = parser.parse_args()
+    batch_parser = subparsers.add_parser(
+        "batch", parents=[fetch_parser], help="Run an agent over many GitHub issue URLs concurrently."
+    )
+    batch_parser.add_argument("agent", choices=[agent.value for agent in AgentType], help="Agent to run on each issue.")
+    batch_parser.add_argument(
+        "--input",
+        default=None,
+        help="File containing GitHub issue URLs, one per line ('-' reads from stdin, the default without "
+        "--resume or --retry-failed).",
+    )
+    batch_parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Run the jobs of this agent left unfinished by an interrupted batch, plus any --input URLs.",
+    )
+    batch_parser.add_argument(
+        "--retry-failed",
+        action="store_true",
+        help="Run the jobs of this agent that finished with a non-zero exit code again, plus any --input URLs.",
+    )
+    batch_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_BATCH_JOBS,
+        help=f"Maximum number of issues processed concurrently (default: {DEFAULT_BATCH_JOBS}).",
+    )
 
-    if args.command == "install":
-        install_skills(directory=args.directory)
+    pipeline_parser = subparsers.add_parser(
+        "pipeline", parents=[fetch_parser], help="Run several agents in turn on each issue, fetching it only once."
+    )
+    pipeline_agents = pipeline_parser.add_mutually_exclusive_group(required=True)
+    pipeline_agents.add_argument(
+        "--stages",
+        type=_agent_list,
+        help="Comma-separated agents to run in order, e.g. review,plan,develop. A failing stage ends the pipeline.",
+    )
+    pipeline_agents.add_argument(
+        "--fan-out",
+        type=_agent_list,
+        help=(
+            "Comma-separated agents to run concurrently, e.g. explore,diagnose,plan. "
+            "Each runs in its own temporary git worktree of --cwd and the outputs are reported together."
+        ),
+    )
+    pipeline_source = pipeline_parser.add_mutually_exclusive_group(required=True)
+    pipeline_source.add_argument("--github-issue-url", help="GitHub issue URL to process.")
+    pipeline_source.add_argument(
+        "--input", help="File containing GitHub issue URLs, one per line ('-' reads from stdin)."
+    )
+
+    serve_parser = subparsers.add_parser("serve", help="Run a daemon that processes jobs submitted over a Unix socket.")
+    serve_parser.add_argument(
+        "--socket", type=Path, default=SOCKET_PATH, help=f"Unix socket to listen on (default: {SOCKET_PATH})."
+    )
+    serve_parser.add_argument(
+        "--jobs",
+        type=int,
+        default=DEFAULT_BATCH_JOBS,
+        help=f"Maximum number of claude processes running at once (default: {DEFAULT_BATCH_JOBS}).",
+    )
+
+    submit_parser = subparsers.add_parser(
+        "submit", parents=[fetch_parser], help="Submit an issue to a running 'askcc serve' daemon."
+    )
+    submit_parser.add_argument("agent", choices=[agent.value for agent in AgentType], help="Agent to run on the issue.")
+    submit_parser.add_argument("--github-issue-url", required=True, help="GitHub issue URL to process.")
+    submit_parser.add_argument(
+        "--socket", type=Path, default=SOCKET_PATH, help=f"Unix socket of the daemon (default: {SOCKET_PATH})."
+    )
+    submit_parser.add_argument(
+        "--wait",
+        action="store_true",
+        help="Wait for the job to finish, printing its output, and exit with its exit code.",
+    )
+
+    _add_history_parser(subparsers)
+    return parser
+
+
+def _format_size(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:  # noqa: PLR2004
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def _history(args: argparse.Namespace) -> int:
+    """List archived runs from the index, or print the decompressed output of one run."""
+    from .runs import RunArchive  # noqa: PLC0415
+
+    with RunArchive() as archive:
+        if args.prune:
+            logger.info("Pruned %d run(s)", archive.prune())
+            return 0
+        if args.run_id:
+            record = archive.get(args.run_id)
+            if record is None:
+                logger.error("No single run matches '%s'", args.run_id)
+                return 1
+            for chunk in archive.read_log(record.run_id, "stderr" if args.stderr else "stdout"):
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return 0
+        agent_name = AGENT_CONFIGS[AgentType(args.agent)].agent_name if args.agent else None
+        records = archive.history(agent_name=agent_name, github_issue_url=args.github_issue_url, limit=args.limit)
+    sys.stdout.write(f"{'RUN ID':<22}  {'STARTED':<19}  {'AGENT':<13}  EXIT  {'DURATION':>8}  {'OUTPUT':>9}  ISSUE\n")
+    for record in records:
+        started = datetime.fromtimestamp(record.started_at).astimezone().strftime("%Y-%m-%d %H:%M:%S")
+        exit_code = "-" if record.exit_code is None else str(record.exit_code)
+        sys.stdout.write(
+            f"{record.run_id:<22}  {started:<19}  {record.agent_name:<13}  {exit_code:>4}  "
+            f"{record.duration_seconds:>7.1f}s  {_format_size(record.stdout_bytes):>9}  "
+            f"{record.github_issue_url or '-'}\n"
+        )
+    return 0
+
+
+def _fetch_options(args: argparse.Namespace) -> FetchOptions:
+    return FetchOptions(
+        use_cache=not args.no_cache,
+        refresh=args.refresh,
+        reference_depth=args.with_references,
+        comment_filter=CommentFilter(
+            skip_bots=args.skip_bots, skip_minimized=args.skip_minimized, since=args.comments_since
+        ),
+    )
+
+
+def _submit(args: argparse.Namespace) -> None:
+    """Hand the issue to the daemon, which already has everything loaded."""
+    from .client import DaemonError, submit_job  # noqa: PLC0415
+
+    request = JobRequest(
+        agent=AgentType(args.agent),
+        github_issue_url=args.github_issue_url,
+        # resolved here, the daemon's working directory is unrelated to the caller's
+        cwd=str((args.cwd or Path.cwd()).resolve()),
+        fetch_options=_fetch_options(args),
+        max_prompt_tokens=args.max_prompt_tokens,
+        stream=args.stream,
+        force=args.force or args.no_cache,
+    )
+
+    def _write_output(text: str) -> None:
+        sys.stdout.write(text)
+        sys.stdout.flush()
+
+    try:
+        job = submit_job(args.socket, request, wait=args.wait, on_output=_write_output)
+    except (DaemonError, OSError) as e:
+        logger.error("Could not submit job: %s", e)  # noqa: TRY400
+        sys.exit(1)
+    if not args.wait:
+        logger.info("Submitted job %s", job["job_id"])
         return
+    result = job["result"]
+    logger.info("Job %s finished (exit code: %d)", job["job_id"], result["exit_code"])
+    sys.exit(result["exit_code"])
+
+
+def _agent_config(args: argparse.Namespace, agent: AgentType) -> AgentConfig:
+    """Load an agent's config with the --max-prompt-tokens and --force (or --no-cache) overrides applied."""
+    from .functions import load_agent_config  # noqa: PLC0415
+    from .runner import with_prompt_budget, with_result_cache  # noqa: PLC0415
+
+    return with_result_cache(
+        with_prompt_budget(load_agent_config(agent), args.max_prompt_tokens), args.force or args.no_cache
+    )
+
 
-    bootstrap_templates()
+def _command_agents(args: argparse.Namespace) -> list[AgentType]:
+    if args.command == "pipeline":
+        return args.stages or args.fan_out
+    return [AgentType(args.agent if args.command == "batch" else args.command)]
 
-    agent = AgentType(args.command)
-    config = load_agent_config(agent)
-    issue_content = fetch_github_issue(args.github_issue_url)
-    prompt = Template(config.user_prompt_template).safe_substitute(issue_content=issue_content)
+
+def _exit_code(results: list[BatchResult]) -> int:
+    return 1 if any(result.exit_code != 0 for result in results) else 0
+
+
+def _run_pipeline(args: argparse.Namespace, agents: list[AgentType], fetch_options: FetchOptions) -> int:
+    from .functions import read_issue_urls  # noqa: PLC0415
+    from .runner import run_fan_out, run_pipeline  # noqa: PLC0415
+    from .worktrees import WorktreeError  # noqa: PLC0415
+
+    configs = [_agent_config(args, stage) for stage in agents]
+    if args.github_issue_url:
+        github_issue_urls = read_issue_urls([args.github_issue_url])
+    else:
+        github_issue_urls = read_issue_urls(sys.stdin if args.input == "-" else Path(args.input))
+    if not args.fan_out:
+        results = run_pipeline(
+            github_issue_urls, configs, cwd=args.cwd, fetch_options=fetch_options, stream=args.stream
+        )
+        return _exit_code(results)
+
+    results = []
+    for github_issue_url in github_issue_urls:
+        try:
+            results.extend(
+                run_fan_out(github_issue_url, configs, cwd=args.cwd, fetch_options=fetch_options, stream=args.stream)
+            )
+        except WorktreeError as e:
+            logger.error("Cannot fan out: %s", e)  # noqa: TRY400
+            return 1
+    return _exit_code(results)
+
+
+def _run_sweep(args: argparse.Namespace, agent: AgentType, fetch_options: FetchOptions) -> int:
+    from .functions import parse_repository  # noqa: PLC0415
+    from .github import GithubAPIError  # noqa: PLC0415
+    from .jobs import JobStore  # noqa: PLC0415
+    from .runner import run_sweep  # noqa: PLC0415
+
+    try:
+        parse_repository(args.repo)
+    except ValueError as e:
+        logger.error(e)  # noqa: TRY400
+        return 1
+    config = _agent_config(args, agent)
+    with JobStore() as job_store:
+        try:
+            results = run_sweep(
+                args.repo,
+                config,
+                agent,
+                job_store,
+                labels=args.label,
+                since=args.since,
+                jobs=args.jobs,
+                cwd=args.cwd,
+                fetch_options=fetch_options,
+                stream=args.stream,
+            )
+        except (OSError, GithubAPIError) as e:
+            # the watermark is left where it was, the next sweep lists the same issues again
+            logger.error("Listing issues of %s failed: %s", args.repo, e)  # noqa: TRY400
+            return 1
+    return _exit_code(results)
+
+
+def _run_batch(args: argparse.Namespace, agent: AgentType, fetch_options: FetchOptions) -> int:
+    from .functions import read_issue_urls  # noqa: PLC0415
+    from .jobs import JobStore  # noqa: PLC0415
+    from .runner import run_batch  # noqa: PLC0415
+
+    config = _agent_config(args, agent)
+    with JobStore() as job_store:
+        github_issue_urls = job_store.unfinished(agent) if args.resume else []
+        if args.resume:
+            logger.info("Resuming %d unfinished '%s' job(s) from %s", len(github_issue_urls), agent, job_store.path)
+        if args.retry_failed:
+            failed_urls = job_store.failed(agent)
+            logger.info("Retrying %d failed '%s' job(s) from %s", len(failed_urls), agent, job_store.path)
+            github_issue_urls = list(dict.fromkeys([*github_issue_urls, *failed_urls]))
+        if args.input or not (args.resume or args.retry_failed):
+            input_urls = read_issue_urls(sys.stdin if args.input in (None, "-") else Path(args.input))
+            job_store.enqueue(input_urls, agent)
+            github_issue_urls = list(dict.fromkeys([*github_issue_urls, *input_urls]))
+        results = run_batch(
+            github_issue_urls,
+            config,
+            jobs=args.jobs,
+            cwd=args.cwd,
+            fetch_options=fetch_options,
+            stream=args.stream,
+            job_store=job_store,
+            agent=agent,
+        )
+    return _exit_code(results)
+
+
+def _run_command(args: argparse.Namespace) -> int:
+    """Run a command that needs the templates and agent configs, returning the exit code."""
+    from .functions import bootstrap_templates, validate_agent_templates  # noqa: PLC0415
+    from .metrics import span  # noqa: PLC0415
+    from .runner import prepare_prompt, run_claude  # noqa: PLC0415
+
+    with span("bootstrap_templates"):
+        bootstrap_templates()
+    # report every broken template up front, not only the one of the agent being run
+    with span("validate_agent_templates") as validate_span:
+        template_errors = validate_agent_templates()
+        validate_span.set_attribute("errors", len(template_errors))
+    for error in template_errors.values():
+        logger.error(error)
+    agents = _command_agents(args)
+    if any(agent in template_errors for agent in agents):
+        return 1
+
+    fetch_options = _fetch_options(args)
+    if args.command == "pipeline":
+        return _run_pipeline(args, agents, fetch_options)
+    if args.command == "batch":
+        return _run_batch(args, agents[0], fetch_options)
+    if args.repo:
+        return _run_sweep(args, agents[0], fetch_options)
+
+    agent = agents[0]
+    with span("load_agent_config", agent=agent.value):
+        config = _agent_config(args, agent)
+    prompt = prepare_prompt(args.github_issue_url, config, fetch_options, cwd=args.cwd)
     logger.info("Prompt prepared for '%s' command", agent.value)
-    return_code = _run_claude(prompt, config=config, cwd=args.cwd)
+    return run_claude(prompt, config=config, cwd=args.cwd, stream=args.stream, github_issue_url=args.github_issue_url)
+
+
+def main() -> None:
+    configure_logging()
+    parser = _build_parser()
+    args = parser.parse_args()
+    if getattr(args, "github_issue_url", None) and (getattr(args, "label", None) or getattr(args, "since", None)):
+        parser.error("--label and --since require --repo")
+    if args.command == "submit":
+        _submit(args)
+        return
+    if args.command == "history":
+        sys.exit(_history(args))
+
+    # imported after argument parsing so that --help, --version and usage errors skip the heavy imports
+    from .functions import install_skills  # noqa: PLC0415
+    from .metrics import configure_metrics, span  # noqa: PLC0415
+
+    if args.command == "install":
+        changes = install_skills(directory=args.directory, check=args.check)
+        sys.exit(1 if args.check and changes else 0)
+    configure_metrics(args.metrics_file)
+    if args.command == "serve":
+        from .server import serve  # noqa: PLC0415
+
+        serve(args.socket, jobs=args.jobs)
+        return
 
-    sys.exit(return_code)
+    with span("askcc", command=args.command) as root_span:
+        exit_code = _run_command(args)
+        root_span.set_attribute("exit_code", exit_code)
+    sys.exit(exit_code)
 
 
 if __name__ == "__main__":
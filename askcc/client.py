@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import contextlib
+import json
+import socket
+from dataclasses import asdict
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from pathlib import Path
+
+    from .definitions import JobRequest
+
+# newline-delimited JSON messages, one request and one response per line; a job submitted with "follow" gets
+# an {"output": ...} message per chunk of output before the finished job
+ENCODING = "utf-8"
+MAX_MESSAGE_BYTES = 1024 * 1024
+NO_RESPONSE = "askcc daemon closed the connection without a response"
+
+
+class DaemonError(Exception):
+    """Raised when the askcc daemon cannot be reached or rejects a request."""
+
+
+def _responses(socket_path: Path, message: dict, *, timeout: float | None = None) -> Iterator[dict]:
+    """Send a single message to the daemon listening on `socket_path` and yield its responses until it hangs up."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(str(socket_path))
+        except (FileNotFoundError, ConnectionRefusedError) as e:
+            msg = f"askcc daemon is not running at {socket_path} (start it with 'askcc serve')"
+            raise DaemonError(msg) from e
+        with sock.makefile("rwb") as stream:
+            stream.write(json.dumps(message).encode(ENCODING) + b"\n")
+            stream.flush()
+            for line in iter(lambda: stream.readline(MAX_MESSAGE_BYTES), b""):
+                response = json.loads(line)
+                if not response.get("ok"):
+                    raise DaemonError(response.get("error", "unknown error"))
+                yield response
+
+
+def send_message(socket_path: Path, message: dict, *, timeout: float | None = None) -> dict:
+    """Send a single message to the daemon listening on `socket_path` and return its response."""
+    with contextlib.closing(_responses(socket_path, message, timeout=timeout)) as responses:
+        response = next(responses, None)
+    if response is None:
+        raise DaemonError(NO_RESPONSE)
+    return response
+
+
+def submit_job(
+    socket_path: Path, request: JobRequest, *, wait: bool = False, on_output: Callable[[str], None] | None = None
+) -> dict:
+    """
+    Queue a job on the daemon, and with `wait` block until it finishes. Returns the job as a dict.
+
+    While waiting, the job's output is passed to `on_output` as the daemon writes it.
+    """
+    message = {"action": "submit", "request": asdict(request)}
+    if not wait:
+        return send_message(socket_path, message)["job"]
+    with contextlib.closing(_responses(socket_path, {**message, "follow": True})) as responses:
+        for response in responses:
+            if "job" in response:
+                return response["job"]
+            if on_output:
+                on_output(response["output"])
+    raise DaemonError(NO_RESPONSE)
+
+
+def job_status(socket_path: Path, job_id: str) -> dict:
+    return send_message(socket_path, {"action": "status", "job_id": job_id})["job"]
@@ -94,6 +94,7 @@ EXPLORE_USER_PROMPT_TEMPLATE = (
     " and propose best-practice solutions with trade-offs."
     " After finalizing your analysis, post it as a comment on the issue using the gh CLI."
     "\n\n$issue_content"
+    "\n\n$relevant_files"
 )
 
 DIAGNOSE_AGENT_PROMPT = """\
@@ -120,6 +121,7 @@ DIAGNOSE_USER_PROMPT_TEMPLATE = (
     " and request any additional information needed to confirm the diagnosis."
     " After finalizing your diagnosis, post it as a comment on the issue using the gh CLI."
     "\n\n$issue_content"
+    "\n\n$relevant_files"
 )
 
 REVIEW_USER_PROMPT_TEMPLATE = (
@@ -132,6 +134,7 @@ PLAN_USER_PROMPT_TEMPLATE = (
     "Analyze the following GitHub issue and produce an implementation plan."
     " After finalizing the plan, post it as a comment on the issue using the gh CLI."
     "\n\n$issue_content"
+    "\n\n$relevant_files"
 )
 DEVELOP_USER_PROMPT_TEMPLATE = (
     "Implement the following GitHub issue according to its planned implementation."
@@ -150,6 +153,89 @@ class AgentConfig:
     system_prompt_file: str
     user_prompt_file: str
     required_variables: tuple[str, ...] = ()
+    max_prompt_tokens: int | None = None  # estimated token budget for the rendered issue, None disables trimming
+    uses_worktree_pool: bool = False  # modifies the checkout, runs in a leased worktree when the pool is enabled
+    memoize_results: bool = True  # replay a stored result when the same prompts run against the same commit
+    index_repository: bool = False  # list the files of --cwd the issue is likely about as $relevant_files
+
+
+@dataclass(frozen=True)
+class IssueComment:
+    author: str
+    body: str
+    created_at: str = ""
+    reactions: int = 0
+    is_minimized: bool = False
+    is_bot: bool = False
+
+
+@dataclass(frozen=True)
+class IssueReference:
+    """A compact summary of an issue or pull request referenced by an issue, `depth` references away from it."""
+
+    owner: str
+    repo: str
+    number: int
+    title: str
+    state: str = ""
+    is_pull_request: bool = False
+    summary: str = ""  # the start of its description
+    depth: int = 1
+
+
+@dataclass(frozen=True)
+class GithubIssue:
+    owner: str
+    repo: str
+    number: int
+    title: str
+    body: str
+    labels: tuple[str, ...] = ()
+    comments: tuple[IssueComment, ...] = ()
+    updated_at: str = ""
+    state: str = ""  # "open" or "closed"
+    is_pull_request: bool = False
+    references: tuple[IssueReference, ...] = ()  # prefetched with FetchOptions.reference_depth, never cached
+
+
+@dataclass(frozen=True)
+class RepositoryIssue:
+    """An issue found by a repository sweep, before it is fetched in full."""
+
+    github_issue_url: str
+    number: int
+    updated_at: str
+
+
+@dataclass(frozen=True)
+class CommentFilter:
+    skip_bots: bool = False
+    skip_minimized: bool = False
+    since: str | None = None  # ISO 8601 timestamp, older comments are skipped
+
+
+@dataclass(frozen=True)
+class FetchOptions:
+    use_cache: bool = True
+    refresh: bool = False
+    comment_filter: CommentFilter | None = None
+    reference_depth: int = 0  # prefetch referenced issues and PRs this many references away, 0 disables
+
+
+@dataclass(frozen=True)
+class BatchResult:
+    github_issue_url: str
+    exit_code: int
+    duration_seconds: float = 0.0
+    error: str | None = None
+    agent_name: str = ""
+    output: str | None = None  # captured claude output, set when runs are reported together (fan-out)
+
+
+DEFAULT_MAX_PROMPT_TOKENS = 100_000
+DEFAULT_BATCH_JOBS = 4
+DEFAULT_HISTORY_LIMIT = 20
+SINCE_AUTO = "auto"  # --since value that continues a repository sweep from its stored watermark
 
 
 class AgentType(StrEnum):
@@ -160,6 +246,73 @@ class AgentType(StrEnum):
     DIAGNOSE = "diagnose"
 
 
+class JobStatus(StrEnum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    FINISHED = "finished"
+
+
+@dataclass(frozen=True)
+class JobRequest:
+    agent: AgentType
+    github_issue_url: str
+    cwd: str | None = None
+    fetch_options: FetchOptions = FetchOptions()
+    max_prompt_tokens: int | None = None  # None keeps the agent's budget, 0 disables trimming
+    stream: bool = False
+    force: bool = False  # run claude even if a stored result exists
+
+
+@dataclass(frozen=True)
+class JobRecord:
+    """A batch job as persisted in the job store, one per (issue URL, agent)."""
+
+    github_issue_url: str
+    agent: AgentType
+    status: JobStatus
+    runs: int = 0  # times the job was started since it was queued, fetch retries within a run are not counted
+    exit_code: int | None = None
+    error: str | None = None
+    queued_at: float = 0.0
+    started_at: float | None = None
+    finished_at: float | None = None
+
+
+@dataclass(frozen=True)
+class RelevantFile:
+    """A file of the repository index matching an issue, with what matched."""
+
+    path: str
+    score: float
+    mentioned: bool = False  # the issue names the file, or a stack trace in it has a frame in it
+    symbols: tuple[str, ...] = ()  # top-level symbols of the file named in the issue
+    terms: tuple[str, ...] = ()  # identifiers of the issue used in the file, most significant first
+
+
+@dataclass(frozen=True)
+class RunRecord:
+    """A claude run in the run archive, its output is kept in compressed logs named after `run_id`."""
+
+    run_id: str
+    agent_name: str
+    started_at: float
+    github_issue_url: str | None = None
+    duration_seconds: float = 0.0
+    exit_code: int | None = None  # None when askcc was interrupted
+    stdout_bytes: int = 0
+    stderr_bytes: int = 0
+    log_bytes: int = 0  # compressed size of the logs
+
+
+@dataclass(frozen=True)
+class Job:
+    job_id: str
+    request: JobRequest
+    status: JobStatus = JobStatus.QUEUED
+    submitted_at: float = 0.0
+    result: BatchResult | None = None
+
+
 AGENT_CONFIGS: dict[AgentType, AgentConfig] = {
     AgentType.PLAN: AgentConfig(
         agent_name="planner",
@@ -169,6 +322,8 @@ AGENT_CONFIGS: dict[AgentType, AgentConfig] = {
         system_prompt_file="PLAN_SYSTEM_PROMPT.md",
         user_prompt_file="PLAN_USER_PROMPT.md",
         required_variables=("issue_content",),
+        max_prompt_tokens=DEFAULT_MAX_PROMPT_TOKENS,
+        index_repository=True,
     ),
     AgentType.DEVELOP: AgentConfig(
         agent_name="developer",
@@ -178,6 +333,9 @@ AGENT_CONFIGS: dict[AgentType, AgentConfig] = {
         system_prompt_file="DEVELOP_SYSTEM_PROMPT.md",
         user_prompt_file="DEVELOP_USER_PROMPT.md",
         required_variables=("issue_content",),
+        max_prompt_tokens=DEFAULT_MAX_PROMPT_TOKENS,
+        uses_worktree_pool=True,
+        memoize_results=False,  # changes the repository, rerunning is never a no-op
     ),
     AgentType.REVIEW: AgentConfig(
         agent_name="reviewer",
@@ -187,6 +345,7 @@ AGENT_CONFIGS: dict[AgentType, AgentConfig] = {
         system_prompt_file="REVIEW_SYSTEM_PROMPT.md",
         user_prompt_file="REVIEW_USER_PROMPT.md",
         required_variables=("issue_content",),
+        max_prompt_tokens=DEFAULT_MAX_PROMPT_TOKENS,
     ),
     AgentType.EXPLORE: AgentConfig(
         agent_name="explorer",
@@ -196,6 +355,8 @@ AGENT_CONFIGS: dict[AgentType, AgentConfig] = {
         system_prompt_file="EXPLORE_SYSTEM_PROMPT.md",
         user_prompt_file="EXPLORE_USER_PROMPT.md",
         required_variables=("issue_content",),
+        max_prompt_tokens=DEFAULT_MAX_PROMPT_TOKENS,
+        index_repository=True,
     ),
     AgentType.DIAGNOSE: AgentConfig(
         agent_name="diagnostician",
@@ -205,5 +366,7 @@ AGENT_CONFIGS: dict[AgentType, AgentConfig] = {
         system_prompt_file="DIAGNOSE_SYSTEM_PROMPT.md",
         user_prompt_file="DIAGNOSE_USER_PROMPT.md",
         required_variables=("issue_content",),
+        max_prompt_tokens=DEFAULT_MAX_PROMPT_TOKENS,
+        index_repository=True,
     ),
 }
@@ -1,15 +1,41 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import hashlib
 import json
 import logging
-import shutil
-import subprocess
+import os
+import re
 from dataclasses import replace
+from datetime import UTC, datetime
 from importlib.resources import files as package_files
 from pathlib import Path
-from string import Template
+from typing import TYPE_CHECKING
 from urllib.parse import urlparse
 
-from .definitions import AGENT_CONFIGS, AgentConfig, AgentType
-from .settings import TEMPLATES_DIR
+from .cache import CachedIssue, IssueCache, write_atomically
+from .definitions import (
+    AGENT_CONFIGS,
+    AgentConfig,
+    AgentType,
+    CommentFilter,
+    FetchOptions,
+    GithubIssue,
+    IssueComment,
+    IssueReference,
+    RepositoryIssue,
+)
+from .github import GithubAPIError, get_github_client
+from .metrics import span
+from .settings import GITHUB_FETCH_ENGINE, MAX_REFERENCES, TEMPLATES_DIR
+from .templates import TEMPLATE_REGISTRY, compile_template
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+    from importlib.resources.abc import Traversable
+
+    from .github import GithubClient, GithubResponse
 
 logger = logging.getLogger(__name__)
 
@@ -29,76 +55,575 @@ def _parse_issue_url(github_issue_url: str) -> tuple[str, str, int]:
     return owner, repo, issue_number
 
 
-def _require_gh_cli() -> str:
-    """Return the path to the gh CLI, raising if not found."""
-    gh_path = shutil.which("gh")
-    if not gh_path:
-        msg = "'gh' CLI is not installed or not on PATH. Install it from https://cli.github.com/"
-        raise FileNotFoundError(msg)
-    return gh_path
+def parse_repository(repository: str) -> tuple[str, str]:
+    """Parse an 'owner/name' repository into (owner, name)."""
+    owner, _, name = repository.strip("/").partition("/")
+    if not owner or not name or "/" in name:
+        msg = f"Invalid GitHub repository (expected owner/name): {repository}"
+        raise ValueError(msg)
+    return owner, name
+
+
+def list_repository_issues(
+    repository: str, *, labels: Iterable[str] = (), since: str | None = None
+) -> Iterator[RepositoryIssue]:
+    """
+    Yield the open issues of an 'owner/name' repository, least recently updated first, page by page as they arrive.
+
+    `labels` must all be present on an issue, `since` (ISO 8601) keeps issues updated at or after that time.
+    Pull requests, which the issues endpoint also returns, are skipped.
+    """
+    owner, name = parse_repository(repository)
+    params = {"state": "open", "sort": "updated", "direction": "asc", "per_page": 100}
+    if labels:
+        params["labels"] = ",".join(labels)
+    if since:
+        params["since"] = since
+    for page in get_github_client().paginate(f"repos/{owner}/{name}/issues", params=params):
+        for item in page:
+            if "pull_request" in item:
+                continue
+            yield RepositoryIssue(
+                github_issue_url=f"https://github.com/{owner}/{name}/issues/{item['number']}",
+                number=item["number"],
+                updated_at=item.get("updated_at") or "",
+            )
+
+
+def read_issue_urls(source: Path | Iterable[str]) -> list[str]:
+    """Read GitHub issue URLs, one per line, skipping blank lines and '#' comments. Duplicates are dropped."""
+    lines = source.read_text().splitlines() if isinstance(source, Path) else source
+    urls: list[str] = []
+    seen: set[str] = set()
+    for line in lines:
+        url = line.strip()
+        if not url or url.startswith("#") or url in seen:
+            continue
+        _parse_issue_url(url)  # fail fast on malformed input before any work is started
+        seen.add(url)
+        urls.append(url)
+    return urls
+
+
+ISSUE_GRAPHQL_QUERY = """\
+query($owner: String!, $repo: String!, $number: Int!, $cursor: String) {
+  repository(owner: $owner, name: $repo) {
+    issue(number: $number) {
+      title
+      body
+      updatedAt
+      state
+      labels(first: 100) { nodes { name } }
+      comments(first: 100, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { author { login __typename } body createdAt isMinimized reactions { totalCount } }
+      }
+    }
+  }
+}
+"""
+GHOST_LOGIN = "ghost"  # GitHub's placeholder for deleted accounts
+
+
+def _comment_from_graphql(node: dict) -> IssueComment:
+    author = node.get("author") or {}
+    return IssueComment(
+        author=author.get("login", GHOST_LOGIN),
+        body=node.get("body") or "",
+        created_at=node.get("createdAt") or "",
+        reactions=(node.get("reactions") or {}).get("totalCount", 0),
+        is_minimized=bool(node.get("isMinimized")),
+        is_bot=author.get("__typename") == "Bot",
+    )
 
 
-def fetch_github_issue(github_issue_url: str) -> str:
-    """Fetch a GitHub issue description and all comments, combined into a single string."""
-    gh = _require_gh_cli()
-    owner, repo, issue_number = _parse_issue_url(github_issue_url)
-    repo_nwo = f"{owner}/{repo}"
-    logger.info("Fetching issue #%d from %s ...", issue_number, repo_nwo)
-
-    # Fetch issue body
-    issue_result = subprocess.run(  # noqa: S603
-        [gh, "api", f"repos/{repo_nwo}/issues/{issue_number}", "--jq", ".title, .body"],
-        capture_output=True,
-        text=True,
-        check=True,
+def _comment_from_rest(data: dict) -> IssueComment:
+    user = data.get("user") or {}
+    return IssueComment(
+        author=user.get("login", GHOST_LOGIN),
+        body=data.get("body") or "",
+        created_at=data.get("created_at") or "",
+        reactions=(data.get("reactions") or {}).get("total_count", 0),
+        is_bot=user.get("type") == "Bot",
     )
-    issue_text = issue_result.stdout.strip()
-
-    logger.info("Fetching comments for issue #%d ...", issue_number)
-    comments_result = subprocess.run(  # noqa: S603
-        [gh, "api", "--paginate", f"repos/{repo_nwo}/issues/{issue_number}/comments"],
-        capture_output=True,
-        text=True,
-        check=True,
+
+
+def _fetch_issue_graphql(client: GithubClient, owner: str, repo: str, issue_number: int) -> tuple[GithubIssue, str]:
+    """
+    Fetch the issue, its labels and comments with a single GraphQL request (one more per 100 extra comments).
+
+    GraphQL responses carry no ETag, the returned ETag is always empty.
+    """
+    issue_data: dict = {}
+    comments: list[IssueComment] = []
+    cursor = None
+    while True:
+        variables = {"owner": owner, "repo": repo, "number": issue_number, "cursor": cursor}
+        with span("github.graphql", page_start=len(comments)) as request_span:
+            issue_data = (client.graphql(ISSUE_GRAPHQL_QUERY, variables).get("repository") or {}).get("issue") or {}
+            if not issue_data:
+                msg = f"Issue #{issue_number} not found in {owner}/{repo}"
+                raise ValueError(msg)
+            page = issue_data["comments"]
+            request_span.set_attribute("comment_count", len(page["nodes"]))
+        comments.extend(_comment_from_graphql(node) for node in page["nodes"])
+        if not page["pageInfo"]["hasNextPage"]:
+            break
+        cursor = page["pageInfo"]["endCursor"]
+
+    issue = GithubIssue(
+        owner=owner,
+        repo=repo,
+        number=issue_number,
+        title=issue_data.get("title") or "",
+        body=issue_data.get("body") or "",
+        labels=tuple(label["name"] for label in issue_data["labels"]["nodes"]),
+        comments=tuple(comments),
+        updated_at=issue_data.get("updatedAt") or "",
+        state=(issue_data.get("state") or "").lower(),
+    )
+    return issue, ""
+
+
+def _fetch_issue_rest(client: GithubClient, owner: str, repo: str, issue_number: int) -> tuple[GithubIssue, str]:
+    """Fetch the issue and its comments with concurrent REST requests, returning the issue and its ETag."""
+    issue_path = f"repos/{owner}/{repo}/issues/{issue_number}"
+
+    def _fetch_issue() -> GithubResponse:
+        with span("github.get_issue"):
+            return client.get(issue_path)
+
+    def _fetch_comments() -> list[IssueComment]:
+        with span("github.list_comments") as request_span:
+            # pages are converted to compact IssueComments as they arrive, so raw pages can be released
+            comments = [_comment_from_rest(c) for page in client.paginate(f"{issue_path}/comments") for c in page]
+            request_span.set_attribute("comment_count", len(comments))
+        return comments
+
+    async def _fetch() -> tuple[GithubResponse, list[IssueComment]]:
+        return await asyncio.gather(asyncio.to_thread(_fetch_issue), asyncio.to_thread(_fetch_comments))
+
+    issue_response, comments = asyncio.run(_fetch())
+    issue_data = issue_response.json()
+    issue = GithubIssue(
+        owner=owner,
+        repo=repo,
+        number=issue_number,
+        title=issue_data.get("title") or "",
+        body=issue_data.get("body") or "",
+        labels=tuple(label["name"] for label in issue_data.get("labels", [])),
+        comments=tuple(comments),
+        updated_at=issue_data.get("updated_at") or "",
+        state=issue_data.get("state") or "",
+        is_pull_request="pull_request" in issue_data,
+    )
+    return issue, issue_response.headers.get("etag", "")
+
+
+ISSUE_FETCH_ENGINES = {
+    "graphql": _fetch_issue_graphql,
+    "rest": _fetch_issue_rest,
+}
+
+HTTP_NOT_MODIFIED = 304
+
+
+def _revalidate_issue(
+    client: GithubClient, owner: str, repo: str, issue_number: int, cached: CachedIssue
+) -> tuple[bool, str]:
+    """
+    Conditionally request the cached issue, returning (not_modified, etag).
+
+    A 304 response does not count against the GitHub rate limit. Entries cached without an ETag (fetched
+    with GraphQL) are compared by their updated_at instead, and get the ETag of this response.
+    """
+    headers = {"If-None-Match": cached.etag} if cached.etag else None
+    with span("github.revalidate_issue") as request_span:
+        response = client.get(f"repos/{owner}/{repo}/issues/{issue_number}", headers=headers)
+        request_span.set_attribute("status_code", response.status_code)
+    if response.status_code == HTTP_NOT_MODIFIED:
+        return True, cached.etag
+    etag = response.headers.get("etag", "")
+    if not cached.etag and cached.issue.updated_at:
+        return response.json().get("updated_at") == cached.issue.updated_at, etag
+    return False, etag
+
+
+def fetch_issue(github_issue_url: str, options: FetchOptions | None = None) -> GithubIssue:
+    """
+    Fetch a GitHub issue with its labels and comments using the configured GITHUB_FETCH_ENGINE.
+
+    Fetched issues are cached under CACHE_DIR and revalidated with a conditional request,
+    `options.refresh` ignores the cached copy and `options.use_cache=False` bypasses the cache entirely.
+    With `options.reference_depth`, the issues and pull requests it references are prefetched too (see
+    `fetch_references`).
+    """
+    options = options or FetchOptions()
+    with span("fetch_issue", github_issue_url=github_issue_url, engine=GITHUB_FETCH_ENGINE) as fetch_span:
+        issue, cache_status = _fetch_issue(github_issue_url, options)
+        fetch_span.set_attribute("cache", cache_status)
+        fetch_span.set_attribute("comment_count", len(issue.comments))
+        if options.reference_depth:
+            issue = replace(issue, references=fetch_references(issue, options))
+    return issue
+
+
+def _fetch_issue(
+    github_issue_url: str, options: FetchOptions, engine: str = GITHUB_FETCH_ENGINE
+) -> tuple[GithubIssue, str]:
+    """Fetch an issue, returning it with how the cache was used ("hit", "miss" or "disabled")."""
+    client = get_github_client()
+    owner, repo, issue_number = _parse_issue_url(github_issue_url)
+    try:
+        fetch_engine = ISSUE_FETCH_ENGINES[engine]
+    except KeyError:
+        msg = f"Unknown ASKCC_FETCH_ENGINE '{engine}', expected one of: {', '.join(ISSUE_FETCH_ENGINES)}"
+        raise ValueError(msg) from None
+
+    cache = IssueCache() if options.use_cache else None
+    cached = cache.get(owner, repo, issue_number) if cache and not options.refresh else None
+    skip_minimized = bool(options.comment_filter and options.comment_filter.skip_minimized)
+    if cached and skip_minimized and engine == "graphql" and cached.engine != "graphql":
+        # e.g. prefetched as a reference over REST, which does not report hidden comments
+        logger.info("Cached issue #%d has no minimized comment state, fetching it again", issue_number)
+        cached = None
+    etag = ""
+    # without a cached copy there is nothing to revalidate, the fetch itself provides the ETag (REST) or it is
+    # recorded by the first revalidation (GraphQL)
+    if cache and cached:
+        not_modified, etag = _revalidate_issue(client, owner, repo, issue_number, cached)
+        if not_modified:
+            logger.info("Issue #%d unchanged since last fetch, using cached copy", issue_number)
+            if etag != cached.etag:
+                cache.put(cached.issue, etag, cached.engine)
+            return cached.issue, "hit"
+
+    logger.info("Fetching issue #%d from %s/%s (%s) ...", issue_number, owner, repo, engine)
+    issue, fetched_etag = fetch_engine(client, owner, repo, issue_number)
+    logger.info("Fetched issue with %d comment(s)", len(issue.comments))
+    if cache:
+        cache.put(issue, fetched_etag or etag, engine)
+    return issue, "miss" if cache else "disabled"
+
+
+# issue references as GitHub links them: full URLs, owner/repo#123, and #123 or GH-123 within the same repository.
+# A bare #123 must start a word and have no leading zero or more than 6 digits, which leaves out most hex colours
+# (#fff, #0a0a0a, #1234567) and anchors (page#12); code spans and blocks are not searched at all.
+# owner/repo#123 must also start a word and the repo may not contain a dot, so file anchors (docs/setup.md#12,
+# ./src/foo#3) are not mistaken for references; a repository with a dot in its name is still found by its URL
+URL_REFERENCE_PATTERN = re.compile(r"https://github\.com/([\w.-]+)/([\w.-]+)/(?:issues|pull)/(\d+)")
+CROSS_REFERENCE_PATTERN = re.compile(r"(?<![^\s(\[])([\w-]+)/([\w-]+)#(\d+)\b")
+LOCAL_REFERENCE_PATTERN = re.compile(r"(?<![^\s(\[])(?:#|GH-)([1-9]\d{0,5})\b")
+CODE_PATTERN = re.compile(r"```.*?(?:```|$)|~~~.*?(?:~~~|$)|`[^`\n]*`", re.DOTALL)
+REFERENCE_SUMMARY_CHARS = 300
+MAX_REFERENCES_PER_ISSUE = 10  # a long issue or comment thread cannot use up MAX_REFERENCES on its own
+
+
+def find_references(issue: GithubIssue) -> list[tuple[str, str, int]]:
+    """Return the (owner, repo, number) of the issues and PRs referenced in the issue and its comments, in order."""
+    references: dict[tuple[str, str, int], None] = {}
+    for body in (issue.body, *(comment.body for comment in issue.comments)):
+        text = CODE_PATTERN.sub(" ", body)
+        found = [
+            *((match.start(), (match[1], match[2], int(match[3]))) for match in URL_REFERENCE_PATTERN.finditer(text)),
+            *((match.start(), (match[1], match[2], int(match[3]))) for match in CROSS_REFERENCE_PATTERN.finditer(text)),
+            *(
+                (match.start(), (issue.owner, issue.repo, int(match[1])))
+                for match in LOCAL_REFERENCE_PATTERN.finditer(text)
+            ),
+        ]
+        references.update((reference, None) for _start, reference in sorted(found))
+    return list(references)
+
+
+def _summarize(issue: GithubIssue, depth: int) -> IssueReference:
+    summary = " ".join(issue.body.split())
+    if len(summary) > REFERENCE_SUMMARY_CHARS:
+        summary = summary[: REFERENCE_SUMMARY_CHARS - 1].rstrip() + "…"
+    return IssueReference(
+        owner=issue.owner,
+        repo=issue.repo,
+        number=issue.number,
+        title=issue.title,
+        state=issue.state,
+        is_pull_request=issue.is_pull_request,
+        summary=summary,
+        depth=depth,
     )
-    comments_data = json.loads(comments_result.stdout)
-    comment_texts = [f"Comment by @{c['user']['login']}:\n{c['body']}" for c in comments_data]
 
-    sections = [f"Issue #{issue_number}:\n{issue_text}"]
-    if comment_texts:
-        sections.append("Comments:\n" + "\n---\n".join(comment_texts))
-    logger.info("Fetched issue with %d comment(s)", len(comment_texts))
 
+def _fetch_reference(owner: str, repo: str, number: int, options: FetchOptions) -> GithubIssue | None:
+    github_issue_url = f"https://github.com/{owner}/{repo}/issues/{number}"
+    try:
+        with span("fetch_reference", github_issue_url=github_issue_url) as fetch_span:
+            # the GraphQL issue query does not resolve pull requests, the REST issues endpoint returns both
+            issue, cache_status = _fetch_issue(github_issue_url, options, engine="rest")
+            fetch_span.set_attribute("cache", cache_status)
+    except (OSError, ValueError, GithubAPIError) as e:
+        # e.g. a typo'd number or a private repository, the issue itself can still be processed
+        logger.warning("Could not prefetch referenced %s/%s#%d: %s", owner, repo, number, e)
+        return None
+    return issue
+
+
+def _fetch_references_concurrently(references: list[tuple[str, str, int]], options: FetchOptions) -> list[GithubIssue]:
+    async def _fetch() -> list[GithubIssue | None]:
+        return await asyncio.gather(
+            *(asyncio.to_thread(_fetch_reference, owner, repo, number, options) for owner, repo, number in references)
+        )
+
+    return [fetched for fetched in asyncio.run(_fetch()) if fetched]
+
+
+def fetch_references(issue: GithubIssue, options: FetchOptions) -> tuple[IssueReference, ...]:
+    """
+    Fetch the issues and PRs `issue` references, and theirs, up to `options.reference_depth` references away.
+
+    Each level is fetched concurrently, through the issue cache. Every issue is fetched at most once, and no
+    more than MAX_REFERENCES in total.
+    """
+    seen = {(issue.owner.lower(), issue.repo.lower(), issue.number)}
+    references: list[IssueReference] = []
+    sources = [issue]
+    remaining = MAX_REFERENCES
+    with span("fetch_references", depth=options.reference_depth) as references_span:
+        for depth in range(1, options.reference_depth + 1):
+            pending = []
+            for source in sources:
+                new_references = []
+                for reference in find_references(source):
+                    key = (reference[0].lower(), reference[1].lower(), reference[2])
+                    if key not in seen:
+                        seen.add(key)
+                        new_references.append(reference)
+                if len(new_references) > MAX_REFERENCES_PER_ISSUE:
+                    logger.info(
+                        "Prefetching only the first %d of %d references of issue #%d",
+                        MAX_REFERENCES_PER_ISSUE,
+                        len(new_references),
+                        source.number,
+                    )
+                pending += new_references[:MAX_REFERENCES_PER_ISSUE]
+            if len(pending) > remaining:
+                logger.info("Prefetching only the first %d referenced issue(s)", MAX_REFERENCES)
+                pending = pending[:remaining]
+            if not pending:
+                break
+            remaining -= len(pending)
+            sources = _fetch_references_concurrently(pending, options)
+            references += [_summarize(fetched, depth) for fetched in sources]
+        references_span.set_attribute("reference_count", len(references))
+    logger.info("Prefetched %d referenced issue(s) and pull request(s)", len(references))
+    return tuple(references)
+
+
+def fetch_new_comments(issue: GithubIssue, since: str) -> GithubIssue:
+    """
+    Return `issue` with the comments created or edited since the ISO 8601 `since` timestamp merged in.
+
+    Only the comments endpoint is queried (filtered server-side by `since`), so a follow-up stage
+    sees what the previous stage posted without refetching the whole issue.
+    """
+    client = get_github_client()
+    path = f"repos/{issue.owner}/{issue.repo}/issues/{issue.number}/comments"
+    with span("github.list_new_comments", since=since) as request_span:
+        new_comments = [_comment_from_rest(c) for page in client.paginate(path, params={"since": since}) for c in page]
+        request_span.set_attribute("comment_count", len(new_comments))
+    if not new_comments:
+        return issue
+    # edited comments come back too, replace them in place rather than appending duplicates
+    comments = {(comment.author, comment.created_at): comment for comment in issue.comments}
+    for comment in new_comments:
+        key = (comment.author, comment.created_at)
+        # the REST API does not report minimization, keep what the full fetch saw
+        previous = comments.get(key)
+        comments[key] = replace(comment, is_minimized=previous.is_minimized) if previous else comment
+    logger.info("Fetched %d new or edited comment(s) on issue #%d", len(new_comments), issue.number)
+    return replace(issue, comments=tuple(comments.values()))
+
+
+def _parse_timestamp(value: str) -> datetime:
+    timestamp = datetime.fromisoformat(value)
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=UTC)
+
+
+def filter_comments(comments: Iterable[IssueComment], comment_filter: CommentFilter) -> Iterator[IssueComment]:
+    """Yield the comments accepted by the given filter."""
+    since = _parse_timestamp(comment_filter.since) if comment_filter.since else None
+    for comment in comments:
+        if comment_filter.skip_bots and (comment.is_bot or comment.author.endswith("[bot]")):
+            continue
+        if comment_filter.skip_minimized and comment.is_minimized:
+            continue
+        if since and comment.created_at and _parse_timestamp(comment.created_at) < since:
+            continue
+        yield comment
+
+
+def iter_comment_sections(
+    comments: Iterable[IssueComment], comment_filter: CommentFilter | None = None
+) -> Iterator[str]:
+    """Yield a 'Comment by @user' section for each comment accepted by the filter."""
+    if comment_filter:
+        comments = filter_comments(comments, comment_filter)
+    for comment in comments:
+        yield f"Comment by @{comment.author}:\n{comment.body}"
+
+
+def format_references(references: Iterable[IssueReference]) -> str:
+    """Render referenced issues and PRs as one line each, empty when there are none."""
+    lines = []
+    for reference in references:
+        kind = "pull request" if reference.is_pull_request else "issue"
+        status = f"{reference.state} {kind}" if reference.state else kind
+        via = f", {reference.depth} references away" if reference.depth > 1 else ""
+        summary = f": {reference.summary}" if reference.summary else ""
+        lines.append(
+            f"- {reference.owner}/{reference.repo}#{reference.number} ({status}{via}) {reference.title}{summary}"
+        )
+    return "Referenced issues and pull requests:\n" + "\n".join(lines) if lines else ""
+
+
+def format_issue_content(issue: GithubIssue, comment_filter: CommentFilter | None = None) -> str:
+    """Combine an issue description, its comments and summaries of the issues it references into a single string."""
+    issue_text = f"{issue.title}\n{issue.body}".strip()
+    comments_text = "\n---\n".join(iter_comment_sections(issue.comments, comment_filter))
+
+    sections = [f"Issue #{issue.number}:\n{issue_text}"]
+    if comments_text:
+        sections.append("Comments:\n" + comments_text)
+    if issue.references:
+        sections.append(format_references(issue.references))
     return "\n\n".join(sections)
 
 
+def fetch_github_issue(github_issue_url: str, options: FetchOptions | None = None) -> str:
+    """Fetch a GitHub issue description and all comments, combined into a single string."""
+    return format_issue_content(fetch_issue(github_issue_url, options), options.comment_filter if options else None)
+
+
 DEFAULT_SKILLS_DIR = Path.home() / ".openclaw" / "workspace" / "skills"
 OPENCLAW_CONFIG_PATH = Path.home() / ".openclaw" / "openclaw.json"
+SKILLS_MANIFEST_NAME = ".askcc-skills.json"
 
 
-def install_skills(directory: Path | None = None) -> None:
-    """Copy bundled skills to the target directory and register them in openclaw.json."""
-    target_dir = directory or DEFAULT_SKILLS_DIR
-    skills_source = package_files("askcc") / "skills"
+def _bundled_skills() -> dict[str, dict[str, Traversable]]:
+    """Map each bundled skill to its files, by path relative to the skill directory."""
 
-    # Copy each skill directory
-    for skill_dir in sorted(skills_source.iterdir(), key=lambda p: p.name):
-        if not skill_dir.is_dir() or skill_dir.name.startswith("__"):
-            continue
-        dest = target_dir / skill_dir.name
-        if dest.exists():
-            shutil.rmtree(dest)
-        shutil.copytree(str(skill_dir), dest)
-        logger.info("Installed skill '%s' to %s", skill_dir.name, dest)
+    def _walk(directory: Traversable, prefix: str) -> Iterator[tuple[str, Traversable]]:
+        for entry in directory.iterdir():
+            if entry.name.startswith("__"):  # package markers and bytecode caches
+                continue
+            if entry.is_dir():
+                yield from _walk(entry, f"{prefix}{entry.name}/")
+            else:
+                yield f"{prefix}{entry.name}", entry
 
-        # Register in openclaw.json
-        _register_skill(skill_dir.name)
+    skills_source = package_files("askcc") / "skills"
+    return {
+        skill_dir.name: dict(sorted(_walk(skill_dir, "")))
+        for skill_dir in sorted(skills_source.iterdir(), key=lambda p: p.name)
+        if skill_dir.is_dir() and not skill_dir.name.startswith("__")
+    }
 
 
-def _register_skill(skill_name: str) -> None:
-    """Add a skill entry to ~/.openclaw/openclaw.json."""
+def _is_installed(path: Path, entry: dict | None, digest: str) -> bool:
+    """Whether `path` still is the file recorded in the manifest `entry`, with content `digest`."""
+    if not entry or entry["sha256"] != digest:
+        return False
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return False
+    # a file changed or replaced since the install has another size or mtime, no need to read it back
+    return stat.st_size == entry["size"] and stat.st_mtime_ns == entry["mtime_ns"]
+
+
+def _install_file(source: Traversable, path: Path) -> None:
+    """Hardlink (or copy) `source` to `path`, replacing it atomically."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f".{path.name}.tmp")
+    temp_path.unlink(missing_ok=True)
+    linked = False
+    if isinstance(source, Path):  # not inside a zip archive
+        with contextlib.suppress(OSError):  # another filesystem, or hardlinks are not supported
+            os.link(source, temp_path)
+            linked = True
+    if not linked:
+        temp_path.write_bytes(source.read_bytes())
+    temp_path.replace(path)
+
+
+def _sync_skill(
+    skill_dir: Path, files: dict[str, Traversable], installed: dict[str, dict], *, check: bool
+) -> tuple[dict[str, dict], list[str]]:
+    """Bring `skill_dir` in line with the bundled `files`, return its manifest entries and the files changed."""
+    entries = {}
+    changes = []
+    for relative_path, source in files.items():
+        path = skill_dir / relative_path
+        digest = hashlib.sha256(source.read_bytes()).hexdigest()
+        if _is_installed(path, installed.get(relative_path), digest):
+            entries[relative_path] = installed[relative_path]
+            continue
+        changes.append(f"{skill_dir.name}/{relative_path}")
+        if not check:
+            _install_file(source, path)
+            stat = path.stat()
+            entries[relative_path] = {"sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    for relative_path in sorted(installed.keys() - files.keys()):
+        changes.append(f"{skill_dir.name}/{relative_path} (removed)")
+        if not check:
+            (skill_dir / relative_path).unlink(missing_ok=True)
+    if changes and not check:
+        logger.info("Installed skill '%s' to %s", skill_dir.name, skill_dir)
+    return entries, changes
+
+
+def install_skills(directory: Path | None = None, *, check: bool = False) -> list[str]:
+    """
+    Sync bundled skills to the target directory and register them in openclaw.json.
+
+    A manifest in the target directory records the content hash of every installed file, so only the
+    files that changed since the last install, or were modified or deleted in the target directory, are
+    written. With `check`, nothing is written. Returns the files and registry entries that were (or
+    with `check` would be) updated.
+    """
+    target_dir = directory or DEFAULT_SKILLS_DIR
+    manifest_path = target_dir / SKILLS_MANIFEST_NAME
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        manifest = {}
+
+    bundled = _bundled_skills()
+    changes = []
+    updated_manifest = {}
+    for skill_name, files in bundled.items():
+        updated_manifest[skill_name], skill_changes = _sync_skill(
+            target_dir / skill_name, files, manifest.get(skill_name, {}), check=check
+        )
+        changes += skill_changes
+    if not check and updated_manifest != manifest:
+        target_dir.mkdir(parents=True, exist_ok=True)
+        write_atomically(manifest_path, json.dumps(updated_manifest, indent=2) + "\n")
+    changes += _register_skills(list(bundled), check=check)
+
+    if not changes:
+        logger.info("Skills in %s are up to date", target_dir)
+    elif check:
+        for change in changes:
+            logger.warning("Out of date: %s", change)
+    return changes
+
+
+def _register_skills(skill_names: list[str], *, check: bool = False) -> list[str]:
+    """Add skill entries to ~/.openclaw/openclaw.json in a single atomic write, return the entries added."""
     config_path = OPENCLAW_CONFIG_PATH
     if not config_path.exists():
+        if check:
+            # nothing is registered yet, which is what --check reports
+            return [f"{config_path} entry '{skill_name}' (file not found)" for skill_name in skill_names]
         msg = f"{config_path} not found, could not install"
         raise ValueError(msg)
 
@@ -106,14 +631,36 @@ def _register_skill(skill_name: str) -> None:
 
     skills = config.setdefault("skills", {})
     entries = skills.setdefault("entries", {})
-    entries[skill_name] = {"enabled": True}
-
-    config_path.write_text(json.dumps(config, indent=2) + "\n")
-    logger.info("Registered skill '%s' in %s", skill_name, config_path)
+    missing = [skill_name for skill_name in skill_names if entries.get(skill_name) != {"enabled": True}]
+    if not missing or check:
+        return [f"{config_path} entry '{skill_name}'" for skill_name in missing]
+    for skill_name in missing:
+        entries[skill_name] = {"enabled": True}
+
+    # OpenClaw may read the file at any time, it never sees a partial write
+    write_atomically(config_path, json.dumps(config, indent=2) + "\n")
+    logger.info("Registered skill(s) %s in %s", ", ".join(f"'{name}'" for name in missing), config_path)
+    return [f"{config_path} entry '{skill_name}'" for skill_name in missing]
+
+
+def _templates_manifest() -> str:
+    """Describe the expected template set and the current state of TEMPLATES_DIR."""
+    # adding or removing a file changes the directory mtime, which invalidates the manifest
+    file_names = sorted(
+        name for config in AGENT_CONFIGS.values() for name in (config.system_prompt_file, config.user_prompt_file)
+    )
+    return f"{TEMPLATES_DIR.stat().st_mtime_ns}\n" + "\n".join(file_names) + "\n"
 
 
 def bootstrap_templates() -> None:
     """Create TEMPLATES_DIR with default template files if they are missing."""
+    manifest_path = TEMPLATES_DIR.with_name(f".{TEMPLATES_DIR.name}.manifest")
+    try:
+        if manifest_path.read_text() == _templates_manifest():
+            return
+    except FileNotFoundError:
+        pass
+
     TEMPLATES_DIR.mkdir(parents=True, exist_ok=True)
     created_any = False
     for config in AGENT_CONFIGS.values():
@@ -126,38 +673,40 @@ def bootstrap_templates() -> None:
                 created_any = True
     if created_any:
         logger.info("Created default templates in %s", TEMPLATES_DIR)
+    manifest_path.write_text(_templates_manifest())
 
 
 def load_template(file_name: str, default: str) -> str:
     """Read a template file from TEMPLATES_DIR, falling back to the default on missing file."""
-    path = TEMPLATES_DIR / file_name
-    try:
-        return path.read_text()
-    except FileNotFoundError:
-        logger.warning("Template file not found: %s — using built-in default", path)
-        return default
+    return TEMPLATE_REGISTRY.get(TEMPLATES_DIR / file_name, default).text
 
 
 def validate_template(template_text: str, required_variables: tuple[str, ...], file_name: str) -> None:
     """Validate that a template contains all required $variables."""
-    # Template identifiers are words preceded by $ (or ${...})
-    # We check by attempting substitution with sentinel values
-    tpl = Template(template_text)
-    for var in required_variables:
-        sentinel = f"__SENTINEL_{var}__"
-        result = tpl.safe_substitute({var: sentinel})
-        if sentinel not in result:
-            msg = f"Template '{file_name}' is missing required variable '${var}'"
-            raise ValueError(msg)
+    missing_variables = compile_template(template_text).missing_variables(required_variables)
+    if missing_variables:
+        msg = f"Template '{file_name}' is missing required variable '${missing_variables[0]}'"
+        raise ValueError(msg)
 
 
 def load_agent_config(agent: AgentType) -> AgentConfig:
     """Load an AgentConfig with templates read from disk, falling back to built-in defaults."""
     base = AGENT_CONFIGS[agent]
-    user_prompt_template = load_template(base.user_prompt_file, base.user_prompt_template)
-    validate_template(user_prompt_template, base.required_variables, base.user_prompt_file)
+    user_prompt_template = TEMPLATE_REGISTRY.get(TEMPLATES_DIR / base.user_prompt_file, base.user_prompt_template)
+    validate_template(user_prompt_template.text, base.required_variables, base.user_prompt_file)
     return replace(
         base,
         system_prompt=load_template(base.system_prompt_file, base.system_prompt),
-        user_prompt_template=user_prompt_template,
+        user_prompt_template=user_prompt_template.text,
     )
+
+
+def validate_agent_templates() -> dict[AgentType, str]:
+    """Load the templates of every agent and return the validation error of each agent that has one."""
+    errors = {}
+    for agent in AgentType:
+        try:
+            load_agent_config(agent)
+        except ValueError as e:
+            errors[agent] = str(e)
+    return errors
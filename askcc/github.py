@@ -0,0 +1,431 @@
+from __future__ import annotations
+
+import functools
+import http.client
+import json
+import logging
+import os
+import queue
+import re
+import shutil
+import subprocess
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Any, Protocol
+from urllib.parse import urlencode, urljoin, urlsplit
+
+from .ratelimit import RateLimiter
+from .settings import GITHUB_API_URL, GITHUB_BACKEND
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+HTTP_OK = 200
+HTTP_BAD_REQUEST = 400
+HTTP_FORBIDDEN = 403
+HTTP_TOO_MANY_REQUESTS = 429
+TRANSIENT_STATUS_CODES = frozenset({HTTP_TOO_MANY_REQUESTS, 500, 502, 503, 504})
+DEFAULT_POOL_SIZE = 8
+DEFAULT_TIMEOUT_SECONDS = 30.0
+USER_AGENT = "askcc"
+PAGINATE_READ_SIZE = 64 * 1024
+_JSON_STRUCTURAL = re.compile(r'[\[\]{}"]')
+_JSON_STRING_SPECIAL = re.compile(r'["\\]')
+_GH_HTTP_STATUS = re.compile(r"\(HTTP (\d{3})\)")
+_GH_CONNECTION_ERROR = "error connecting to"  # gh's message when the API host cannot be reached
+REST_RESOURCE = "core"
+GRAPHQL_RESOURCE = "graphql"
+
+
+class GithubAPIError(Exception):
+    """Raised when a GitHub API request fails."""
+
+    def __init__(self, message: str, status_code: int = 0, headers: dict[str, str] | None = None) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+        self.headers = headers or {}
+
+    @property
+    def is_rate_limited(self) -> bool:
+        """Whether GitHub rejected the request because a primary or secondary rate limit was exceeded."""
+        if self.status_code == HTTP_TOO_MANY_REQUESTS:
+            return True
+        # primary rate limits exhaust x-ratelimit-remaining, secondary rate limits send retry-after
+        return self.headers.get("x-ratelimit-remaining") == "0" or "retry-after" in self.headers
+
+    @property
+    def is_transient(self) -> bool:
+        """Whether the request may succeed if retried later: rate limits and server errors."""
+        # no status means gh failed before any HTTP response (e.g. not authenticated), retrying cannot help;
+        # connection failures are raised as ConnectionError instead
+        return self.status_code in TRANSIENT_STATUS_CODES or self.is_rate_limited
+
+
+@dataclass(frozen=True)
+class GithubResponse:
+    status_code: int
+    headers: dict[str, str] = field(default_factory=dict)  # header names are lower-cased
+    body: str = ""
+
+    def json(self) -> Any:  # noqa: ANN401
+        return json.loads(self.body)
+
+
+class GithubClient(Protocol):
+    def get(
+        self, path: str, *, params: dict[str, Any] | None = None, headers: dict[str, str] | None = None
+    ) -> GithubResponse:
+        """GET a REST API path; 304 responses are returned, errors (>= 400) raise GithubAPIError."""
+        ...
+
+    def paginate(self, path: str, *, params: dict[str, Any] | None = None) -> Iterator[list[dict]]:
+        """Yield each page of a paginated REST API list endpoint."""
+        ...
+
+    def graphql(self, query: str, variables: dict[str, Any]) -> dict:
+        """Run a GraphQL query and return its 'data' member."""
+        ...
+
+
+def _with_params(path: str, params: dict[str, Any] | None) -> str:
+    if not params:
+        return path
+    return f"{path}{'&' if '?' in path else '?'}{urlencode(params)}"
+
+
+def iter_json_documents(chunks: Iterable[str]) -> Iterator[Any]:
+    """
+    Incrementally decode a stream of concatenated JSON arrays/objects, such as `gh api --paginate` output.
+
+    Each document is decoded as soon as its closing bracket arrives and its text is then released,
+    so memory is bounded by the size of a single document (page) rather than the whole stream.
+    """
+    buffer = ""
+    position = 0  # scan position within buffer
+    depth = 0
+    in_string = False
+    for chunk in chunks:
+        buffer += chunk
+        while True:
+            match = (_JSON_STRING_SPECIAL if in_string else _JSON_STRUCTURAL).search(buffer, position)
+            if not match:
+                position = len(buffer)
+                break
+            char = match.group()
+            if char == "\\":
+                if match.end() == len(buffer):  # escape sequence split across chunks, wait for more data
+                    position = match.start()
+                    break
+                position = match.end() + 1
+                continue
+            position = match.end()
+            if char == '"':
+                in_string = not in_string
+            elif char in "[{":
+                depth += 1
+            else:
+                depth -= 1
+                if not depth:
+                    yield json.loads(buffer[:position])
+                    buffer = buffer[position:]
+                    position = 0
+    if buffer.strip():
+        msg = f"Truncated JSON stream: {buffer[:80]!r}"
+        raise ValueError(msg)
+
+
+def _send_rate_limited(
+    rate_limiter: RateLimiter | None, resource: str, send: Callable[[], GithubResponse]
+) -> GithubResponse:
+    """
+    Send a request through `rate_limiter`, recording the rate limit headers of its response.
+
+    Rate limited requests are retried once the limit resets, for up to the limiter's max_wait.
+    """
+    if rate_limiter is None:
+        return send()
+    deadline = time.monotonic() + rate_limiter.max_wait
+    while True:
+        with rate_limiter.slot(resource, deadline) as slot:
+            try:
+                response = send()
+            except GithubAPIError as e:
+                slot.record(e.headers, rate_limited=e.is_rate_limited)
+                if not e.is_rate_limited or time.monotonic() + rate_limiter.wait_seconds(resource) > deadline:
+                    raise
+                logger.warning("GitHub rate limit exceeded, retrying once it resets: %s", e)
+                continue
+            slot.record(response.headers)
+            return response
+
+
+def _gh_status_code(stderr: str) -> int:
+    """Return the HTTP status gh reports in its error message, e.g. "... (HTTP 403)", or 0."""
+    match = _GH_HTTP_STATUS.search(stderr)
+    return int(match.group(1)) if match else 0
+
+
+def _gh_error(msg: str, status_code: int, headers: dict[str, str] | None, stderr: str) -> Exception:
+    """Return the exception for a failed gh call, a ConnectionError if gh could not reach GitHub at all."""
+    if not status_code and _GH_CONNECTION_ERROR in stderr:
+        return ConnectionError(msg)
+    return GithubAPIError(msg, status_code, headers)
+
+
+def _require_gh_cli() -> str:
+    """Return the path to the gh CLI, raising if not found."""
+    gh_path = shutil.which("gh")
+    if not gh_path:
+        msg = "'gh' CLI is not installed or not on PATH. Install it from https://cli.github.com/"
+        raise FileNotFoundError(msg)
+    return gh_path
+
+
+def _parse_gh_include_output(output: str) -> tuple[int, dict[str, str], str]:
+    """Parse the status code, headers and body from `gh api --include` output."""
+    head, _, body = output.replace("\r\n", "\n").partition("\n\n")
+    lines = head.splitlines()
+    status_code = int(lines[0].split()[1]) if lines and lines[0].startswith("HTTP/") else 0
+    headers = {}
+    for line in lines[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    return status_code, headers, body
+
+
+class GhCliClient:
+    """GitHub client that shells out to the gh CLI, reusing its authentication."""
+
+    def __init__(self, gh: str | None = None, *, rate_limiter: RateLimiter | None = None) -> None:
+        self.gh = gh or _require_gh_cli()
+        self.rate_limiter = rate_limiter
+
+    def _get(self, path: str, params: dict[str, Any] | None, headers: dict[str, str] | None) -> GithubResponse:
+        cmd = [self.gh, "api", "--include", _with_params(path, params)]
+        for name, value in (headers or {}).items():
+            cmd.extend(["-H", f"{name}: {value}"])
+        result = subprocess.run(cmd, capture_output=True, text=True, check=False)  # noqa: S603
+        status_code, response_headers, body = _parse_gh_include_output(result.stdout)
+        if status_code >= HTTP_BAD_REQUEST or not status_code:
+            msg = f"gh api {path} failed ({status_code or result.returncode}): {result.stderr.strip()}"
+            raise _gh_error(msg, status_code, response_headers, result.stderr)
+        return GithubResponse(status_code, response_headers, body)
+
+    def get(
+        self, path: str, *, params: dict[str, Any] | None = None, headers: dict[str, str] | None = None
+    ) -> GithubResponse:
+        return _send_rate_limited(self.rate_limiter, REST_RESOURCE, lambda: self._get(path, params, headers))
+
+    def _paginate(self, path: str, params: dict[str, Any] | None) -> Iterator[list[dict]]:
+        # gh writes one JSON array per page back to back, decode them one at a time as they arrive
+        with subprocess.Popen(  # noqa: S603
+            [self.gh, "api", "--paginate", _with_params(path, params)],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+        ) as process:
+            stdout, stderr_pipe = process.stdout, process.stderr
+            assert stdout is not None
+            assert stderr_pipe is not None
+            yield from iter_json_documents(iter(lambda: stdout.read(PAGINATE_READ_SIZE), ""))
+            stderr = stderr_pipe.read()
+        if process.returncode:
+            msg = f"gh api --paginate {path} failed ({process.returncode}): {stderr.strip()}"
+            raise _gh_error(msg, _gh_status_code(stderr), None, stderr)
+
+    def paginate(self, path: str, *, params: dict[str, Any] | None = None) -> Iterator[list[dict]]:
+        if self.rate_limiter is None:
+            yield from self._paginate(path, params)
+            return
+        # gh requests the pages one after another and does not report their headers, it holds a single slot
+        with self.rate_limiter.slot(REST_RESOURCE):
+            yield from self._paginate(path, params)
+
+    def _graphql(self, cmd: list[str]) -> GithubResponse:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=False)  # noqa: S603
+        status_code, response_headers, body = _parse_gh_include_output(result.stdout)
+        if result.returncode:
+            msg = f"gh api graphql failed ({result.returncode}): {result.stderr.strip()}"
+            # gh reports errors in an otherwise successful GraphQL response with a "GraphQL:" prefix
+            if result.stderr.startswith("GraphQL:"):
+                status_code = HTTP_OK
+            raise _gh_error(msg, status_code, response_headers, result.stderr)
+        return GithubResponse(status_code, response_headers, body)
+
+    def graphql(self, query: str, variables: dict[str, Any]) -> dict:
+        cmd = [self.gh, "api", "graphql", "--include", "-f", f"query={query}"]
+        for name, value in variables.items():
+            if value is None:
+                continue
+            # -F sends typed values (numbers, booleans), -f always sends strings
+            cmd.extend(["-f" if isinstance(value, str) else "-F", f"{name}={value}"])
+        response = _send_rate_limited(self.rate_limiter, GRAPHQL_RESOURCE, lambda: self._graphql(cmd))
+        return response.json().get("data") or {}
+
+
+@functools.cache
+def resolve_github_token() -> str | None:
+    """Return a GitHub token from GH_TOKEN/GITHUB_TOKEN, falling back to `gh auth token`. Resolved once."""
+    token = os.getenv("GH_TOKEN") or os.getenv("GITHUB_TOKEN")
+    if token:
+        return token
+    gh = shutil.which("gh")
+    if not gh:
+        return None
+    result = subprocess.run([gh, "auth", "token"], capture_output=True, text=True, check=False)  # noqa: S603
+    return result.stdout.strip() or None
+
+
+class GithubHttpClient:
+    """
+    In-process GitHub client using pooled, keep-alive HTTP/1.1 connections.
+
+    Connections are returned to the pool after each request so that subsequent requests
+    (including from other threads) skip the TCP and TLS handshakes.
+    """
+
+    def __init__(
+        self,
+        base_url: str = GITHUB_API_URL,
+        token: str | None = None,
+        *,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: float = DEFAULT_TIMEOUT_SECONDS,
+        rate_limiter: RateLimiter | None = None,
+    ) -> None:
+        parsed = urlsplit(base_url.rstrip("/"))
+        self.scheme = parsed.scheme
+        self.host = parsed.netloc
+        self.base_path = parsed.path
+        self.token = token
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self._pool: queue.LifoQueue[http.client.HTTPConnection] = queue.LifoQueue(maxsize=pool_size)
+
+    @property
+    def graphql_path(self) -> str:
+        # GitHub Enterprise serves REST under /api/v3 and GraphQL under /api/graphql
+        if self.base_path.endswith("/v3"):
+            return self.base_path.removesuffix("/v3") + "/graphql"
+        return self.base_path + "/graphql"
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, timeout=self.timeout)
+
+    def _acquire(self) -> http.client.HTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    def _release(self, connection: http.client.HTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(connection)
+        except queue.Full:
+            connection.close()
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def _request(
+        self, method: str, url: str, *, body: bytes | None = None, headers: dict[str, str] | None = None
+    ) -> GithubResponse:
+        resource = GRAPHQL_RESOURCE if url == self.graphql_path else REST_RESOURCE
+        return _send_rate_limited(
+            self.rate_limiter, resource, lambda: self._send(method, url, body=body, headers=headers)
+        )
+
+    def _send(
+        self, method: str, url: str, *, body: bytes | None = None, headers: dict[str, str] | None = None
+    ) -> GithubResponse:
+        request_headers = {
+            "Accept": "application/vnd.github+json",
+            "User-Agent": USER_AGENT,
+            **(headers or {}),
+        }
+        if self.token:
+            request_headers["Authorization"] = f"Bearer {self.token}"
+        # a pooled connection may have been closed by the server while idle, retry once on a fresh one
+        connection = self._acquire()
+        try:
+            connection.request(method, url, body=body, headers=request_headers)
+            response = connection.getresponse()
+        except (http.client.RemoteDisconnected, http.client.CannotSendRequest, ConnectionError):
+            connection.close()
+            connection = self._connect()
+            connection.request(method, url, body=body, headers=request_headers)
+            response = connection.getresponse()
+        data = response.read()
+        if response.will_close:
+            connection.close()
+        else:
+            self._release(connection)
+        response_headers = {name.lower(): value for name, value in response.getheaders()}
+        if response.status >= HTTP_BAD_REQUEST:
+            msg = f"GitHub API {method} {url} failed ({response.status}): {data.decode(errors='replace')[:200]}"
+            raise GithubAPIError(msg, response.status, response_headers)
+        return GithubResponse(response.status, response_headers, data.decode())
+
+    def _url(self, path: str) -> str:
+        return f"{self.base_path}/{path.lstrip('/')}"
+
+    def get(
+        self, path: str, *, params: dict[str, Any] | None = None, headers: dict[str, str] | None = None
+    ) -> GithubResponse:
+        return self._request("GET", _with_params(self._url(path), params), headers=headers)
+
+    def paginate(self, path: str, *, params: dict[str, Any] | None = None) -> Iterator[list[dict]]:
+        url: str | None = _with_params(self._url(path), {"per_page": 100, **(params or {})})
+        while url:
+            response = self._request("GET", url)
+            yield response.json()
+            url = _next_page_url(response.headers.get("link", ""))
+            if url:
+                next_url = urlsplit(urljoin(f"{self.scheme}://{self.host}", url))
+                url = f"{next_url.path}?{next_url.query}" if next_url.query else next_url.path
+
+    def graphql(self, query: str, variables: dict[str, Any]) -> dict:
+        body = json.dumps({"query": query, "variables": variables}).encode()
+        response = self._request("POST", self.graphql_path, body=body, headers={"Content-Type": "application/json"})
+        payload = response.json()
+        if payload.get("errors"):
+            msg = f"GitHub GraphQL query failed: {payload['errors'][0].get('message', payload['errors'])}"
+            raise GithubAPIError(msg, response.status_code, response.headers)
+        return payload.get("data") or {}
+
+
+def _next_page_url(link_header: str) -> str | None:
+    """Return the rel="next" URL from a Link header, if any."""
+    for link in link_header.split(","):
+        url, _, rel = link.partition(";")
+        if rel.strip() == 'rel="next"':
+            return url.strip().strip("<>")
+    return None
+
+
+@functools.cache
+def get_github_client() -> GithubClient:
+    """
+    Return the shared GitHub client for the configured GITHUB_BACKEND.
+
+    The "http" backend falls back to the gh CLI when no token can be resolved. Either way, requests go through
+    the RateLimiter shared by all askcc processes.
+    """
+    if GITHUB_BACKEND == "http":
+        token = resolve_github_token()
+        if token:
+            logger.debug("Using in-process GitHub HTTP client for %s", GITHUB_API_URL)
+            return GithubHttpClient(GITHUB_API_URL, token, rate_limiter=RateLimiter())
+        logger.warning("No GitHub token found in GH_TOKEN/GITHUB_TOKEN or `gh auth token`, falling back to gh CLI")
+    elif GITHUB_BACKEND != "gh":
+        msg = f"Unknown ASKCC_GITHUB_BACKEND '{GITHUB_BACKEND}', expected one of: gh, http"
+        raise ValueError(msg)
+    return GhCliClient(rate_limiter=RateLimiter())
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING, Self
+
+from .definitions import AgentType, JobRecord, JobStatus
+from .settings import JOBS_DB_PATH
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+    from pathlib import Path
+
+    from .definitions import BatchResult
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_SECONDS = 30.0  # other askcc processes may hold the write lock briefly
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    github_issue_url TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    status TEXT NOT NULL,
+    runs INTEGER NOT NULL DEFAULT 0,
+    exit_code INTEGER,
+    error TEXT,
+    queued_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    PRIMARY KEY (github_issue_url, agent)
+);
+CREATE INDEX IF NOT EXISTS jobs_agent_status ON jobs (agent, status);
+CREATE TABLE IF NOT EXISTS watermarks (
+    repository TEXT NOT NULL,
+    agent TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    PRIMARY KEY (repository, agent)
+);
+"""
+JOB_COLUMNS = "github_issue_url, agent, status, runs, exit_code, error, queued_at, started_at, finished_at"
+
+
+def _record_from_row(row: tuple) -> JobRecord:
+    github_issue_url, agent, status, *rest = row
+    return JobRecord(github_issue_url, AgentType(agent), JobStatus(status), *rest)
+
+
+class JobStore:
+    """
+    Persistent record of batch jobs keyed by (issue URL, agent), stored in SQLite.
+
+    WAL mode lets readers (e.g. a second askcc process checking progress) run while a batch is writing.
+    Jobs left QUEUED or RUNNING by an interrupted batch are picked up again with `unfinished()`, jobs that
+    finished with a non-zero exit code with `failed()`.
+    Repository sweeps keep a per (repository, agent) watermark of the last issue `updated_at` they processed.
+    """
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = path or JOBS_DB_PATH
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        # batch workers share the connection, statements are serialized with the lock
+        self._connection = sqlite3.connect(
+            self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA)
+            columns = {row[1] for row in self._connection.execute("PRAGMA table_info(jobs)")}
+            if "attempts" in columns:
+                # job stores created before the column counted runs rather than fetch attempts
+                self._connection.execute("ALTER TABLE jobs RENAME COLUMN attempts TO runs")
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def enqueue(self, github_issue_urls: Iterable[str], agent: AgentType) -> None:
+        """Queue jobs, resetting any earlier result for the same (issue URL, agent)."""
+        now = time.time()
+        with self._lock, self._connection:
+            self._connection.execute("BEGIN")
+            self._connection.executemany(
+                """
+                INSERT INTO jobs (github_issue_url, agent, status, queued_at) VALUES (?, ?, ?, ?)
+                ON CONFLICT (github_issue_url, agent) DO UPDATE SET
+                    status = excluded.status, runs = 0, exit_code = NULL, error = NULL,
+                    queued_at = excluded.queued_at, started_at = NULL, finished_at = NULL
+                """,
+                [(url, agent.value, JobStatus.QUEUED.value, now) for url in github_issue_urls],
+            )
+
+    def unfinished(self, agent: AgentType) -> list[str]:
+        """Return the issue URLs of jobs that were queued or interrupted while running, oldest first."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT github_issue_url FROM jobs WHERE agent = ? AND status != ? ORDER BY queued_at, rowid",
+                (agent.value, JobStatus.FINISHED.value),
+            ).fetchall()
+        return [url for (url,) in rows]
+
+    def failed(self, agent: AgentType) -> list[str]:
+        """Return the issue URLs of finished jobs that exited non-zero, oldest first."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT github_issue_url FROM jobs WHERE agent = ? AND status = ? AND exit_code != 0 "
+                "ORDER BY queued_at, rowid",
+                (agent.value, JobStatus.FINISHED.value),
+            ).fetchall()
+        return [url for (url,) in rows]
+
+    def mark_running(self, github_issue_url: str, agent: AgentType) -> None:
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, runs = runs + 1, started_at = ? WHERE github_issue_url = ? AND agent = ?",
+                (JobStatus.RUNNING.value, time.time(), github_issue_url, agent.value),
+            )
+
+    def mark_finished(self, agent: AgentType, result: BatchResult) -> None:
+        with self._lock:
+            self._connection.execute(
+                "UPDATE jobs SET status = ?, exit_code = ?, error = ?, finished_at = ? "
+                "WHERE github_issue_url = ? AND agent = ?",
+                (
+                    JobStatus.FINISHED.value,
+                    result.exit_code,
+                    result.error,
+                    time.time(),
+                    result.github_issue_url,
+                    agent.value,
+                ),
+            )
+
+    def get(self, github_issue_url: str, agent: AgentType) -> JobRecord | None:
+        with self._lock:
+            row = self._connection.execute(
+                f"SELECT {JOB_COLUMNS} FROM jobs WHERE github_issue_url = ? AND agent = ?",  # noqa: S608
+                (github_issue_url, agent.value),
+            ).fetchone()
+        return _record_from_row(row) if row else None
+
+    def watermark(self, repository: str, agent: AgentType) -> str | None:
+        """Return the `updated_at` up to which a sweep of the repository with this agent has processed issues."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT updated_at FROM watermarks WHERE repository = ? AND agent = ?", (repository, agent.value)
+            ).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, repository: str, agent: AgentType, updated_at: str) -> None:
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO watermarks (repository, agent, updated_at) VALUES (?, ?, ?) "
+                "ON CONFLICT (repository, agent) DO UPDATE SET updated_at = excluded.updated_at",
+                (repository, agent.value, updated_at),
+            )
@@ -0,0 +1,172 @@
+"""
+Span timing written as JSON lines, one OpenTelemetry (OTLP/JSON) shaped span per line.
+
+Metrics are disabled until `configure_metrics()` is given a path, and while disabled `span()` returns
+a shared no-op span, so instrumented code pays a function call and nothing else.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import functools
+import os
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Self
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+    from types import TracebackType
+
+SERVICE_NAME = "askcc"
+SPAN_KIND_INTERNAL = "SPAN_KIND_INTERNAL"
+STATUS_CODE_OK = "STATUS_CODE_OK"
+STATUS_CODE_ERROR = "STATUS_CODE_ERROR"
+
+_current_span_id: contextvars.ContextVar[str] = contextvars.ContextVar("askcc_span_id", default="")
+
+
+def _attribute_value(value: object) -> dict[str, Any]:
+    # OTLP/JSON encodes 64 bit integers as strings
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class _JsonLinesSink:
+    """Appends one JSON document per line, each written with a single O_APPEND write so processes can share a file."""
+
+    def __init__(self, path: Path) -> None:
+        from . import __version__  # noqa: PLC0415
+
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.trace_id = os.urandom(16).hex()  # one trace per askcc process
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        self._resource = {
+            "attributes": [
+                {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                {"key": "service.version", "value": {"stringValue": __version__}},
+                {"key": "process.pid", "value": {"intValue": str(os.getpid())}},
+            ]
+        }
+        self._lock = threading.Lock()
+
+    def write(self, span: Span) -> None:
+        import json  # noqa: PLC0415
+
+        record = {
+            "resource": self._resource,
+            "traceId": self.trace_id,
+            "spanId": span.span_id,
+            "parentSpanId": span.parent_span_id,
+            "name": span.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(span.start_time_ns),
+            "endTimeUnixNano": str(span.end_time_ns),
+            "attributes": [{"key": key, "value": _attribute_value(value)} for key, value in span.attributes.items()],
+            "status": {"code": span.status_code, **({"message": span.status_message} if span.status_message else {})},
+        }
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            os.write(self._fd, line)
+
+    def close(self) -> None:
+        with self._lock:
+            os.close(self._fd)
+
+
+_sink: _JsonLinesSink | None = None
+
+
+class Span:
+    """A timed operation, recorded when its `with` block exits. Exceptions mark the span as failed."""
+
+    def __init__(self, name: str, attributes: dict[str, object]) -> None:
+        self.name = name
+        self.attributes = attributes
+        self.span_id = os.urandom(8).hex()
+        self.parent_span_id = ""
+        self.start_time_ns = 0
+        self.end_time_ns = 0
+        self.status_code = STATUS_CODE_OK
+        self.status_message = ""
+        self._token: contextvars.Token[str] | None = None
+        self._start_ns = 0
+
+    def set_attribute(self, key: str, value: object) -> None:
+        self.attributes[key] = value
+
+    def __enter__(self) -> Self:
+        self.parent_span_id = _current_span_id.get()
+        self._token = _current_span_id.set(self.span_id)
+        self.start_time_ns = time.time_ns()
+        self._start_ns = time.perf_counter_ns()  # monotonic, the duration is not affected by clock adjustments
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, exc: BaseException | None, _traceback: TracebackType | None
+    ) -> None:
+        self.end_time_ns = self.start_time_ns + time.perf_counter_ns() - self._start_ns
+        if self._token is not None:
+            _current_span_id.reset(self._token)
+        if exc_type is not None and not issubclass(exc_type, SystemExit):
+            self.status_code = STATUS_CODE_ERROR
+            self.status_message = f"{exc_type.__name__}: {exc}"
+        if _sink is not None:
+            _sink.write(self)
+
+
+class NoopSpan:
+    """Stands in for a Span while metrics are disabled."""
+
+    def set_attribute(self, key: str, value: object) -> None:
+        pass
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        pass
+
+
+# what span() returns, for annotating code that is handed a span
+AnySpan = Span | NoopSpan
+
+_NOOP_SPAN = NoopSpan()
+
+
+def span(name: str, **attributes: object) -> AnySpan:
+    """Time the enclosed block as a span named `name`, a child of the span currently open in this context."""
+    if _sink is None:
+        return _NOOP_SPAN
+    return Span(name, attributes)
+
+
+def configure_metrics(path: Path | None) -> None:
+    """Write spans to `path` (JSON lines, appended), or disable metrics with None."""
+    global _sink  # noqa: PLW0603
+    if _sink is not None:
+        _sink.close()
+    _sink = _JsonLinesSink(path) if path else None
+
+
+def in_current_context(function: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Wrap `function` to run in a copy of the caller's context.
+
+    Worker threads start with an empty context, spans they open would otherwise have no parent.
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(function)
+    def wrapper(*args: object, **kwargs: object) -> Any:  # noqa: ANN401
+        # each call gets its own copy, a context cannot be entered by several threads at once
+        return context.copy().run(function, *args, **kwargs)
+
+    return wrapper
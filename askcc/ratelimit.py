@@ -0,0 +1,216 @@
+"""
+A GitHub rate limiter shared by all worker threads and askcc processes.
+
+GitHub reports the remaining request budget of each resource (core, graphql, search) in the
+X-RateLimit-Remaining/Limit/Reset headers, and asks clients to back off from secondary rate limits
+with Retry-After. The last reported budgets are kept in a state file under RATE_LIMIT_DIR, which acts
+as a token bucket: each request takes a token, and each response resets the bucket to what GitHub
+reported. Requests in flight are bounded by one lock file per slot, and fewer slots are used as the
+budget runs low. Once it is exhausted, requests wait for the reset instead of failing.
+"""
+
+from __future__ import annotations
+
+import fcntl
+import json
+import logging
+import math
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, TextIO
+
+from .metrics import span
+from .settings import (
+    GITHUB_MAX_CONCURRENCY,
+    GITHUB_RATE_LIMIT_MAX_WAIT,
+    GITHUB_SLOT_MAX_WAIT,
+    GITHUB_THROTTLE_BELOW,
+    RATE_LIMIT_DIR,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+    from .metrics import AnySpan
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKOFF_SECONDS = 60.0  # GitHub asks to wait at least a minute when a rate limit response gives no hint
+
+
+class RateLimitSlot:
+    """A request slot held by one GitHub request, which reports the rate limit headers of its response."""
+
+    def __init__(self, limiter: RateLimiter, resource: str, request_span: AnySpan) -> None:
+        self.limiter = limiter
+        self.resource = resource
+        self._span = request_span
+
+    def record(self, headers: dict[str, str], *, rate_limited: bool = False) -> None:
+        """Update the shared budget from the (lower-cased) response headers."""
+        budget = self.limiter.record(self.resource, headers, rate_limited=rate_limited)
+        if budget:
+            self._span.set_attribute("remaining", budget["remaining"])
+            self._span.set_attribute("limit", budget["limit"])
+        self._span.set_attribute("rate_limited", rate_limited)
+
+
+class RateLimiter:
+    """
+    Token bucket and concurrency limit for GitHub requests, with its state in files under `directory`.
+
+    Requests run at most `max_concurrency` at a time across all processes sharing `directory`, and at
+    proportionally fewer once less than `throttle_below` of a resource's budget remains. A request that
+    finds no free slot within `slot_max_wait` seconds is sent without one.
+    """
+
+    SLOT_POLL_SECONDS = 0.02
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        *,
+        max_concurrency: int = GITHUB_MAX_CONCURRENCY,
+        throttle_below: float = GITHUB_THROTTLE_BELOW,
+        max_wait: float = GITHUB_RATE_LIMIT_MAX_WAIT,
+        slot_max_wait: float = GITHUB_SLOT_MAX_WAIT,
+    ) -> None:
+        self.directory = directory or RATE_LIMIT_DIR
+        self.max_concurrency = max(1, max_concurrency)
+        self.throttle_below = throttle_below
+        self.max_wait = max_wait
+        self.slot_max_wait = slot_max_wait
+
+    @contextmanager
+    def _state(self) -> Iterator[dict[str, Any]]:
+        """Lock the shared state file and yield its content, changes are written back on exit."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with (self.directory / "state.json").open("a+") as state_file:
+            fcntl.flock(state_file, fcntl.LOCK_EX)  # released when the file is closed
+            state_file.seek(0)
+            try:
+                state = json.loads(state_file.read() or "{}")
+            except json.JSONDecodeError:
+                state = {}
+            state.setdefault("resources", {})
+            yield state
+            state_file.seek(0)
+            state_file.truncate()
+            state_file.write(json.dumps(state))
+
+    def concurrency(self, budget: dict[str, Any] | None) -> int:
+        """Return how many requests may be in flight with `budget` left."""
+        if not budget or not budget["limit"]:
+            return self.max_concurrency
+        fraction = budget["remaining"] / budget["limit"]
+        if fraction >= self.throttle_below:
+            return self.max_concurrency
+        return max(1, math.ceil(self.max_concurrency * fraction / self.throttle_below))
+
+    def wait_seconds(self, resource: str) -> float:
+        """Return how long requests to `resource` have to wait for the rate limit to allow them."""
+        with self._state() as state:
+            return self._wait_seconds(state, resource, time.time())
+
+    def _wait_seconds(self, state: dict[str, Any], resource: str, now: float) -> float:
+        wait = state.get("blocked_until", 0.0) - now
+        budget = state["resources"].get(resource)
+        if budget and budget["remaining"] <= 0:
+            wait = max(wait, budget["reset"] - now)
+        return max(0.0, wait)
+
+    def _take_token(self, resource: str) -> tuple[float, dict[str, Any] | None]:
+        """Take a token from the budget of `resource`, or return how long to wait until one is available."""
+        now = time.time()
+        with self._state() as state:
+            budget = state["resources"].get(resource)
+            if budget and budget["reset"] <= now:
+                # the window has reset, the budget is unknown again until the next response
+                del state["resources"][resource]
+                budget = None
+            wait = self._wait_seconds(state, resource, now)
+            if wait:
+                return wait, budget
+            if budget:
+                budget["remaining"] -= 1
+            return 0.0, budget
+
+    def _try_lock(self, index: int) -> TextIO | None:
+        lock_file = (self.directory / f"slot-{index}.lock").open("a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _acquire(self, resource: str, deadline: float) -> tuple[TextIO | None, dict[str, Any] | None, int]:
+        while True:
+            wait, budget = self._take_token(resource)
+            if not wait or time.monotonic() + wait > deadline:
+                # beyond the deadline the request is sent anyway, and fails with GitHub's rate limit error
+                break
+            logger.warning("GitHub %s rate limit reached, waiting %.0fs for it to reset ...", resource, wait)
+            time.sleep(wait)
+        concurrency = self.concurrency(budget)
+        slot_deadline = min(deadline, time.monotonic() + self.slot_max_wait)
+        while True:
+            for index in range(concurrency):
+                lock_file = self._try_lock(index)
+                if lock_file:
+                    return lock_file, budget, concurrency
+            if time.monotonic() >= slot_deadline:
+                # a holder may hang, e.g. a stalled paginated gh call, rather than block every other request
+                logger.warning(
+                    "No free GitHub request slot after %.0fs, sending the request without one", self.slot_max_wait
+                )
+                return None, budget, concurrency
+            time.sleep(self.SLOT_POLL_SECONDS)
+
+    @contextmanager
+    def slot(self, resource: str, deadline: float | None = None) -> Iterator[RateLimitSlot]:
+        """
+        Hold a request slot for `resource`, waiting (until the monotonic `deadline`) while its budget is exhausted.
+
+        The request is timed as a "github.request" span, along with the wait and the limiter's state.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.max_wait
+        with span("github.request", resource=resource) as request_span:
+            start = time.monotonic()
+            lock_file, budget, concurrency = self._acquire(resource, deadline)
+            request_span.set_attribute("wait_seconds", round(time.monotonic() - start, 3))
+            request_span.set_attribute("concurrency", concurrency)
+            request_span.set_attribute("slot", lock_file is not None)
+            if budget:
+                request_span.set_attribute("remaining", budget["remaining"])
+                request_span.set_attribute("limit", budget["limit"])
+            try:
+                yield RateLimitSlot(self, resource, request_span)
+            finally:
+                if lock_file:
+                    lock_file.close()  # releases the slot
+
+    def record(self, resource: str, headers: dict[str, str], *, rate_limited: bool = False) -> dict[str, Any] | None:
+        """Update the budget of `resource` from response headers, returning it when the headers reported one."""
+        now = time.time()
+        resource = headers.get("x-ratelimit-resource", resource)
+        remaining = headers.get("x-ratelimit-remaining", "")
+        limit = headers.get("x-ratelimit-limit", "")
+        reset = headers.get("x-ratelimit-reset", "")
+        retry_after = headers.get("retry-after", "")
+        with self._state() as state:
+            budget = None
+            if remaining.isdigit() and limit.isdigit() and reset.isdigit():
+                budget = {"remaining": int(remaining), "limit": int(limit), "reset": float(reset)}
+                previous = state["resources"].get(resource)
+                if previous and previous["reset"] == budget["reset"]:
+                    # responses arrive out of order, within a window the budget only goes down
+                    budget["remaining"] = min(budget["remaining"], previous["remaining"])
+                state["resources"][resource] = budget
+            if retry_after.isdigit():
+                state["blocked_until"] = max(state.get("blocked_until", 0.0), now + int(retry_after))
+            elif rate_limited and remaining != "0":
+                state["blocked_until"] = max(state.get("blocked_until", 0.0), now + DEFAULT_BACKOFF_SECONDS)
+        return budget
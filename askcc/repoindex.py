@@ -0,0 +1,331 @@
+"""
+A local index of a repository, to point agents at the files an issue is likely about.
+
+The index holds the tracked files of the commit checked out in --cwd: their paths, their top-level symbols,
+and an inverted index from the identifiers used in them to the files. It is kept per repository under
+REPO_INDEX_DIR and records the git tree it was built from. Files are keyed by their blob id, so when another
+commit is checked out only the files that differ from the indexed tree are read again.
+
+An issue is matched against the index by the file paths it mentions (including stack trace frames), the
+top-level symbols it names, and the identifiers it shares with each file, weighted by how rare they are.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import fcntl
+import hashlib
+import logging
+import math
+import re
+import sqlite3
+import subprocess
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import TYPE_CHECKING, Self
+
+from .definitions import RelevantFile
+from .metrics import span
+from .settings import RELEVANT_FILES_LIMIT, REPO_INDEX_DIR
+from .worktrees import WorktreeError, main_repository_root
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_SECONDS = 30.0
+MAX_INDEXED_FILE_BYTES = 1024 * 1024  # larger files (data, vendored bundles) are listed but not read
+BINARY_SNIFF_BYTES = 8192
+MAX_SYMBOLS_PER_FILE = 200
+MAX_AMBIGUOUS_MENTIONS = 3  # a mentioned name matching more files than this (e.g. __init__.py) is ignored
+MENTION_SCORE = 10.0
+MAX_MENTIONS_PER_FILE = 3
+SYMBOL_SCORE = 5.0
+MAX_TERM_FILE_FRACTION = 0.5  # identifiers used in more of the files (e.g. English words) do not count
+MIN_RELATIVE_SCORE = 0.2  # files scoring lower than this fraction of the best match are left out
+SQLITE_MAX_PARAMETERS = 500
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, blob TEXT NOT NULL, indexed INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS symbols (name TEXT NOT NULL, path TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+CREATE TABLE IF NOT EXISTS terms (term TEXT NOT NULL, path TEXT NOT NULL, count INTEGER NOT NULL);
+CREATE INDEX IF NOT EXISTS terms_term ON terms (term);
+CREATE INDEX IF NOT EXISTS terms_path ON terms (path);
+"""
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+# definitions starting in the first column, i.e. top-level, of the common languages
+SYMBOL_PATTERN = re.compile(
+    r"^(?:export\s+(?:default\s+)?)?(?:pub(?:\([\w:]+\))?\s+)?(?:async\s+)?"
+    r"(?:def|class|function|func|fn|struct|enum|trait|interface|type|module|const|let|var)\s+"
+    r"(?:\([^)]*\)\s*)?([A-Za-z_]\w*)",
+    re.MULTILINE,
+)
+# relative or absolute paths with an extension, e.g. `askcc/cli.py` or the file of a stack trace frame
+PATH_PATTERN = re.compile(r"(?:[\w.-]+/)*[\w-]+\.[A-Za-z]\w{0,9}\b")
+PATH_PART_PATTERN = re.compile(r"[A-Za-z0-9]+")
+
+
+def _git(*args: str, cwd: Path) -> bytes:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, check=True).stdout  # noqa: S603, S607
+
+
+def _tree_files(cwd: Path) -> dict[str, tuple[str, int]]:
+    """Map the path of each regular file in the HEAD tree of `cwd` to its blob id and size."""
+    files = {}
+    for entry in _git("ls-tree", "-r", "-l", "-z", "HEAD", cwd=cwd).split(b"\0"):
+        if not entry:
+            continue
+        info, _, path = entry.decode(errors="surrogateescape").partition("\t")
+        mode, object_type, blob, size = info.split()
+        if object_type == "blob" and mode != "120000":  # not a symlink
+            files[path] = (blob, int(size))
+    return files
+
+
+def _read_blobs(cwd: Path, blobs: list[str]) -> Iterator[tuple[str, bytes]]:
+    """Yield the content of each blob, read through a single `git cat-file --batch` process."""
+    process = subprocess.Popen(  # noqa: S603
+        ["git", "cat-file", "--batch"],  # noqa: S607
+        cwd=cwd,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+    )
+    assert process.stdin is not None  # noqa: S101
+    assert process.stdout is not None  # noqa: S101
+
+    def write_blob_ids() -> None:
+        with contextlib.suppress(BrokenPipeError), process.stdin:
+            process.stdin.writelines(f"{blob}\n".encode() for blob in blobs)
+
+    # written from another thread, cat-file blocks on a full stdout pipe while the ids are sent
+    writer = threading.Thread(target=write_blob_ids, name="askcc-cat-file", daemon=True)
+    writer.start()
+    try:
+        for _ in blobs:
+            header = process.stdout.readline().split()
+            if len(header) != 3:  # noqa: PLR2004  # "<id> missing"
+                continue
+            data = process.stdout.read(int(header[2]))
+            process.stdout.read(1)  # newline after the content
+            yield header[0].decode(), data
+    except BaseException:
+        process.kill()
+        raise
+    finally:
+        writer.join()
+        process.stdout.close()
+        process.wait()
+
+
+def _path_terms(path: str) -> list[str]:
+    return [part.lower() for part in PATH_PART_PATTERN.findall(path) if len(part) > 2]  # noqa: PLR2004
+
+
+def _analyze(path: str, content: bytes) -> tuple[list[str], Counter[str]] | None:
+    """Return the top-level symbols and the identifier counts of a text file, None for binary files."""
+    if b"\0" in content[:BINARY_SNIFF_BYTES]:
+        return None
+    text = content.decode(errors="replace")
+    symbols = list(dict.fromkeys(SYMBOL_PATTERN.findall(text)))[:MAX_SYMBOLS_PER_FILE]
+    terms = Counter(identifier.lower() for identifier in IDENTIFIER_PATTERN.findall(text))
+    terms.update(_path_terms(path))
+    return symbols, terms
+
+
+def _chunks(values: list[str]) -> Iterator[list[str]]:
+    for start in range(0, len(values), SQLITE_MAX_PARAMETERS):
+        yield values[start : start + SQLITE_MAX_PARAMETERS]
+
+
+class RepositoryIndex:
+    """
+    Paths, top-level symbols and identifiers of the files of one repository, stored in SQLite under `directory`.
+
+    Linked worktrees of a repository share its index. Updates are serialized across processes with a lock file.
+    """
+
+    def __init__(self, repository: Path, directory: Path | None = None) -> None:
+        self.repository = repository
+        self.directory = directory or REPO_INDEX_DIR
+        digest = hashlib.sha256(str(repository).encode()).hexdigest()[:12]
+        self.path = self.directory / f"{repository.name}-{digest}.db"
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def _indexed_tree(self) -> str | None:
+        row = self._connection.execute("SELECT value FROM state WHERE key = 'tree'").fetchone()
+        return row[0] if row else None
+
+    def update(self, cwd: Path) -> int:
+        """Bring the index in line with the commit checked out in `cwd`, return how many files were (re)indexed."""
+        tree = _git("rev-parse", "HEAD^{tree}", cwd=cwd).decode().strip()
+        if self._indexed_tree() == tree:
+            return 0
+        with self.path.with_suffix(".lock").open("a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)  # released when the file is closed
+            if self._indexed_tree() == tree:  # indexed by another process meanwhile
+                return 0
+            start = time.monotonic()
+            tree_files = _tree_files(cwd)
+            indexed = dict(self._connection.execute("SELECT path, blob FROM files").fetchall())
+            changed = [path for path, (blob, _size) in tree_files.items() if indexed.get(path) != blob]
+            stale = [path for path in indexed if path not in tree_files or indexed[path] != tree_files[path][0]]
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                for table in ("files", "symbols", "terms"):
+                    self._connection.executemany(f"DELETE FROM {table} WHERE path = ?", [(path,) for path in stale])  # noqa: S608
+                self._index_files(cwd, {path: tree_files[path] for path in changed})
+                self._connection.execute("INSERT OR REPLACE INTO state VALUES ('tree', ?)", (tree,))
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+        logger.info(
+            "Indexed %d changed file(s) of %s in %.1fs", len(changed), self.repository, time.monotonic() - start
+        )
+        return len(changed)
+
+    def _index_files(self, cwd: Path, files: dict[str, tuple[str, int]]) -> None:
+        paths_by_blob = defaultdict(list)
+        for path, (blob, size) in files.items():
+            if size <= MAX_INDEXED_FILE_BYTES:
+                paths_by_blob[blob].append(path)
+            else:
+                self._connection.execute("INSERT INTO files VALUES (?, ?, 0)", (path, blob))
+        for blob, content in _read_blobs(cwd, list(paths_by_blob)):
+            for path in paths_by_blob[blob]:
+                analysis = _analyze(path, content)
+                self._connection.execute("INSERT INTO files VALUES (?, ?, ?)", (path, blob, analysis is not None))
+                if analysis is None:
+                    continue
+                symbols, terms = analysis
+                self._connection.executemany("INSERT INTO symbols VALUES (?, ?)", [(name, path) for name in symbols])
+                self._connection.executemany(
+                    "INSERT INTO terms VALUES (?, ?, ?)", [(term, path, count) for term, count in terms.items()]
+                )
+
+    def _mentioned_files(self, text: str) -> Counter[str]:
+        """Count the mentions of indexed files in `text`, matching the longest path suffix that is indexed."""
+        paths_by_name = defaultdict(list)
+        for (path,) in self._connection.execute("SELECT path FROM files"):
+            paths_by_name[path.rsplit("/", 1)[-1]].append(path)
+        mentions: Counter[str] = Counter()
+        for mention in PATH_PATTERN.findall(text):
+            parts = mention.strip("./").split("/")
+            candidates = paths_by_name.get(parts[-1], [])
+            for start in range(len(parts)):
+                suffix = "/".join(parts[start:])
+                matches = [path for path in candidates if path == suffix or path.endswith(f"/{suffix}")]
+                if matches:
+                    if len(matches) <= MAX_AMBIGUOUS_MENTIONS:
+                        mentions.update(matches)
+                    break
+        return mentions
+
+    def _query(self, sql: str, values: list[str]) -> Iterator[tuple]:
+        for chunk in _chunks(values):
+            placeholders = ", ".join("?" * len(chunk))
+            yield from self._connection.execute(sql.format(placeholders=placeholders), chunk)
+
+    def relevant_files(self, text: str, limit: int = RELEVANT_FILES_LIMIT) -> list[RelevantFile]:
+        """Rank the indexed files by how much `text` (e.g. an issue) refers to them, best match first."""
+        scores: defaultdict[str, float] = defaultdict(float)
+        mentions = self._mentioned_files(text)
+        for path, count in mentions.items():
+            scores[path] += MENTION_SCORE * min(count, MAX_MENTIONS_PER_FILE)
+
+        identifiers = list(dict.fromkeys(IDENTIFIER_PATTERN.findall(text)))
+        symbols: defaultdict[str, list[str]] = defaultdict(list)
+        for name, path in self._query("SELECT name, path FROM symbols WHERE name IN ({placeholders})", identifiers):
+            symbols[path].append(name)
+            scores[path] += SYMBOL_SCORE
+
+        (file_count,) = self._connection.execute("SELECT COUNT(*) FROM files WHERE indexed").fetchone()
+        terms = list(dict.fromkeys(identifier.lower() for identifier in identifiers))
+        document_frequency = {
+            term: frequency
+            for term, frequency in self._query(
+                "SELECT term, COUNT(*) FROM terms WHERE term IN ({placeholders}) GROUP BY term", terms
+            )
+            if frequency <= file_count * MAX_TERM_FILE_FRACTION
+        }
+        matched_terms: defaultdict[str, list[tuple[float, str]]] = defaultdict(list)
+        sql = "SELECT term, path, count FROM terms WHERE term IN ({placeholders})"
+        for term, path, count in self._query(sql, list(document_frequency)):
+            # rare identifiers say more about a file than the ones used all over the repository
+            weight = math.log((file_count + 1) / document_frequency[term]) * (1 + math.log(count))
+            scores[path] += weight
+            matched_terms[path].append((weight, term))
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        ranked = [(path, score) for path, score in ranked if score >= ranked[0][1] * MIN_RELATIVE_SCORE]
+        return [
+            RelevantFile(
+                path=path,
+                score=round(score, 2),
+                mentioned=path in mentions,
+                symbols=tuple(symbols[path]),
+                terms=tuple(term for _weight, term in sorted(matched_terms[path], reverse=True)),
+            )
+            for path, score in ranked
+        ]
+
+
+def format_relevant_files(files: Iterable[RelevantFile], max_terms: int = 5) -> str:
+    """Render ranked files as a prompt section, empty when there are none."""
+    lines = []
+    for relevant_file in files:
+        reasons = []
+        if relevant_file.mentioned:
+            reasons.append("named in the issue")
+        if relevant_file.symbols:
+            reasons.append(f"defines {', '.join(relevant_file.symbols)}")
+        if relevant_file.terms:
+            reasons.append(f"uses {', '.join(relevant_file.terms[:max_terms])}")
+        lines.append(f"- {relevant_file.path} ({'; '.join(reasons)})")
+    if not lines:
+        return ""
+    return (
+        "Likely relevant files, ranked by a local index of the repository (a starting point, not a complete list):\n"
+        + "\n".join(lines)
+    )
+
+
+def relevant_files_section(cwd: Path | None, text: str, limit: int = RELEVANT_FILES_LIMIT) -> str:
+    """
+    Index the repository checked out in `cwd` and return the files `text` likely refers to as a prompt section.
+
+    Returns an empty section outside a git repository or when indexing fails, the run goes on without it.
+    """
+    cwd = cwd or Path.cwd()
+    with span("repo_index") as index_span:
+        try:
+            with RepositoryIndex(main_repository_root(cwd)) as index:
+                index_span.set_attribute("indexed_files", index.update(cwd))
+                files = index.relevant_files(text, limit)
+        except WorktreeError:
+            logger.debug("%s is not in a git repository, no relevant files listed", cwd)
+            return ""
+        except (OSError, sqlite3.Error, subprocess.CalledProcessError) as e:
+            logger.warning("Could not index the repository in %s, no relevant files listed: %s", cwd, e)
+            return ""
+        index_span.set_attribute("relevant_files", len(files))
+    return format_relevant_files(files)
@@ -0,0 +1,715 @@
+from __future__ import annotations
+
+import codecs
+import functools
+import io
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import replace
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import TYPE_CHECKING, cast
+
+from .budget import budget_issue_content, estimate_tokens
+from .cache import ResultCache, result_key
+from .definitions import DEFAULT_BATCH_JOBS, SINCE_AUTO, BatchResult
+from .functions import fetch_issue, fetch_new_comments, format_issue_content, list_repository_issues
+from .github import GithubAPIError
+from .metrics import in_current_context, span
+from .repoindex import relevant_files_section
+from .runs import archived_run
+from .settings import (
+    CLAUDE_STALL_TIMEOUT,
+    CLAUDE_TIMEOUT,
+    FETCH_MAX_ATTEMPTS,
+    FETCH_RETRY_BASE_DELAY,
+    FETCH_RETRY_MAX_DELAY,
+    PROMPT_ARGV_MAX_BYTES,
+    PROMPT_TRANSPORT,
+    REPO_INDEX,
+    WORKTREE_POOL_SIZE,
+)
+from .streaming import consume_stream
+from .supervisor import Watchdog, apply_resource_limits, wait_for_admission
+from .templates import compile_template
+from .worktrees import WorktreeError, get_pool, head_commit, repository_root, temporary_worktree
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable, Iterator, Sequence
+    from typing import TextIO
+
+    from .definitions import AgentConfig, AgentType, CommentFilter, FetchOptions, GithubIssue, RepositoryIssue
+    from .jobs import JobStore
+    from .runs import RunLog
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TRANSPORTS = ("auto", "argv", "stdin")
+# later pipeline stages ask GitHub for comments since the previous stage started, minus this margin
+# to tolerate clock skew; comments fetched twice are deduplicated
+PIPELINE_CLOCK_SKEW = timedelta(minutes=1)
+MAX_ARG_STRLEN = 128 * 1024  # Linux limit for a single command line argument
+TEE_BUFFER_SIZE = 64 * 1024  # largest chunk of claude's output held in memory while it is copied
+MAX_MEMOIZED_OUTPUT_BYTES = 4 * 1024 * 1024  # larger outputs are not kept for the result cache
+
+
+@functools.cache
+def _agents_argument(config: AgentConfig) -> str:
+    """Serialize the --agents definition for a config once, it is reused for every run of that agent."""
+    agent_definition = {config.agent_name: {"description": config.description, "prompt": config.system_prompt}}
+    agents_json = json.dumps(agent_definition)
+    if len(agents_json.encode()) >= MAX_ARG_STRLEN:
+        msg = (
+            f"System prompt '{config.system_prompt_file}' is too large to pass to claude "
+            f"({len(agents_json.encode())} bytes, the limit for a single argument is {MAX_ARG_STRLEN})"
+        )
+        raise ValueError(msg)
+    return agents_json
+
+
+def _use_stdin_transport(prompt: str) -> bool:
+    """Return True if the prompt should be piped through stdin rather than passed as an argument."""
+    if PROMPT_TRANSPORT not in PROMPT_TRANSPORTS:
+        msg = f"Unknown ASKCC_PROMPT_TRANSPORT '{PROMPT_TRANSPORT}', expected one of: {', '.join(PROMPT_TRANSPORTS)}"
+        raise ValueError(msg)
+    if PROMPT_TRANSPORT == "auto":
+        return len(prompt.encode()) > PROMPT_ARGV_MAX_BYTES
+    return PROMPT_TRANSPORT == "stdin"
+
+
+def _write_stdin(process: subprocess.Popen, prompt: str) -> None:
+    assert process.stdin is not None
+    try:
+        process.stdin.write(prompt)
+        process.stdin.close()
+    except BrokenPipeError:
+        logger.warning("claude exited before reading the whole prompt")
+
+
+class _Tee:
+    """Write through to a stream while keeping a copy of everything written, dropped once it exceeds `limit`."""
+
+    def __init__(self, stream: TextIO, limit: int) -> None:
+        self.stream = stream
+        self.limit = limit
+        self.captured: io.StringIO | None = io.StringIO()
+
+    def write(self, text: str) -> int:
+        if self.captured is not None:
+            if self.captured.tell() + len(text) > self.limit:
+                self.captured = None  # too large to store, memory stays bounded
+            else:
+                self.captured.write(text)
+        return self.stream.write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def run_claude(
+    prompt: str,
+    config: AgentConfig,
+    *,
+    cwd: Path | None = None,
+    stream: bool = False,
+    output: TextIO | None = None,
+    github_issue_url: str | None = None,
+) -> int:
+    """
+    Run claude CLI with the given prompt, streaming output to stdout/stderr (or writing it to `output`).
+
+    With `stream`, claude emits stream-json events which are parsed and rendered as they arrive,
+    and time-to-first-event, tool calls and token usage are logged when the run finishes.
+    Large prompts are piped through stdin so their size is not limited by the kernel's argument limits.
+    For configs with `memoize_results`, a successful run's output is stored and replayed instead of running
+    claude again while the system prompt, the rendered prompt and the commit checked out in `cwd` are unchanged.
+    Runs are archived with their output under RUNS_DIR, indexed by agent and `github_issue_url` (see `askcc history`).
+    """
+    use_stdin = _use_stdin_transport(prompt)
+    cmd = [
+        "claude",
+        "-p",
+        *(() if use_stdin else (prompt,)),
+        "--output-format",
+        "stream-json" if stream else "text",
+        "--dangerously-skip-permissions",
+        "--agents",
+        _agents_argument(config),
+    ]
+    if stream:
+        cmd.append("--verbose")  # required by claude for stream-json in print mode
+
+    with span(
+        "claude",
+        agent=config.agent_name,
+        transport="stdin" if use_stdin else "argv",
+        prompt_bytes=len(prompt.encode()),
+        stream=stream,
+    ) as claude_span:
+        result_cache = ResultCache() if config.memoize_results else None
+        key = ""
+        cached = None
+        if result_cache:
+            key = result_key(config.agent_name, config.system_prompt, prompt, head_commit(cwd or Path.cwd()))
+            cached = result_cache.get(key)
+        claude_span.set_attribute("result_cache", "disabled" if not result_cache else "hit" if cached else "miss")
+        if cached:
+            logger.info(
+                "Replaying '%s' result stored %s (exit code: %d), use --force to run Claude Code again",
+                config.agent_name,
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(cached.created_at)),
+                cached.exit_code,
+            )
+            (output or sys.stdout).write(cached.output)
+            return cached.exit_code
+
+        logger.info(
+            "Requesting '%s' from Claude Code (prompt via %s) ...", config.agent_name, "stdin" if use_stdin else "argv"
+        )
+        tee = _Tee(output or sys.stdout, MAX_MEMOIZED_OUTPUT_BYTES) if result_cache else None
+        with archived_run(config.agent_name, github_issue_url) as run_log:
+            return_code = _run_claude_process(
+                cmd,
+                prompt,
+                use_stdin=use_stdin,
+                cwd=cwd,
+                stream=stream,
+                output=cast("TextIO", tee) if tee else output,
+                run_log=run_log,
+            )
+            if run_log:
+                run_log.exit_code = return_code
+                claude_span.set_attribute("run_id", run_log.run_id)
+        claude_span.set_attribute("exit_code", return_code)
+    if result_cache and tee and tee.captured is not None and return_code == 0:
+        # failures may be transient, only successful results are replayed
+        result_cache.put(key, return_code, tee.captured.getvalue())
+    return return_code
+
+
+def _read_chunks(fd: int) -> Iterator[bytes]:
+    """Yield what arrives on a pipe, at most TEE_BUFFER_SIZE bytes at a time, until EOF."""
+    while chunk := os.read(fd, TEE_BUFFER_SIZE):
+        yield chunk
+
+
+def _copy_chunks(chunks: Iterable[bytes], out: TextIO, log: Callable[[bytes], None] | None) -> None:
+    """Decode and write each chunk to `out` as it arrives, and to `log` as is."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for chunk in chunks:
+        if log:
+            log(chunk)
+        out.write(decoder.decode(chunk))
+        out.flush()
+    out.write(decoder.decode(b"", final=True))
+
+
+def _logged_lines(lines: Iterable[str], run_log: RunLog | None) -> Iterator[str]:
+    for line in lines:
+        if run_log:
+            run_log.write_stdout(line.encode())
+        yield line
+
+
+def _run_claude_process(
+    cmd: list[str],
+    prompt: str,
+    *,
+    use_stdin: bool,
+    cwd: Path | None,
+    stream: bool,
+    output: TextIO | None,
+    run_log: RunLog | None = None,
+) -> int:
+    """
+    Run claude under a Watchdog, letting it write to stdout directly, or copying its output to `output` as it arrives.
+
+    With a `run_log`, stdout and stderr are also written to the run's compressed logs. Text output is copied
+    in chunks of at most TEE_BUFFER_SIZE bytes, so memory use does not grow with the size of the output.
+    Returns claude's exit code, or EXIT_TIMEOUT/EXIT_STALLED when the watchdog had to stop it.
+    """
+    wait_for_admission()
+    piped = stream or output is not None or run_log is not None
+    start = time.monotonic()
+    with subprocess.Popen(  # noqa: S603
+        cmd,
+        stdin=subprocess.PIPE if use_stdin else None,
+        stdout=subprocess.PIPE if piped else None,
+        stderr=subprocess.PIPE if run_log else None,
+        text=True,
+        bufsize=1,
+        cwd=cwd,
+        start_new_session=True,  # its own process group, so the watchdog can stop claude and its children together
+    ) as process:
+        apply_resource_limits(process.pid)
+        # claude only writes text output once it is done, stalls can only be detected in stream-json mode
+        with Watchdog(process, timeout=CLAUDE_TIMEOUT, stall_timeout=CLAUDE_STALL_TIMEOUT if stream else 0) as watchdog:
+            if use_stdin:
+                # write from a separate thread so a child producing output early cannot deadlock on a full pipe
+                threading.Thread(target=_write_stdin, args=(process, prompt), daemon=True).start()
+            stderr_thread = None
+            if run_log:
+                assert process.stderr is not None
+                stderr_thread = threading.Thread(
+                    target=_copy_chunks,
+                    args=(_read_chunks(process.stderr.fileno()), sys.stderr, run_log.write_stderr),
+                    daemon=True,
+                )
+                stderr_thread.start()
+            if not piped:
+                process.wait()
+            elif stream:
+                assert process.stdout is not None
+                lines = _logged_lines(watchdog.observe(process.stdout), run_log)
+                stats = consume_stream(lines, output or sys.stdout, start=start)
+            else:
+                assert process.stdout is not None
+                chunks = watchdog.observe(_read_chunks(process.stdout.fileno()))
+                _copy_chunks(chunks, output or sys.stdout, run_log.write_stdout if run_log else None)
+            if stderr_thread:
+                stderr_thread.join()
+    return_code = watchdog.exit_code()
+    if stream:
+        logger.info("Claude Code finished (exit code: %d): %s", return_code, stats.summary())
+    else:
+        logger.info("Claude Code finished (exit code: %d)", return_code)
+    return return_code
+
+
+def with_result_cache(config: AgentConfig, force: bool) -> AgentConfig:
+    """Apply --force, which runs claude even when a stored result exists, to a loaded config."""
+    return replace(config, memoize_results=False) if force else config
+
+
+def with_prompt_budget(config: AgentConfig, max_prompt_tokens: int | None) -> AgentConfig:
+    """Apply a --max-prompt-tokens override (0 disables trimming) to a loaded config."""
+    if max_prompt_tokens is None:
+        return config
+    return replace(config, max_prompt_tokens=max_prompt_tokens or None)
+
+
+def render_prompt(
+    config: AgentConfig,
+    issue: GithubIssue,
+    comment_filter: CommentFilter | None = None,
+    *,
+    cwd: Path | None = None,
+) -> str:
+    """
+    Render the user prompt template of the given config, trimming the issue to the config's token budget.
+
+    For configs with `index_repository` whose template uses $relevant_files, the files of the repository in `cwd`
+    the issue likely refers to are listed there.
+    """
+    with span("render_prompt", agent=config.agent_name, comment_count=len(issue.comments)) as render_span:
+        prompt = _render_prompt(config, issue, comment_filter, cwd)
+        render_span.set_attribute("prompt_bytes", len(prompt.encode()))
+    return prompt
+
+
+def _render_prompt(
+    config: AgentConfig, issue: GithubIssue, comment_filter: CommentFilter | None, cwd: Path | None
+) -> str:
+    template = compile_template(config.user_prompt_template)
+    relevant_files = ""
+    if config.index_repository and REPO_INDEX and "relevant_files" in template.identifiers:
+        relevant_files = relevant_files_section(cwd, format_issue_content(issue, comment_filter))
+    if not config.max_prompt_tokens:
+        return template.substitute(
+            issue_content=format_issue_content(issue, comment_filter), relevant_files=relevant_files
+        )
+
+    template_tokens = estimate_tokens(template.substitute(issue_content="", relevant_files=relevant_files))
+    issue_content, report = budget_issue_content(
+        issue, max_tokens=config.max_prompt_tokens - template_tokens, comment_filter=comment_filter
+    )
+    if report.dropped:
+        logger.info("Prompt budget for issue #%d: %s", issue.number, report.summary())
+    else:
+        logger.debug("Prompt budget for issue #%d: %s", issue.number, report.summary())
+    return template.substitute(issue_content=issue_content, relevant_files=relevant_files)
+
+
+def _is_transient(error: Exception) -> bool:
+    if isinstance(error, GithubAPIError):
+        return error.is_transient
+    return isinstance(error, (ConnectionError, TimeoutError))
+
+
+def _retry_delay(attempt: int, error: Exception) -> float:
+    """Exponential backoff with full jitter, never shorter than a Retry-After requested by GitHub."""
+    delay = random.uniform(0, min(FETCH_RETRY_MAX_DELAY, FETCH_RETRY_BASE_DELAY * 2 ** (attempt - 1)))  # noqa: S311
+    retry_after = getattr(error, "headers", {}).get("retry-after", "")
+    if retry_after.isdigit():
+        delay = max(delay, min(float(retry_after), FETCH_RETRY_MAX_DELAY))
+    return delay
+
+
+def _fetch_with_retries(fetch: Callable[[], GithubIssue], description: str) -> GithubIssue:
+    """Call `fetch`, retrying transient GitHub failures up to FETCH_MAX_ATTEMPTS times."""
+    attempt = 1
+    while True:
+        try:
+            return fetch()
+        except (OSError, GithubAPIError) as e:
+            if attempt >= FETCH_MAX_ATTEMPTS or not _is_transient(e):
+                raise
+            delay = _retry_delay(attempt, e)
+            logger.warning(
+                "%s failed (attempt %d/%d), retrying in %.1fs: %s", description, attempt, FETCH_MAX_ATTEMPTS, delay, e
+            )
+            time.sleep(delay)
+            attempt += 1
+
+
+def fetch_issue_with_retries(github_issue_url: str, fetch_options: FetchOptions | None = None) -> GithubIssue:
+    """Fetch an issue, retrying transient GitHub failures."""
+    return _fetch_with_retries(lambda: fetch_issue(github_issue_url, fetch_options), f"Fetching {github_issue_url}")
+
+
+def prepare_prompt(
+    github_issue_url: str, config: AgentConfig, fetch_options: FetchOptions | None = None, cwd: Path | None = None
+) -> str:
+    """Fetch an issue and render it into the user prompt of the given config, for a run in `cwd`."""
+    issue = fetch_issue_with_retries(github_issue_url, fetch_options)
+    return render_prompt(config, issue, fetch_options.comment_filter if fetch_options else None, cwd=cwd)
+
+
+@contextmanager
+def _agent_checkout(config: AgentConfig, cwd: Path | None, *, isolate: bool = False) -> Iterator[Path | None]:
+    """
+    Yield the directory claude runs the agent in.
+
+    Agents that modify the checkout lease a worktree from the pool of `cwd`'s repository when the pool is enabled,
+    other agents run in a temporary worktree with `isolate`, or directly in `cwd` otherwise.
+    """
+    if config.uses_worktree_pool and WORKTREE_POOL_SIZE > 0:
+        with get_pool(cwd or Path.cwd()).lease(cwd or Path.cwd()) as worktree:
+            yield worktree
+    elif isolate:
+        with temporary_worktree(cwd or Path.cwd(), name=config.agent_name) as worktree:
+            yield worktree
+    else:
+        yield cwd
+
+
+def _run_stage(
+    github_issue_url: str,
+    config: AgentConfig,
+    get_issue: Callable[[], GithubIssue],
+    *,
+    cwd: Path | None = None,
+    comment_filter: CommentFilter | None = None,
+    stream: bool = False,
+    output: TextIO | None = None,
+    isolate: bool = False,
+) -> BatchResult:
+    """
+    Render the issue returned by `get_issue` for the given config and run claude on it.
+
+    With `isolate`, claude runs in a temporary worktree of `cwd` (see `_agent_checkout`).
+    """
+    start = time.monotonic()
+    try:
+        with span("agent_run", github_issue_url=github_issue_url, agent=config.agent_name) as run_span:
+            prompt = render_prompt(config, get_issue(), comment_filter, cwd=cwd)
+            with _agent_checkout(config, cwd, isolate=isolate) as agent_cwd:
+                return_code = run_claude(
+                    prompt,
+                    config=config,
+                    cwd=agent_cwd,
+                    stream=stream,
+                    output=output,
+                    github_issue_url=github_issue_url,
+                )
+            run_span.set_attribute("exit_code", return_code)
+    except (OSError, ValueError, GithubAPIError, WorktreeError) as e:
+        logger.exception("Failed to process %s", github_issue_url)
+        return BatchResult(
+            github_issue_url=github_issue_url,
+            exit_code=1,
+            duration_seconds=time.monotonic() - start,
+            error=str(e),
+            agent_name=config.agent_name,
+        )
+    return BatchResult(
+        github_issue_url=github_issue_url,
+        exit_code=return_code,
+        duration_seconds=time.monotonic() - start,
+        agent_name=config.agent_name,
+    )
+
+
+def process_issue(
+    github_issue_url: str,
+    config: AgentConfig,
+    *,
+    cwd: Path | None = None,
+    fetch_options: FetchOptions | None = None,
+    stream: bool = False,
+    output: TextIO | None = None,
+) -> BatchResult:
+    """Fetch a single issue and run claude on it, capturing failures as a BatchResult."""
+    return _run_stage(
+        github_issue_url,
+        config,
+        functools.partial(fetch_issue_with_retries, github_issue_url, fetch_options),
+        cwd=cwd,
+        comment_filter=fetch_options.comment_filter if fetch_options else None,
+        stream=stream,
+        output=output,
+    )
+
+
+def _log_results(results: list[BatchResult], description: str) -> None:
+    for result in results:
+        stage = f" [{result.agent_name}]" if result.agent_name else ""
+        if result.error:
+            logger.info(
+                "[exit %d] %s%s (%.1fs): %s",
+                result.exit_code,
+                result.github_issue_url,
+                stage,
+                result.duration_seconds,
+                result.error,
+            )
+        else:
+            logger.info(
+                "[exit %d] %s%s (%.1fs)", result.exit_code, result.github_issue_url, stage, result.duration_seconds
+            )
+    failed = sum(1 for result in results if result.exit_code != 0)
+    logger.info(
+        "%s finished: %d succeeded, %d failed, %d total", description, len(results) - failed, failed, len(results)
+    )
+
+
+def run_batch(
+    github_issue_urls: Iterable[str],
+    config: AgentConfig,
+    *,
+    jobs: int = DEFAULT_BATCH_JOBS,
+    cwd: Path | None = None,
+    fetch_options: FetchOptions | None = None,
+    stream: bool = False,
+    job_store: JobStore | None = None,
+    agent: AgentType | None = None,
+) -> list[BatchResult]:
+    """
+    Process issues concurrently with at most `jobs` claude processes, sharing a single AgentConfig.
+
+    `github_issue_urls` may be a generator, issues are dispatched as it yields them.
+
+    With a `job_store`, each issue's progress is recorded under (issue URL, `agent`) as it runs,
+    so an interrupted batch can be resumed.
+    """
+
+    def run_job(github_issue_url: str) -> BatchResult:
+        if job_store and agent:
+            job_store.mark_running(github_issue_url, agent)
+        result = process_issue(github_issue_url, config, cwd=cwd, fetch_options=fetch_options, stream=stream)
+        if job_store and agent:
+            job_store.mark_finished(agent, result)
+        return result
+
+    logger.info("Processing issues with '%s' (jobs=%d) ...", config.agent_name, jobs)
+    with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="askcc-batch") as executor:
+        results = list(executor.map(in_current_context(run_job), github_issue_urls))
+
+    _log_results(results, "Batch")
+    return results
+
+
+def _unchanged_since_last_run(issue: RepositoryIssue, job_store: JobStore, agent: AgentType) -> bool:
+    record = job_store.get(issue.github_issue_url, agent)
+    if not record or record.exit_code != 0 or record.finished_at is None or not issue.updated_at:
+        return False
+    # comments the agent posts update the issue while it runs, only updates after the run count as changes
+    return datetime.fromisoformat(issue.updated_at).timestamp() <= record.finished_at
+
+
+def run_sweep(
+    repository: str,
+    config: AgentConfig,
+    agent: AgentType,
+    job_store: JobStore,
+    *,
+    labels: Sequence[str] = (),
+    since: str | None = None,
+    jobs: int = DEFAULT_BATCH_JOBS,
+    cwd: Path | None = None,
+    fetch_options: FetchOptions | None = None,
+    stream: bool = False,
+) -> list[BatchResult]:
+    """
+    Run an agent over the open issues of an 'owner/name' repository updated since `since`.
+
+    With `since="auto"` the sweep continues from the (repository, agent) watermark in `job_store`, which is
+    advanced to the latest `updated_at` seen, or held back to the earliest failed issue so it is retried.
+    Issues are dispatched while later pages are still being listed. Issues whose last successful run
+    finished after their latest update are skipped.
+    """
+    if since == SINCE_AUTO:
+        since = job_store.watermark(repository, agent)
+        logger.info("Sweeping %s with '%s' for issues updated since %s", repository, agent, since or "the start")
+    listed: dict[str, str] = {}
+
+    def changed_issue_urls() -> Iterator[str]:
+        for issue in list_repository_issues(repository, labels=labels, since=since):
+            listed[issue.github_issue_url] = issue.updated_at
+            if _unchanged_since_last_run(issue, job_store, agent):
+                logger.debug("Skipping %s, unchanged since its last run", issue.github_issue_url)
+                continue
+            job_store.enqueue([issue.github_issue_url], agent)
+            yield issue.github_issue_url
+
+    results = run_batch(
+        changed_issue_urls(),
+        config,
+        jobs=jobs,
+        cwd=cwd,
+        fetch_options=fetch_options,
+        stream=stream,
+        job_store=job_store,
+        agent=agent,
+    )
+    failed = [listed[result.github_issue_url] for result in results if result.exit_code != 0]
+    if listed:
+        watermark = min(failed) if failed else max(listed.values())
+        job_store.set_watermark(repository, agent, watermark)
+        logger.info("Watermark of %s for '%s' is now %s", repository, agent, watermark)
+    return results
+
+
+def _run_issue_stages(
+    github_issue_url: str,
+    prefetched_issue: Future[GithubIssue],
+    configs: list[AgentConfig],
+    *,
+    cwd: Path | None = None,
+    comment_filter: CommentFilter | None = None,
+    stream: bool = False,
+) -> list[BatchResult]:
+    """Run the stages for one issue in order, stopping at the first stage that fails."""
+    results: list[BatchResult] = []
+    issue: GithubIssue | None = None
+    previous_stage_started_at = ""
+    for config in configs:
+
+        def get_issue(since: str = previous_stage_started_at) -> GithubIssue:
+            nonlocal issue
+            if issue is None:
+                issue = prefetched_issue.result()
+            else:
+                # earlier stages may have commented on the issue, fetch just those comments
+                issue = _fetch_with_retries(
+                    functools.partial(fetch_new_comments, issue, since),
+                    f"Fetching new comments on {github_issue_url}",
+                )
+            return issue
+
+        previous_stage_started_at = (datetime.now(UTC) - PIPELINE_CLOCK_SKEW).strftime("%Y-%m-%dT%H:%M:%SZ")
+        result = _run_stage(github_issue_url, config, get_issue, cwd=cwd, comment_filter=comment_filter, stream=stream)
+        results.append(result)
+        if result.exit_code != 0:
+            logger.warning(
+                "Stopping pipeline for %s: stage '%s' exited with %d",
+                github_issue_url,
+                config.agent_name,
+                result.exit_code,
+            )
+            break
+    return results
+
+
+def run_pipeline(
+    github_issue_urls: list[str],
+    configs: list[AgentConfig],
+    *,
+    cwd: Path | None = None,
+    fetch_options: FetchOptions | None = None,
+    stream: bool = False,
+) -> list[BatchResult]:
+    """
+    Run each issue through the agent `configs` in order, e.g. review -> plan -> develop.
+
+    Each issue is fetched once; later stages only fetch the comments posted since the previous stage started.
+    The next issue is fetched in the background while the current issue's claude processes run.
+    """
+    comment_filter = fetch_options.comment_filter if fetch_options else None
+    stage_names = " -> ".join(config.agent_name for config in configs)
+    logger.info("Running pipeline %s on %d issue(s) ...", stage_names, len(github_issue_urls))
+    results: list[BatchResult] = []
+    prefetch = in_current_context(fetch_issue_with_retries)
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="askcc-prefetch") as prefetcher:
+        upcoming = [prefetcher.submit(prefetch, url, fetch_options) for url in github_issue_urls[:1]]
+        for index, github_issue_url in enumerate(github_issue_urls):
+            current = upcoming.pop()
+            if index + 1 < len(github_issue_urls):
+                upcoming.append(prefetcher.submit(prefetch, github_issue_urls[index + 1], fetch_options))
+            results.extend(
+                _run_issue_stages(
+                    github_issue_url, current, configs, cwd=cwd, comment_filter=comment_filter, stream=stream
+                )
+            )
+    _log_results(results, "Pipeline")
+    return results
+
+
+def _write_fan_out_report(results: list[BatchResult], out: TextIO) -> None:
+    """Write the output of each run under a header with its agent, exit code and duration."""
+    for result in results:
+        text = result.output or result.error or ""
+        out.write(f"\n===== {result.agent_name} (exit {result.exit_code}, {result.duration_seconds:.1f}s) =====\n")
+        out.write(text if text.endswith("\n") else f"{text}\n")
+    out.flush()
+
+
+def run_fan_out(
+    github_issue_url: str,
+    configs: list[AgentConfig],
+    *,
+    cwd: Path | None = None,
+    fetch_options: FetchOptions | None = None,
+    stream: bool = False,
+) -> list[BatchResult]:
+    """
+    Run the agent `configs` concurrently on one issue, each claude in its own temporary git worktree of `cwd`.
+
+    The issue is fetched once and rendered for every config. Each run's output is captured and written
+    as a single report once the slowest run has finished.
+    """
+    repository = cwd or Path.cwd()
+    repository_root(repository)  # fail before fetching if cwd is not a git repository
+    issue = fetch_issue_with_retries(github_issue_url, fetch_options)
+    comment_filter = fetch_options.comment_filter if fetch_options else None
+
+    def run_agent(config: AgentConfig) -> BatchResult:
+        output = io.StringIO()
+        result = _run_stage(
+            github_issue_url,
+            config,
+            lambda: issue,
+            cwd=repository,
+            comment_filter=comment_filter,
+            stream=stream,
+            output=output,
+            isolate=True,
+        )
+        return replace(result, output=output.getvalue())
+
+    agent_names = ", ".join(config.agent_name for config in configs)
+    logger.info("Fanning out %s on %s ...", agent_names, github_issue_url)
+    with ThreadPoolExecutor(max_workers=max(1, len(configs)), thread_name_prefix="askcc-fan-out") as executor:
+        results = list(executor.map(in_current_context(run_agent), configs))
+
+    _write_fan_out_report(results, sys.stdout)
+    _log_results(results, "Fan-out")
+    return results
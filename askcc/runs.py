@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Self
+
+from .definitions import DEFAULT_HISTORY_LIMIT, RunRecord
+from .settings import RUN_ARCHIVE, RUNS_DIR, RUNS_MAX_AGE_DAYS, RUNS_MAX_BYTES
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+BUSY_TIMEOUT_SECONDS = 30.0
+LOG_STREAMS = ("stdout", "stderr")
+READ_CHUNK_SIZE = 64 * 1024
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    agent_name TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    github_issue_url TEXT,
+    duration_seconds REAL NOT NULL,
+    exit_code INTEGER,
+    stdout_bytes INTEGER NOT NULL,
+    stderr_bytes INTEGER NOT NULL,
+    log_bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_started_at ON runs (started_at);
+"""
+RUN_COLUMNS = (
+    "run_id, agent_name, started_at, github_issue_url, duration_seconds, exit_code, stdout_bytes, stderr_bytes, "
+    "log_bytes"
+)
+
+
+class RunLog:
+    """
+    The gzip-compressed stdout and stderr of one claude run, written as output arrives.
+
+    The stderr log is only created once claude writes to stderr. Each stream is written by a single thread.
+    """
+
+    def __init__(self, directory: Path, run_id: str, agent_name: str, github_issue_url: str | None) -> None:
+        self.directory = directory
+        self.run_id = run_id
+        self.agent_name = agent_name
+        self.github_issue_url = github_issue_url
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self.exit_code: int | None = None  # set once the run finished, None if it was interrupted
+        self.byte_counts = dict.fromkeys(LOG_STREAMS, 0)
+        self._files: dict[str, gzip.GzipFile] = {}
+
+    def path(self, stream: str) -> Path:
+        return self.directory / f"{self.run_id}.{stream}.gz"
+
+    def write(self, stream: str, data: bytes) -> None:
+        if stream not in self._files:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._files[stream] = gzip.open(self.path(stream), "wb")  # noqa: SIM115
+        self._files[stream].write(data)
+        self.byte_counts[stream] += len(data)
+
+    def write_stdout(self, data: bytes) -> None:
+        self.write("stdout", data)
+
+    def write_stderr(self, data: bytes) -> None:
+        self.write("stderr", data)
+
+    def close(self) -> RunRecord:
+        for log_file in self._files.values():
+            log_file.close()
+        return RunRecord(
+            run_id=self.run_id,
+            agent_name=self.agent_name,
+            started_at=self.started_at,
+            github_issue_url=self.github_issue_url,
+            duration_seconds=time.monotonic() - self._start,
+            exit_code=self.exit_code,
+            stdout_bytes=self.byte_counts["stdout"],
+            stderr_bytes=self.byte_counts["stderr"],
+            log_bytes=sum(self.path(stream).stat().st_size for stream in self._files),
+        )
+
+
+class RunArchive:
+    """
+    Compressed output logs of past claude runs under `directory`, indexed in SQLite.
+
+    The index answers `askcc history` without decompressing any log. Runs older than `max_age_days`,
+    and the oldest runs once the logs take more than `max_bytes`, are pruned whenever a run is added.
+    """
+
+    def __init__(
+        self,
+        directory: Path | None = None,
+        *,
+        max_bytes: int = RUNS_MAX_BYTES,
+        max_age_days: float = RUNS_MAX_AGE_DAYS,
+    ) -> None:
+        self.directory = directory or RUNS_DIR
+        self.logs_directory = self.directory / "logs"
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(
+            self.directory / "index.db", timeout=BUSY_TIMEOUT_SECONDS, isolation_level=None, check_same_thread=False
+        )
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(self, *_exc_info: object) -> None:
+        self.close()
+
+    def start(self, agent_name: str, github_issue_url: str | None = None) -> RunLog:
+        """Start the logs of a new run, ids sort by start time."""
+        run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.urandom(3).hex()}"
+        return RunLog(self.logs_directory, run_id, agent_name, github_issue_url)
+
+    def finish(self, run_log: RunLog) -> RunRecord:
+        """Close the logs of a run, add it to the index and prune old runs."""
+        record = run_log.close()
+        with self._lock:
+            self._connection.execute(
+                f"INSERT OR REPLACE INTO runs ({RUN_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",  # noqa: S608
+                (
+                    record.run_id,
+                    record.agent_name,
+                    record.started_at,
+                    record.github_issue_url,
+                    record.duration_seconds,
+                    record.exit_code,
+                    record.stdout_bytes,
+                    record.stderr_bytes,
+                    record.log_bytes,
+                ),
+            )
+        self.prune()
+        return record
+
+    def history(
+        self, *, agent_name: str | None = None, github_issue_url: str | None = None, limit: int = DEFAULT_HISTORY_LIMIT
+    ) -> list[RunRecord]:
+        """Return the most recent runs, newest first, optionally only those of one agent or issue."""
+        conditions, parameters = [], []
+        if agent_name:
+            conditions.append("agent_name = ?")
+            parameters.append(agent_name)
+        if github_issue_url:
+            conditions.append("github_issue_url = ?")
+            parameters.append(github_issue_url)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {RUN_COLUMNS} FROM runs {where} ORDER BY started_at DESC, run_id DESC LIMIT ?",  # noqa: S608
+                (*parameters, limit),
+            ).fetchall()
+        return [RunRecord(*row) for row in rows]
+
+    def get(self, run_id: str) -> RunRecord | None:
+        """Return the run with the given id, or the only run whose id starts with it."""
+        # run ids only contain digits, letters and dashes, a prefix has no LIKE wildcards worth escaping
+        prefix = run_id.replace("%", "").replace("_", "")
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT {RUN_COLUMNS} FROM runs WHERE run_id = ? OR run_id LIKE ? ORDER BY run_id = ? DESC LIMIT 2",  # noqa: S608
+                (run_id, f"{prefix}%", run_id),
+            ).fetchall()
+        if rows and (rows[0][0] == run_id or len(rows) == 1):
+            return RunRecord(*rows[0])
+        return None
+
+    def read_log(self, run_id: str, stream: str = "stdout") -> Iterator[bytes]:
+        """Yield the decompressed log of a run in chunks, nothing if the run wrote nothing to `stream`."""
+        path = self.logs_directory / f"{run_id}.{stream}.gz"
+        if not path.exists():
+            return
+        with gzip.open(path, "rb") as log_file:
+            while chunk := log_file.read(READ_CHUNK_SIZE):
+                yield chunk
+
+    def _delete(self, run_ids: list[str]) -> None:
+        for run_id in run_ids:
+            for stream in LOG_STREAMS:
+                (self.logs_directory / f"{run_id}.{stream}.gz").unlink(missing_ok=True)
+        with self._lock:
+            self._connection.executemany("DELETE FROM runs WHERE run_id = ?", [(run_id,) for run_id in run_ids])
+
+    def prune(self) -> int:
+        """Delete runs older than max_age_days and the oldest runs beyond max_bytes of logs, return how many."""
+        with self._lock:
+            expired = []
+            if self.max_age_days:
+                expired += self._connection.execute(
+                    "SELECT run_id FROM runs WHERE started_at < ?", (time.time() - self.max_age_days * 86400,)
+                ).fetchall()
+            if self.max_bytes:
+                # running total of the log sizes, newest first: everything past the budget goes
+                expired += self._connection.execute(
+                    """
+                    SELECT run_id FROM (
+                        SELECT run_id, SUM(log_bytes) OVER (ORDER BY started_at DESC, run_id DESC) AS total FROM runs
+                    ) WHERE total > ?
+                    """,
+                    (self.max_bytes,),
+                ).fetchall()
+        run_ids = sorted({run_id for (run_id,) in expired})
+        if run_ids:
+            self._delete(run_ids)
+            logger.debug("Pruned %d run(s) from %s", len(run_ids), self.directory)
+        return len(run_ids)
+
+
+@contextmanager
+def archived_run(agent_name: str, github_issue_url: str | None = None) -> Iterator[RunLog | None]:
+    """
+    Archive the output written to the yielded RunLog when the block exits, also when it is interrupted.
+
+    Yields None when RUN_ARCHIVE is disabled.
+    """
+    if not RUN_ARCHIVE:
+        yield None
+        return
+    with RunArchive() as archive:
+        run_log = archive.start(agent_name, github_issue_url)
+        try:
+            yield run_log
+        finally:
+            archive.finish(run_log)
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO, cast
+
+from .cache import enable_memory_cache
+from .client import ENCODING, MAX_MESSAGE_BYTES
+from .definitions import (
+    DEFAULT_BATCH_JOBS,
+    AgentType,
+    BatchResult,
+    CommentFilter,
+    FetchOptions,
+    Job,
+    JobRequest,
+    JobStatus,
+)
+from .functions import bootstrap_templates, load_agent_config, validate_agent_templates
+from .github import get_github_client
+from .runner import process_issue, with_prompt_budget, with_result_cache
+from .settings import WORKTREE_POOL_SIZE
+from .worktrees import refresh_pools
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+logger = logging.getLogger(__name__)
+
+MAX_FINISHED_JOBS = 1000  # finished jobs kept for status queries, oldest are forgotten first
+SOCKET_MODE = 0o600  # only the owner may submit jobs, which run claude with permissions skipped
+MAX_OUTPUT_MESSAGE_CHARS = 64 * 1024  # JSON-escaped, an output message stays well below MAX_MESSAGE_BYTES
+
+
+def _job_request_from_dict(data: dict) -> JobRequest:
+    fetch_options = data.get("fetch_options") or {}
+    comment_filter = fetch_options.get("comment_filter")
+    return JobRequest(
+        **{
+            **data,
+            "agent": AgentType(data["agent"]),
+            "fetch_options": FetchOptions(
+                **{**fetch_options, "comment_filter": CommentFilter(**comment_filter) if comment_filter else None}
+            ),
+        }
+    )
+
+
+class _JobOutput:
+    """Writes a job's output to the daemon's stdout, and to the client waiting on the job if there is one."""
+
+    def __init__(self, job_id: str, listener: Callable[[str], None] | None) -> None:
+        self.job_id = job_id
+        self.listener = listener
+
+    def write(self, text: str) -> int:
+        sys.stdout.write(text)
+        if self.listener:
+            try:
+                self.listener(text)
+            except OSError as e:
+                # the job keeps running, its output still goes to stdout and the run archive
+                logger.warning("Stopped sending the output of job %s: %s", self.job_id, e)
+                self.listener = None
+        return len(text)
+
+    def flush(self) -> None:
+        sys.stdout.flush()
+
+
+class AskccServer(socketserver.ThreadingUnixStreamServer):
+    """
+    Long-running job server listening on a Unix socket.
+
+    Templates, agent configs and the GitHub client stay warm between jobs,
+    and at most `jobs` claude processes run at once while further jobs wait in the queue.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, *, jobs: int = DEFAULT_BATCH_JOBS) -> None:
+        self.socket_path = socket_path
+        self._jobs: dict[str, Job] = {}
+        self._changed = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="askcc-serve")
+        _remove_stale_socket(socket_path)
+        super().__init__(str(socket_path), _JobRequestHandler)
+
+    def server_bind(self) -> None:
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        # the socket is created with SOCKET_MODE, a chmod after binding would leave it open until then
+        previous_umask = os.umask(0o777 & ~SOCKET_MODE)
+        try:
+            super().server_bind()
+        finally:
+            os.umask(previous_umask)
+
+    def server_close(self) -> None:
+        super().server_close()
+        self.socket_path.unlink(missing_ok=True)
+        queued = sum(1 for job in self._jobs.values() if job.status == JobStatus.QUEUED)
+        if queued:
+            logger.warning("Dropping %d queued job(s)", queued)
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def warm_up(self) -> None:
+        """Load everything jobs share, so the first job pays no more than the ones after it."""
+        bootstrap_templates()
+        for error in validate_agent_templates().values():
+            logger.error(error)
+        get_github_client()
+        enable_memory_cache()
+
+    def submit(self, request: JobRequest, *, on_output: Callable[[str], None] | None = None) -> Job:
+        """Queue a job, its output is passed to `on_output` as claude writes it."""
+        load_agent_config(request.agent)  # reject invalid templates at submission rather than in the queue
+        job = Job(job_id=uuid.uuid4().hex[:12], request=request, submitted_at=time.time())
+        with self._changed:
+            self._jobs[job.job_id] = job
+            self._forget_finished_jobs()
+        self._executor.submit(self._run, job.job_id, on_output)
+        logger.info("Queued job %s: %s %s", job.job_id, request.agent.value, request.github_issue_url)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._changed:
+            return self._jobs.get(job_id)
+
+    def wait(self, job_id: str) -> Job | None:
+        """Block until the job finishes."""
+        with self._changed:
+            self._changed.wait_for(lambda: job_id not in self._jobs or self._jobs[job_id].status == JobStatus.FINISHED)
+            return self._jobs.get(job_id)
+
+    def _update(self, job_id: str, **changes: object) -> Job:
+        with self._changed:
+            job = self._jobs[job_id] = replace(self._jobs[job_id], **changes)
+            self._changed.notify_all()
+        return job
+
+    def _forget_finished_jobs(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status == JobStatus.FINISHED]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    def _run(self, job_id: str, on_output: Callable[[str], None] | None = None) -> None:
+        request = self._update(job_id, status=JobStatus.RUNNING).request
+        try:
+            config = with_result_cache(
+                with_prompt_budget(load_agent_config(request.agent), request.max_prompt_tokens), request.force
+            )
+            result = process_issue(
+                request.github_issue_url,
+                config,
+                cwd=Path(request.cwd) if request.cwd else None,
+                fetch_options=request.fetch_options,
+                stream=request.stream,
+                output=cast("TextIO", _JobOutput(job_id, on_output)),
+            )
+        except Exception as e:  # a failing job must not take the worker down with it
+            logger.exception("Job %s failed", job_id)
+            result = BatchResult(github_issue_url=request.github_issue_url, exit_code=1, error=str(e))
+        self._update(job_id, status=JobStatus.FINISHED, result=result)
+        logger.info(
+            "[exit %d] job %s: %s (%.1fs)", result.exit_code, job_id, request.github_issue_url, result.duration_seconds
+        )
+
+
+class _JobRequestHandler(socketserver.StreamRequestHandler):
+    server: AskccServer
+
+    def handle(self) -> None:
+        for line in iter(lambda: self.rfile.readline(MAX_MESSAGE_BYTES), b""):
+            try:
+                response = {"ok": True, **self._dispatch(json.loads(line))}
+            except (KeyError, TypeError, ValueError) as e:
+                response = {"ok": False, "error": str(e) or type(e).__name__}
+            self.wfile.write(json.dumps(response).encode(ENCODING) + b"\n")
+            self.wfile.flush()
+
+    def _send_output(self, text: str) -> None:
+        for start in range(0, len(text), MAX_OUTPUT_MESSAGE_CHARS):
+            output = text[start : start + MAX_OUTPUT_MESSAGE_CHARS]
+            self.wfile.write(json.dumps({"ok": True, "output": output}).encode(ENCODING) + b"\n")
+        self.wfile.flush()
+
+    def _dispatch(self, message: dict) -> dict:
+        action = message.get("action")
+        if action == "submit":
+            # with "follow", the job's output is sent as it arrives and the response is the finished job
+            on_output = self._send_output if message.get("follow") else None
+            job = self.server.submit(_job_request_from_dict(message["request"]), on_output=on_output)
+            if on_output:
+                job = self.server.wait(job.job_id)
+        elif action == "status":
+            job = self.server.get(message["job_id"])
+        elif action == "wait":
+            job = self.server.wait(message["job_id"])
+        else:
+            msg = f"unknown action: {action!r}"
+            raise ValueError(msg)
+        if job is None:
+            msg = f"unknown job: {message['job_id']}"
+            raise ValueError(msg)
+        return {"job": asdict(job)}
+
+
+def _remove_stale_socket(socket_path: Path) -> None:
+    """Remove a socket left behind by a daemon that did not shut down cleanly, refusing to replace a live one."""
+    if not socket_path.exists():
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except ConnectionRefusedError:
+            logger.info("Removing stale socket %s", socket_path)
+            socket_path.unlink()
+            return
+    msg = f"askcc daemon is already running at {socket_path}"
+    raise OSError(msg)
+
+
+def serve(socket_path: Path, *, jobs: int = DEFAULT_BATCH_JOBS) -> None:
+    """Run the job server until interrupted."""
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    stop_refresh = threading.Event()
+    with AskccServer(socket_path, jobs=jobs) as server:
+        if WORKTREE_POOL_SIZE > 0:
+            # keep the worktree pools of repositories seen by develop jobs fetched and reset between jobs;
+            # started once the socket is bound, binding changes the process-wide umask
+            threading.Thread(
+                target=refresh_pools, args=(stop_refresh,), name="askcc-worktree-refresh", daemon=True
+            ).start()
+        server.warm_up()
+        logger.info("Listening on %s (jobs=%d)", socket_path, jobs)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            logger.info("Shutting down")
+        finally:
+            stop_refresh.set()
@@ -9,6 +9,93 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", DEFAULT_LOG_LEVEL).upper()
 ASKCC_HOME: Path = Path(os.getenv("ASKCC_HOME") or str(Path.home() / ".askcc")).expanduser().resolve()
 TEMPLATES_DIR: Path = ASKCC_HOME / "templates"
 
+CACHE_DIR: Path = ASKCC_HOME / "cache"
+DEFAULT_ISSUE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+ISSUE_CACHE_MAX_BYTES = int(os.getenv("ASKCC_ISSUE_CACHE_MAX_BYTES", str(DEFAULT_ISSUE_CACHE_MAX_BYTES)))
+# Issues the `askcc serve` daemon also keeps in memory in front of the on-disk cache, 0 disables
+ISSUE_MEMORY_CACHE_ENTRIES = int(os.getenv("ASKCC_ISSUE_MEMORY_CACHE_ENTRIES", "256"))
+# Stored claude results of read-only agents, replayed when the same prompts run against the same commit again
+DEFAULT_RESULT_CACHE_MAX_BYTES = 50 * 1024 * 1024
+RESULT_CACHE_MAX_BYTES = int(os.getenv("ASKCC_RESULT_CACHE_MAX_BYTES", str(DEFAULT_RESULT_CACHE_MAX_BYTES)))
+
+# GitHub transport: "gh" (shell out to the gh CLI) or "http" (in-process pooled HTTP client, falls back to gh)
+GITHUB_BACKEND = os.getenv("ASKCC_GITHUB_BACKEND", "gh").lower()
+GITHUB_API_URL = os.getenv("ASKCC_GITHUB_API_URL", "https://api.github.com")
+
+# Issue fetch engine: "graphql" (issue, labels and comments in a single request) or "rest" (concurrent REST calls)
+GITHUB_FETCH_ENGINE = os.getenv("ASKCC_FETCH_ENGINE", "graphql").lower()
+
+# Most issues and pull requests prefetched for --with-references, across all depths
+MAX_REFERENCES = int(os.getenv("ASKCC_MAX_REFERENCES", "20"))
+
+# Rate limit state shared by all askcc processes: GitHub requests in flight are limited to GITHUB_MAX_CONCURRENCY,
+# and to proportionally fewer once less than GITHUB_THROTTLE_BELOW of the budget remains; an exhausted budget
+# is waited out for up to GITHUB_RATE_LIMIT_MAX_WAIT seconds before requests are sent (and fail) anyway
+RATE_LIMIT_DIR: Path = ASKCC_HOME / "ratelimit"
+GITHUB_MAX_CONCURRENCY = int(os.getenv("ASKCC_GITHUB_MAX_CONCURRENCY", "8"))
+GITHUB_THROTTLE_BELOW = 0.2
+GITHUB_RATE_LIMIT_MAX_WAIT = float(os.getenv("ASKCC_GITHUB_RATE_LIMIT_MAX_WAIT", "3600"))
+# Longest wait for a free request slot; a holder can hang (e.g. a stalled paginated gh call), after this the
+# request is sent without a slot
+GITHUB_SLOT_MAX_WAIT = float(os.getenv("ASKCC_GITHUB_SLOT_MAX_WAIT", "300"))
+
+
+# How the rendered prompt is passed to claude: "argv", "stdin" or "auto" (stdin once the prompt exceeds
+# PROMPT_ARGV_MAX_BYTES, well below Linux's 128 KiB MAX_ARG_STRLEN limit for a single argument)
+PROMPT_TRANSPORT = os.getenv("ASKCC_PROMPT_TRANSPORT", "auto").lower()
+DEFAULT_PROMPT_ARGV_MAX_BYTES = 64 * 1024
+PROMPT_ARGV_MAX_BYTES = int(os.getenv("ASKCC_PROMPT_ARGV_MAX_BYTES", str(DEFAULT_PROMPT_ARGV_MAX_BYTES)))
+
+# Unix socket of the `askcc serve` daemon, used by `askcc submit`
+SOCKET_PATH: Path = Path(os.getenv("ASKCC_SOCKET") or str(ASKCC_HOME / "askcc.sock")).expanduser()
+
+# Persistent job store used by `askcc batch` to record progress and resume interrupted runs
+JOBS_DB_PATH: Path = ASKCC_HOME / "jobs.db"
+
+# Attempts per issue fetch, transient GitHub failures are retried with exponential backoff and full jitter
+FETCH_MAX_ATTEMPTS = int(os.getenv("ASKCC_FETCH_MAX_ATTEMPTS", "4"))
+FETCH_RETRY_BASE_DELAY = float(os.getenv("ASKCC_FETCH_RETRY_BASE_DELAY", "1.0"))
+FETCH_RETRY_MAX_DELAY = 60.0
+
+# Archive of claude's output, compressed logs per run under RUNS_DIR with an index; the oldest runs are pruned once
+# the logs exceed RUNS_MAX_BYTES or are older than RUNS_MAX_AGE_DAYS (0 disables either)
+RUNS_DIR: Path = ASKCC_HOME / "runs"
+RUN_ARCHIVE = os.getenv("ASKCC_RUN_ARCHIVE", "1") != "0"
+DEFAULT_RUNS_MAX_BYTES = 500 * 1024 * 1024
+RUNS_MAX_BYTES = int(os.getenv("ASKCC_RUNS_MAX_BYTES", str(DEFAULT_RUNS_MAX_BYTES)))
+RUNS_MAX_AGE_DAYS = float(os.getenv("ASKCC_RUNS_MAX_AGE_DAYS", "30"))
+
+# Supervision of claude subprocesses, 0 disables a limit: claude is stopped after CLAUDE_TIMEOUT seconds, or after
+# CLAUDE_STALL_TIMEOUT seconds without output (--stream only, text output arrives all at once at the end); its whole
+# process group gets SIGTERM, then SIGKILL after CLAUDE_KILL_GRACE seconds
+CLAUDE_TIMEOUT = float(os.getenv("ASKCC_CLAUDE_TIMEOUT", "3600"))
+CLAUDE_STALL_TIMEOUT = float(os.getenv("ASKCC_CLAUDE_STALL_TIMEOUT", "600"))
+CLAUDE_KILL_GRACE = float(os.getenv("ASKCC_CLAUDE_KILL_GRACE", "10"))
+# Resource limits of each claude process: address space in MiB and CPU time in seconds, 0 leaves them unlimited
+CLAUDE_MAX_MEMORY_MB = int(os.getenv("ASKCC_CLAUDE_MAX_MEMORY_MB", "0"))
+CLAUDE_MAX_CPU_SECONDS = int(os.getenv("ASKCC_CLAUDE_MAX_CPU_SECONDS", "0"))
+# New claude processes wait while the 1 minute load average per CPU is above ADMISSION_MAX_LOAD (0 disables),
+# for at most ADMISSION_MAX_WAIT seconds
+ADMISSION_MAX_LOAD = float(os.getenv("ASKCC_ADMISSION_MAX_LOAD", "2.0"))
+ADMISSION_MAX_WAIT = float(os.getenv("ASKCC_ADMISSION_MAX_WAIT", "600"))
+
+# Local index of the repository in --cwd (paths, top-level symbols and identifiers of the files of the checked-out
+# commit), used to list the files an issue is likely about for templates with $relevant_files; files are indexed by
+# git blob id, so only files that changed since the last indexed commit are read again
+REPO_INDEX_DIR: Path = ASKCC_HOME / "index"
+REPO_INDEX = os.getenv("ASKCC_REPO_INDEX", "1") != "0"
+RELEVANT_FILES_LIMIT = int(os.getenv("ASKCC_RELEVANT_FILES_LIMIT", "10"))
+
+# Pool of pre-warmed git worktrees per repository, leased to agents that modify the checkout (develop);
+# 0 disables the pool and such agents run directly in --cwd
+WORKTREES_DIR: Path = ASKCC_HOME / "worktrees"
+WORKTREE_POOL_SIZE = int(os.getenv("ASKCC_WORKTREE_POOL_SIZE", "0"))
+WORKTREE_BASE_REF = os.getenv("ASKCC_WORKTREE_BASE_REF", "origin/main")
+WORKTREE_REFRESH_INTERVAL = float(os.getenv("ASKCC_WORKTREE_REFRESH_INTERVAL", "300"))
+
+# JSON-lines file spans are appended to (OpenTelemetry-shaped), unset disables metrics
+METRICS_PATH: Path | None = Path(os.environ["ASKCC_METRICS"]).expanduser() if os.getenv("ASKCC_METRICS") else None
+
 
 def configure_logging() -> None:
     """Configure logging for the application. Call explicitly from entry points."""
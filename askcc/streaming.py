@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, TextIO
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable
+
+logger = logging.getLogger(__name__)
+
+USAGE_FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+
+@dataclass
+class StreamStats:
+    """Per-run statistics collected from claude's stream-json events."""
+
+    time_to_first_event: float | None = None
+    event_count: int = 0
+    tool_calls: Counter[str] = field(default_factory=Counter)
+    usage: dict[str, int] = field(default_factory=dict)
+    total_cost_usd: float | None = None
+    num_turns: int | None = None
+
+    def summary(self) -> str:
+        first_event = "n/a" if self.time_to_first_event is None else f"{self.time_to_first_event:.2f}s"
+        tokens = ", ".join(f"{name}={self.usage.get(name, 0)}" for name in USAGE_FIELDS)
+        return (
+            f"first event after {first_event}, {self.event_count} event(s), "
+            f"{sum(self.tool_calls.values())} tool call(s), tokens: {tokens}"
+        )
+
+
+def handle_stream_event(event: dict, stats: StreamStats, out: TextIO) -> None:
+    """Update stats from a single stream-json event and render any assistant text to `out` immediately."""
+    event_type = event.get("type")
+    if event_type == "assistant":
+        for block in (event.get("message") or {}).get("content") or ():
+            if block.get("type") == "text":
+                out.write(block.get("text", ""))
+                out.write("\n")
+            elif block.get("type") == "tool_use":
+                tool_name = block.get("name", "unknown")
+                stats.tool_calls[tool_name] += 1
+                out.write(f"[tool] {tool_name}\n")
+        out.flush()
+    elif event_type == "result":
+        # the result event carries the cumulative usage for the whole session
+        usage = event.get("usage") or {}
+        stats.usage = {name: int(usage.get(name) or 0) for name in USAGE_FIELDS}
+        stats.total_cost_usd = event.get("total_cost_usd")
+        stats.num_turns = event.get("num_turns")
+
+
+def consume_stream(lines: Iterable[str], out: TextIO, *, start: float | None = None) -> StreamStats:
+    """
+    Parse stream-json output line by line as it arrives.
+
+    Events are handled and dropped one at a time, so memory stays flat regardless of session length.
+    """
+    start = time.monotonic() if start is None else start
+    stats = StreamStats()
+    for line in lines:
+        if not line.strip():
+            continue
+        if stats.time_to_first_event is None:
+            stats.time_to_first_event = time.monotonic() - start
+        try:
+            event = json.loads(line)
+        except json.JSONDecodeError:
+            out.write(line)
+            continue
+        if not isinstance(event, dict):
+            continue
+        stats.event_count += 1
+        handle_stream_event(event, stats, out)
+    return stats
@@ -0,0 +1,175 @@
+"""
+Supervision of claude subprocesses: admission, resource limits, timeouts and stall detection.
+
+Each claude process is started in its own session, so it and every process it starts form one process
+group that is stopped together: SIGTERM first, then SIGKILL once the grace period is over.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import logging
+import os
+import resource
+import signal
+import threading
+import time
+from typing import TYPE_CHECKING, Self
+
+from .settings import (
+    ADMISSION_MAX_LOAD,
+    ADMISSION_MAX_WAIT,
+    CLAUDE_KILL_GRACE,
+    CLAUDE_MAX_CPU_SECONDS,
+    CLAUDE_MAX_MEMORY_MB,
+)
+
+if TYPE_CHECKING:
+    import subprocess
+    from collections.abc import Iterable, Iterator
+    from types import TracebackType
+
+logger = logging.getLogger(__name__)
+
+EXIT_TIMEOUT = 124  # the exit code of timeout(1)
+EXIT_STALLED = 125
+ADMISSION_POLL_SECONDS = 5.0
+CPU_LIMIT_GRACE_SECONDS = 5  # between SIGXCPU at the soft limit and SIGKILL at the hard limit
+
+
+def wait_for_admission() -> float:
+    """
+    Wait while the host is saturated, its load average per CPU above ADMISSION_MAX_LOAD.
+
+    Gives up waiting after ADMISSION_MAX_WAIT seconds. Returns the seconds waited.
+    """
+    if ADMISSION_MAX_LOAD <= 0:
+        return 0.0
+    cpus = os.cpu_count() or 1
+    start = time.monotonic()
+    waiting = False
+    while (load := os.getloadavg()[0] / cpus) > ADMISSION_MAX_LOAD:
+        waited = time.monotonic() - start
+        if waited >= ADMISSION_MAX_WAIT:
+            logger.warning("Host still saturated after %.0fs, starting Claude Code anyway", waited)
+            break
+        if not waiting:
+            logger.info(
+                "Host saturated (load %.2f per CPU > %.2f), waiting to start Claude Code ...", load, ADMISSION_MAX_LOAD
+            )
+            waiting = True
+        time.sleep(ADMISSION_POLL_SECONDS)
+    return time.monotonic() - start
+
+
+def apply_resource_limits(pid: int) -> None:
+    """Limit the address space (CLAUDE_MAX_MEMORY_MB) and CPU time (CLAUDE_MAX_CPU_SECONDS) of process `pid`."""
+    limits = []
+    if CLAUDE_MAX_MEMORY_MB:
+        limit = CLAUDE_MAX_MEMORY_MB * 1024 * 1024
+        limits.append((resource.RLIMIT_AS, (limit, limit)))
+    if CLAUDE_MAX_CPU_SECONDS:
+        limits.append((resource.RLIMIT_CPU, (CLAUDE_MAX_CPU_SECONDS, CLAUDE_MAX_CPU_SECONDS + CPU_LIMIT_GRACE_SECONDS)))
+    if not limits:
+        return
+    if not hasattr(resource, "prlimit"):
+        logger.warning("Resource limits for Claude Code are only supported on Linux, ignoring them")
+        return
+    # children started by claude afterwards inherit the limits
+    with contextlib.suppress(ProcessLookupError):  # already exited
+        for limit_resource, value in limits:
+            resource.prlimit(pid, limit_resource, value)
+
+
+def _signal_group(pid: int, signal_number: int) -> None:
+    with contextlib.suppress(ProcessLookupError, PermissionError):  # the whole group has exited
+        os.killpg(pid, signal_number)
+
+
+class Watchdog:
+    """
+    Stop a process started with `start_new_session=True` that runs longer than `timeout` seconds,
+    or writes no output for `stall_timeout` seconds (0 disables either).
+
+    Output is only seen when it is read through `observe()`. A process still running when the `with`
+    block is left by an exception (e.g. KeyboardInterrupt) is stopped too.
+    """
+
+    POLL_SECONDS = 0.5
+
+    def __init__(
+        self,
+        process: subprocess.Popen,
+        *,
+        timeout: float = 0,
+        stall_timeout: float = 0,
+        kill_grace: float = CLAUDE_KILL_GRACE,
+    ) -> None:
+        self.process = process
+        self.timeout = timeout
+        self.stall_timeout = stall_timeout
+        self.kill_grace = kill_grace
+        self.reason: str | None = None  # "timeout" or "stall" once the watchdog stopped the process
+        self._start = self._last_output = time.monotonic()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._watch, name="askcc-watchdog", daemon=True)
+
+    def observe(self, lines: Iterable[str]) -> Iterator[str]:
+        """Pass `lines` through, counting each one as output for the stall detection."""
+        for line in lines:
+            self._last_output = time.monotonic()
+            yield line
+
+    def _expired(self) -> str | None:
+        now = time.monotonic()
+        if self.timeout and now - self._start >= self.timeout:
+            return "timeout"
+        if self.stall_timeout and now - self._last_output >= self.stall_timeout:
+            return "stall"
+        return None
+
+    def _watch(self) -> None:
+        while not self._done.wait(self.POLL_SECONDS):
+            if self.process.poll() is not None:
+                return
+            reason = self._expired()
+            if reason:
+                self.reason = reason
+                logger.warning(
+                    "Claude Code %s, stopping it (pid %d)",
+                    f"timed out after {self.timeout:.0f}s"
+                    if reason == "timeout"
+                    else f"wrote no output for {self.stall_timeout:.0f}s",
+                    self.process.pid,
+                )
+                self.terminate()
+                return
+
+    def terminate(self) -> None:
+        """Send SIGTERM to the process group, and SIGKILL once it is still running after the grace period."""
+        _signal_group(self.process.pid, signal.SIGTERM)
+        deadline = time.monotonic() + self.kill_grace
+        while self.process.poll() is None and time.monotonic() < deadline:
+            time.sleep(0.05)
+        # also stops children that outlived claude and would keep its output pipe open
+        _signal_group(self.process.pid, signal.SIGKILL)
+
+    def exit_code(self) -> int:
+        """Return the process's exit code, or EXIT_TIMEOUT/EXIT_STALLED if the watchdog stopped it."""
+        if self.reason == "timeout":
+            return EXIT_TIMEOUT
+        if self.reason == "stall":
+            return EXIT_STALLED
+        return self.process.wait()
+
+    def __enter__(self) -> Self:
+        self._thread.start()
+        return self
+
+    def __exit__(
+        self, exc_type: type[BaseException] | None, _exc: BaseException | None, _traceback: TracebackType | None
+    ) -> None:
+        self._done.set()
+        self._thread.join()
+        if exc_type is not None and self.process.poll() is None:
+            self.terminate()
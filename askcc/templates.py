@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import functools
+import logging
+from dataclasses import dataclass
+from string import Template
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+COMPILED_TEMPLATE_CACHE_SIZE = 64
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    text: str
+    template: Template
+    identifiers: frozenset[str]
+
+    def missing_variables(self, required_variables: tuple[str, ...]) -> tuple[str, ...]:
+        """Return the required variables that do not appear as $placeholders in the template."""
+        return tuple(name for name in required_variables if name not in self.identifiers)
+
+    def substitute(self, **values: str) -> str:
+        return self.template.safe_substitute(values)
+
+
+@functools.lru_cache(maxsize=COMPILED_TEMPLATE_CACHE_SIZE)
+def compile_template(text: str) -> CompiledTemplate:
+    """Parse a template once, keyed by its content."""
+    template = Template(text)
+    return CompiledTemplate(text=text, template=template, identifiers=frozenset(template.get_identifiers()))
+
+
+class TemplateRegistry:
+    """Compiled templates keyed by file path, re-read only when the file's mtime or size changes."""
+
+    def __init__(self) -> None:
+        self._entries: dict[Path, tuple[tuple[int, int], CompiledTemplate]] = {}
+
+    def get(self, path: Path, default: str) -> CompiledTemplate:
+        """Return the compiled template at `path`, falling back to `default` if the file is missing."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._entries.pop(path, None)
+            logger.warning("Template file not found: %s — using built-in default", path)
+            return compile_template(default)
+        key = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == key:
+            return entry[1]
+        compiled = compile_template(path.read_text())
+        self._entries[path] = (key, compiled)
+        return compiled
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+TEMPLATE_REGISTRY = TemplateRegistry()
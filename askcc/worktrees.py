@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import logging
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import TYPE_CHECKING, TextIO
+
+from .settings import WORKTREE_BASE_REF, WORKTREE_POOL_SIZE, WORKTREE_REFRESH_INTERVAL, WORKTREES_DIR
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+logger = logging.getLogger(__name__)
+
+
+class WorktreeError(Exception):
+    """Raised when a git worktree cannot be created or the directory is not a git repository."""
+
+
+def _git(*args: str, cwd: Path) -> str:
+    result = subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=False)  # noqa: S603, S607
+    if result.returncode != 0:
+        msg = f"git {args[0]} failed in {cwd}: {result.stderr.strip()}"
+        raise WorktreeError(msg)
+    return result.stdout.strip()
+
+
+def repository_root(path: Path) -> Path:
+    """Return the top level directory of the git repository containing `path`."""
+    if not path.is_dir():
+        msg = f"{path} is not a directory"
+        raise WorktreeError(msg)
+    return Path(_git("rev-parse", "--show-toplevel", cwd=path))
+
+
+def head_commit(path: Path) -> str | None:
+    """Return the commit checked out in the repository containing `path`, or None outside a git repository."""
+    try:
+        return _git("rev-parse", "HEAD", cwd=path) if path.is_dir() else None
+    except WorktreeError:
+        return None
+
+
+def main_repository_root(path: Path) -> Path:
+    """Return the main working tree of the repository containing `path`, also when `path` is in a linked worktree."""
+    repository_root(path)
+    return Path(_git("rev-parse", "--path-format=absolute", "--git-common-dir", cwd=path)).parent
+
+
+def _is_on_branch(path: Path) -> bool:
+    try:
+        _git("symbolic-ref", "--quiet", "HEAD", cwd=path)
+    except WorktreeError:
+        return False
+    return True
+
+
+@contextmanager
+def _worktree_admin_lock(path: Path) -> Iterator[None]:
+    """
+    Serialize `git worktree add/remove/prune` on the repository containing `path`, across threads and processes.
+
+    git updates the administrative files of worktrees (.git/worktrees/*) without locking them, so concurrent
+    calls on one repository can fail reading each other's half-written entries.
+    """
+    common_dir = Path(_git("rev-parse", "--path-format=absolute", "--git-common-dir", cwd=path))
+    # each call opens its own file description, so the flock also excludes other threads of this process
+    with (common_dir / "askcc-worktrees.lock").open("a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        yield
+
+
+@contextmanager
+def temporary_worktree(path: Path, name: str = "askcc") -> Iterator[Path]:
+    """
+    Check out the current HEAD of the repository containing `path` in a new detached worktree.
+
+    Yields the directory in the worktree that corresponds to `path`. The worktree is removed on exit,
+    unless claude left uncommitted changes or new commits in it, in which case it is kept and logged.
+    """
+    root = repository_root(path)
+    subdirectory = path.resolve().relative_to(root.resolve())
+    head = _git("rev-parse", "HEAD", cwd=root)
+    directory = Path(tempfile.mkdtemp(prefix=f"askcc-{name}-"))
+    try:
+        with _worktree_admin_lock(root):
+            _git("worktree", "add", "--detach", str(directory), head, cwd=root)
+    except WorktreeError:
+        directory.rmdir()
+        raise
+    try:
+        yield directory / subdirectory
+    finally:
+        _remove_unless_changed(root, directory, head, name)
+
+
+def _remove_unless_changed(root: Path, directory: Path, head: str, name: str) -> None:
+    # errors are logged rather than raised, they would replace an exception raised in the worktree
+    try:
+        changed = bool(_git("status", "--porcelain", cwd=directory)) or _git("rev-parse", "HEAD", cwd=directory) != head
+    except WorktreeError as e:
+        logger.warning("Keeping worktree %s, could not check it for changes made by '%s': %s", directory, name, e)
+        return
+    if changed:
+        logger.warning("Keeping worktree %s, it contains changes made by '%s'", directory, name)
+        return
+    try:
+        with _worktree_admin_lock(root):
+            _git("worktree", "remove", "--force", str(directory), cwd=root)
+    except WorktreeError as e:
+        logger.warning("Could not remove worktree %s: %s", directory, e)
+
+
+class WorktreePool:
+    """
+    A fixed set of worktrees of one repository under WORKTREES_DIR, kept checked out at `base_ref`.
+
+    Each slot is guarded by an exclusive lock on its lock file, so concurrent jobs, in this or other askcc
+    processes, never share a checkout. Ignored files (virtualenvs, build output) survive between leases,
+    which is what makes a pooled worktree faster to start from than a fresh clone.
+    """
+
+    LEASE_POLL_SECONDS = 1.0
+
+    def __init__(
+        self,
+        repository: Path,
+        *,
+        size: int = WORKTREE_POOL_SIZE,
+        base_ref: str = WORKTREE_BASE_REF,
+        directory: Path | None = None,
+        refresh_interval: float = WORKTREE_REFRESH_INTERVAL,
+    ) -> None:
+        self.repository = main_repository_root(repository)
+        self.size = max(1, size)
+        self.base_ref = base_ref
+        self.remote = base_ref.split("/", 1)[0] if "/" in base_ref else None
+        digest = hashlib.sha256(str(self.repository).encode()).hexdigest()[:12]
+        self.directory = (directory or WORKTREES_DIR) / f"{self.repository.name}-{digest}"
+        self.refresh_interval = refresh_interval
+        self._fetch_lock = threading.Lock()
+        self._fetched_at = 0.0
+
+    def fetch(self, *, force: bool = False) -> None:
+        """Fetch the remote of `base_ref`, unless it was fetched within the refresh interval."""
+        if self.remote is None:
+            return
+        with self._fetch_lock:
+            if not force and time.monotonic() - self._fetched_at < self.refresh_interval:
+                return
+            try:
+                _git("fetch", "--quiet", self.remote, cwd=self.repository)
+            except WorktreeError as e:
+                # another process may be fetching, the worktrees are reset to the refs we already have
+                logger.warning("Could not fetch %s: %s", self.remote, e)
+                return
+            self._fetched_at = time.monotonic()
+
+    def _try_lock(self, index: int) -> TextIO | None:
+        lock_file = (self.directory / f"{index}.lock").open("a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _acquire(self) -> tuple[Path, TextIO]:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        waiting = False
+        while True:
+            for index in range(self.size):
+                lock_file = self._try_lock(index)
+                if lock_file:
+                    return self.directory / str(index), lock_file
+            if not waiting:
+                logger.info("All %d worktrees of %s are leased, waiting ...", self.size, self.repository)
+                waiting = True
+            time.sleep(self.LEASE_POLL_SECONDS)
+
+    def _reset(self, slot: Path) -> None:
+        """Create the worktree in `slot` if needed and check out `base_ref`, keeping ignored files."""
+        if not (slot / ".git").exists():
+            if slot.exists():
+                shutil.rmtree(slot)
+            with _worktree_admin_lock(self.repository):
+                _git("worktree", "prune", cwd=self.repository)
+                _git("worktree", "add", "--detach", str(slot), self.base_ref, cwd=self.repository)
+            logger.info("Created worktree %s of %s", slot, self.repository)
+            return
+        _git("checkout", "--quiet", "--detach", "--force", self.base_ref, cwd=slot)
+        _git("clean", "-ffdq", cwd=slot)
+
+    def _recycle(self, slot: Path) -> None:
+        """Keep changes and commits left behind by a job recoverable, but out of the next lease."""
+        # commits on a branch are kept by it, commits on the detached HEAD would be orphaned by the next reset
+        if not _is_on_branch(slot) and _git("rev-list", "--count", f"{self.base_ref}..HEAD", cwd=slot) != "0":
+            branch = f"askcc/{slot.name}-{time.strftime('%Y%m%d-%H%M%S')}"
+            _git("branch", branch, cwd=slot)
+            logger.warning("Saved commits left on the detached HEAD of worktree %s as branch %s", slot, branch)
+        if _git("status", "--porcelain", cwd=slot):
+            _git("stash", "push", "--quiet", "--include-untracked", "-m", f"askcc: left in worktree {slot}", cwd=slot)
+            logger.warning("Stashed uncommitted changes left in worktree %s (see `git stash list`)", slot)
+
+    @contextmanager
+    def lease(self, path: Path | None = None) -> Iterator[Path]:
+        """
+        Lease a free worktree reset to `base_ref`, waiting while all of them are in use.
+
+        Yields the directory in the worktree that corresponds to `path` (default: the repository root).
+        """
+        subdirectory = path.resolve().relative_to(repository_root(path).resolve()) if path else Path()
+        self.fetch()
+        slot, lock_file = self._acquire()
+        try:
+            self._reset(slot)
+            logger.info("Leased worktree %s", slot)
+            yield slot / subdirectory
+        finally:
+            try:
+                self._recycle(slot)
+            except WorktreeError as e:
+                logger.warning("Could not recycle worktree %s: %s", slot, e)
+            lock_file.close()  # releases the lock
+
+    def refresh(self) -> None:
+        """Fetch `base_ref` and create or reset every worktree that is not leased."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fetch(force=True)
+        for index in range(self.size):
+            lock_file = self._try_lock(index)
+            if lock_file is None:
+                continue
+            try:
+                self._reset(self.directory / str(index))
+            except WorktreeError as e:
+                logger.warning("Could not refresh worktree %s: %s", self.directory / str(index), e)
+            finally:
+                lock_file.close()
+
+
+_POOLS: dict[Path, WorktreePool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(path: Path) -> WorktreePool:
+    """Return the shared worktree pool of the repository containing `path`."""
+    repository = main_repository_root(path)
+    with _POOLS_LOCK:
+        if repository not in _POOLS:
+            _POOLS[repository] = WorktreePool(repository)
+        return _POOLS[repository]
+
+
+def refresh_pools(stop: threading.Event, interval: float = WORKTREE_REFRESH_INTERVAL) -> None:
+    """Refresh the idle worktrees of every pool used so far, every `interval` seconds until `stop` is set."""
+    while not stop.wait(interval):
+        with _POOLS_LOCK:
+            pools = list(_POOLS.values())
+        for pool in pools:
+            logger.debug("Refreshing worktree pool %s", pool.directory)
+            pool.refresh()
@@ -0,0 +1,231 @@
+"""
+Measure askcc's own overhead offline, with stub `gh` and `claude` executables on PATH.
+
+Results are compared against a baseline and the script exits non-zero on a regression:
+
+    python benchmarks/run.py                          # compare with benchmarks/baseline.json
+    python benchmarks/run.py --update-baseline        # record the current results as the baseline
+    python benchmarks/run.py --compare-with REF       # measure git REF first, on the same machine, as the baseline
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+STUBS_DIR = BENCHMARKS_DIR / "stubs"
+BASELINE_PATH = BENCHMARKS_DIR / "baseline.json"
+REPOSITORY_DIR = BENCHMARKS_DIR.parent
+
+logger = logging.getLogger("askcc.benchmarks")
+
+COMMENT_COUNTS = (0, 100, 10_000)
+BATCH_JOBS = (1, 4, 16)
+BATCH_ISSUES = 32
+BATCH_CLAUDE_LATENCY = 0.2  # long enough for the worker pool, not askcc, to dominate throughput
+ISSUE_URL = "https://github.com/monkut/askcc-cli/issues/{number}"
+
+DEFAULT_RUNS = 3
+DEFAULT_TOLERANCE = 0.5  # relative slowdown allowed before a metric counts as a regression
+ABSOLUTE_SLACK = {"seconds": 0.05, "mb": 5.0, "issues/s": 0.0}  # absorbs noise on tiny values
+
+
+@dataclass(frozen=True)
+class Measurement:
+    name: str
+    value: float
+    unit: str
+    higher_is_better: bool = False
+
+
+@dataclass(frozen=True)
+class Run:
+    wall_seconds: float
+    spawn_seconds: list[float]
+    peak_rss_mb: float
+
+
+def _environment(
+    home: Path, repository: Path, spawn_log: Path, *, comments: int, claude_latency: float = 0.0
+) -> dict[str, str]:
+    env = {
+        key: value
+        for key, value in os.environ.items()
+        if not key.startswith("ASKCC_") and key not in ("GH_TOKEN", "GITHUB_TOKEN")
+    }
+    env.update(
+        PATH=f"{STUBS_DIR}{os.pathsep}{env.get('PATH', '')}",
+        PYTHONPATH=str(repository),
+        LOG_LEVEL="WARNING",
+        ASKCC_HOME=str(home),
+        ASKCC_GITHUB_BACKEND="gh",
+        ASKCC_FETCH_ENGINE="graphql",
+        ASKCC_FETCH_MAX_ATTEMPTS="1",
+        ASKCC_BENCH_COMMENTS=str(comments),
+        ASKCC_BENCH_CLAUDE_LATENCY=str(claude_latency),
+        ASKCC_BENCH_SPAWN_LOG=str(spawn_log),
+    )
+    return env
+
+
+def _run_askcc(args: list[str], env: dict[str, str], *, stdin: str = "") -> Run:
+    """Run askcc once, returning its wall time, when each claude stub started and the peak RSS."""
+    spawn_log = Path(env["ASKCC_BENCH_SPAWN_LOG"])
+    spawn_log.unlink(missing_ok=True)
+    start = time.time()
+    process = subprocess.Popen(  # noqa: S603
+        [sys.executable, "-m", "askcc.cli", *args],
+        env=env,
+        cwd=env["ASKCC_HOME"],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.DEVNULL,
+    )
+    assert process.stdin is not None
+    process.stdin.write(stdin.encode())
+    process.stdin.close()
+    # wait4 reports the peak RSS of the largest process in askcc's tree (askcc itself, gh or claude)
+    _pid, status, usage = os.wait4(process.pid, 0)
+    wall_seconds = time.time() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode:
+        msg = f"askcc {' '.join(args)} exited with {process.returncode}"
+        raise RuntimeError(msg)
+    spawned = [float(line) - start for line in spawn_log.read_text().split()] if spawn_log.exists() else []
+    return Run(wall_seconds, spawned, usage.ru_maxrss / 1024)
+
+
+def benchmark_single_issue(home: Path, repository: Path, *, runs: int) -> list[Measurement]:
+    measurements = []
+    for comments in COMMENT_COUNTS:
+        env = _environment(home, repository, home / "spawn.log", comments=comments)
+        # --no-cache also skips replaying stored results, so every run fetches the issue and spawns claude
+        results = [
+            _run_askcc(["review", "--no-cache", "--github-issue-url", ISSUE_URL.format(number=1)], env)
+            for _ in range(runs)
+        ]
+        measurements += [
+            Measurement(f"e2e[comments={comments}]", statistics.median(run.wall_seconds for run in results), "seconds"),
+            Measurement(
+                f"spawn_claude[comments={comments}]",
+                statistics.median(run.spawn_seconds[0] for run in results),
+                "seconds",
+            ),
+            Measurement(f"peak_rss[comments={comments}]", max(run.peak_rss_mb for run in results), "mb"),
+        ]
+    return measurements
+
+
+def benchmark_batch(home: Path, repository: Path) -> list[Measurement]:
+    urls = "".join(f"{ISSUE_URL.format(number=number)}\n" for number in range(1, BATCH_ISSUES + 1))
+    env = _environment(home, repository, home / "spawn.log", comments=100, claude_latency=BATCH_CLAUDE_LATENCY)
+    measurements = []
+    for jobs in BATCH_JOBS:
+        run = _run_askcc(["batch", "review", "--no-cache", "--jobs", str(jobs)], env, stdin=urls)
+        measurements.append(
+            Measurement(f"batch_throughput[jobs={jobs}]", BATCH_ISSUES / run.wall_seconds, "issues/s", True)
+        )
+    return measurements
+
+
+def measure(repository: Path, *, runs: int) -> list[Measurement]:
+    """Run the suite against the askcc package in `repository`."""
+    with tempfile.TemporaryDirectory(prefix="askcc-bench-") as directory:
+        home = Path(directory)
+        return benchmark_single_issue(home, repository, runs=runs) + benchmark_batch(home, repository)
+
+
+@contextmanager
+def checkout(ref: str) -> Iterator[Path]:
+    """Check out a git ref of this repository into a temporary worktree, removed afterwards."""
+    with tempfile.TemporaryDirectory(prefix="askcc-bench-ref-") as directory:
+        worktree = Path(directory) / "askcc"
+        git = ["git", "-C", str(REPOSITORY_DIR), "worktree"]
+        subprocess.run([*git, "add", "--detach", str(worktree), ref], check=True, capture_output=True)  # noqa: S603, S607
+        try:
+            yield worktree
+        finally:
+            subprocess.run([*git, "remove", "--force", str(worktree)], check=True, capture_output=True)  # noqa: S603, S607
+
+
+def _is_regression(measurement: Measurement, baseline: float, tolerance: float) -> bool:
+    if measurement.higher_is_better:
+        return measurement.value < baseline * (1 - tolerance)
+    return measurement.value > baseline * (1 + tolerance) + ABSOLUTE_SLACK[measurement.unit]
+
+
+def compare(measurements: list[Measurement], baseline: dict[str, float], tolerance: float) -> list[str]:
+    """Print the results next to the baseline and return the names of the regressed metrics."""
+    regressions = []
+    logger.info("%-32s %10s %10s  unit", "metric", "value", "baseline")
+    for measurement in measurements:
+        expected = baseline.get(measurement.name)
+        regressed = expected is not None and _is_regression(measurement, expected, tolerance)
+        if regressed:
+            regressions.append(measurement.name)
+        expected_text = "-" if expected is None else f"{expected:.3f}"
+        flag = "  REGRESSION" if regressed else ""
+        logger.info(
+            "%-32s %10.3f %10s  %s%s", measurement.name, measurement.value, expected_text, measurement.unit, flag
+        )
+    return regressions
+
+
+def main() -> None:
+    logging.basicConfig(stream=sys.stdout, level=logging.INFO, format="%(message)s")
+    parser = argparse.ArgumentParser(description="Benchmark askcc offline against stub gh and claude executables.")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS, help="Runs per single-issue benchmark.")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=DEFAULT_TOLERANCE,
+        help=f"Allowed relative regression against the baseline (default: {DEFAULT_TOLERANCE}).",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH, help="Baseline file to compare against.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--update-baseline", action="store_true", help="Write the results as the new baseline.")
+    mode.add_argument(
+        "--compare-with",
+        metavar="REF",
+        help="Measure this git ref first and compare against it instead of the baseline file, e.g. the merge-base "
+        "with main in CI, where the stored baseline's machine is not available.",
+    )
+    args = parser.parse_args()
+
+    baseline: dict[str, float] = {}
+    if args.compare_with:
+        with checkout(args.compare_with) as worktree:
+            logger.info("Measuring %s as the baseline ...", args.compare_with)
+            baseline = {measurement.name: measurement.value for measurement in measure(worktree, runs=args.runs)}
+    elif not args.update_baseline and args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text())
+    measurements = measure(REPOSITORY_DIR, runs=args.runs)
+
+    if args.update_baseline:
+        baseline = {measurement.name: round(measurement.value, 4) for measurement in measurements}
+        args.baseline.write_text(json.dumps(baseline, indent=2) + "\n")
+        logger.info("Baseline written to %s", args.baseline)
+        return
+
+    regressions = compare(measurements, baseline, args.tolerance)
+    if regressions:
+        logger.error("%d regression(s): %s", len(regressions), ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+import sys
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+
+import pytest
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+FAKE_CLAUDE_SCRIPT = """\
+import json, sys
+# the prompt is piped through stdin when no positional prompt follows -p
+stdin = sys.stdin.read() if sys.argv[2].startswith("--") else ""
+json.dump({{"args": sys.argv[1:], "stdin": stdin}}, open({calls_path!r}, "w"))
+sys.stdout.write(open({output_path!r}).read())
+"""
+
+
+@dataclass
+class FakeClaude:
+    """A stand-in 'claude' executable on PATH that records its arguments and stdin, and prints canned output."""
+
+    calls_path: Path
+    output_path: Path
+
+    def set_output(self, output: str) -> None:
+        self.output_path.write_text(output)
+
+    @property
+    def args(self) -> list[str]:
+        return json.loads(self.calls_path.read_text())["args"]
+
+    @property
+    def stdin(self) -> str:
+        return json.loads(self.calls_path.read_text())["stdin"]
+
+
+@pytest.fixture
+def fake_claude(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> FakeClaude:
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    fake = FakeClaude(calls_path=tmp_path / "claude-call.json", output_path=tmp_path / "claude-output.txt")
+    fake.set_output("")
+    claude_path = bin_dir / "claude"
+    claude_path.write_text(
+        f"#!{sys.executable}\n"
+        + FAKE_CLAUDE_SCRIPT.format(calls_path=str(fake.calls_path), output_path=str(fake.output_path))
+    )
+    claude_path.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir), prepend=":")
+    return fake
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Keep the on-disk state (caches, indexes, rate limits, runs) of a test out of other tests and ~/.askcc."""
+    monkeypatch.setattr("askcc.cache.CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr("askcc.cache._memory_cache", None)
+    monkeypatch.setattr("askcc.ratelimit.RATE_LIMIT_DIR", tmp_path / "ratelimit")
+    monkeypatch.setattr("askcc.runs.RUNS_DIR", tmp_path / "runs")
+    monkeypatch.setattr("askcc.repoindex.REPO_INDEX_DIR", tmp_path / "index")
+
+
+@pytest.fixture(autouse=True)
+def no_admission_gate(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Start claude right away, whatever the load of the machine running the tests."""
+    monkeypatch.setattr("askcc.supervisor.ADMISSION_MAX_LOAD", 0.0)
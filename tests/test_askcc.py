@@ -1,21 +1,51 @@
 from __future__ import annotations
 
+import json
+import sys
+import threading
+from dataclasses import replace
 from string import Template
 from typing import TYPE_CHECKING
 
 import pytest
 
 if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
     from pathlib import Path
 
-from askcc.definitions import AGENT_CONFIGS, AgentType
+    from askcc.definitions import AgentConfig
+    from tests.conftest import FakeClaude
+
+from askcc import functions, runner
+from askcc.definitions import (
+    AGENT_CONFIGS,
+    AgentType,
+    CommentFilter,
+    FetchOptions,
+    GithubIssue,
+    IssueComment,
+    IssueReference,
+)
 from askcc.functions import (
+    _fetch_issue_graphql,
+    _fetch_issue_rest,
     _parse_issue_url,
     bootstrap_templates,
+    fetch_new_comments,
+    fetch_references,
+    filter_comments,
+    find_references,
+    format_issue_content,
+    format_references,
+    install_skills,
+    list_repository_issues,
     load_agent_config,
     load_template,
+    parse_repository,
+    read_issue_urls,
     validate_template,
 )
+from askcc.github import GhCliClient, GithubAPIError
 
 
 class TestParseIssueUrl:
@@ -102,6 +132,115 @@ class TestBootstrapTemplates:
         # The pre-existing file should not be overwritten
         assert (templates_dir / "PLAN_SYSTEM_PROMPT.md").read_text() == "custom"
 
+    def test_bootstrap_skips_check_when_manifest_matches(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        templates_dir = tmp_path / "templates"
+        monkeypatch.setattr("askcc.functions.TEMPLATES_DIR", templates_dir)
+        bootstrap_templates()
+        assert (tmp_path / ".templates.manifest").is_file()
+
+        def fail_write(*_args: object) -> None:
+            raise AssertionError("templates should not be rewritten")
+
+        monkeypatch.setattr("pathlib.Path.write_text", fail_write)
+        bootstrap_templates()
+
+    def test_bootstrap_restores_deleted_file_despite_manifest(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        templates_dir = tmp_path / "templates"
+        monkeypatch.setattr("askcc.functions.TEMPLATES_DIR", templates_dir)
+        bootstrap_templates()
+
+        (templates_dir / "PLAN_USER_PROMPT.md").unlink()
+        bootstrap_templates()
+
+        assert {f.name for f in templates_dir.iterdir()} == EXPECTED_TEMPLATE_FILES
+
+
+@pytest.fixture
+def openclaw_config(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    config_path = tmp_path / "openclaw.json"
+    config_path.write_text(json.dumps({"skills": {"entries": {"other": {"enabled": False}}}}))
+    monkeypatch.setattr("askcc.functions.OPENCLAW_CONFIG_PATH", config_path)
+    return config_path
+
+
+class TestInstallSkills:
+    def test_installs_and_registers_skills(self, tmp_path: Path, openclaw_config: Path):
+        skills_dir = tmp_path / "skills"
+
+        changes = install_skills(skills_dir)
+
+        assert "request-askcc/SKILL.md" in changes
+        assert (skills_dir / "request-askcc" / "SKILL.md").read_text().startswith("---")
+        assert not (skills_dir / "request-askcc" / "__init__.py").exists()
+        assert json.loads(openclaw_config.read_text())["skills"]["entries"] == {
+            "other": {"enabled": False},
+            "request-askcc": {"enabled": True},
+        }
+
+    def test_second_install_writes_nothing(
+        self, tmp_path: Path, openclaw_config: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        skills_dir = tmp_path / "skills"
+        install_skills(skills_dir)
+
+        def fail_write(*_args: object, **_kwargs: object) -> None:
+            raise AssertionError("nothing should be rewritten")
+
+        monkeypatch.setattr("askcc.functions._install_file", fail_write)
+        monkeypatch.setattr("askcc.functions.write_atomically", fail_write)
+        assert install_skills(skills_dir) == []
+
+    def test_modified_file_is_restored(self, tmp_path: Path, openclaw_config: Path):
+        skills_dir = tmp_path / "skills"
+        install_skills(skills_dir)
+        skill_path = skills_dir / "request-askcc" / "SKILL.md"
+        original = skill_path.read_text()
+        skill_path.unlink()
+        skill_path.write_text("edited")
+
+        assert install_skills(skills_dir) == ["request-askcc/SKILL.md"]
+        assert skill_path.read_text() == original
+
+    def test_check_reports_drift_without_writing(self, tmp_path: Path, openclaw_config: Path):
+        skills_dir = tmp_path / "skills"
+        config = openclaw_config.read_text()
+
+        changes = install_skills(skills_dir, check=True)
+
+        assert "request-askcc/SKILL.md" in changes
+        assert any("request-askcc" in change and "openclaw.json" in change for change in changes)
+        assert not skills_dir.exists()
+        assert openclaw_config.read_text() == config
+
+        install_skills(skills_dir)
+        assert install_skills(skills_dir, check=True) == []
+
+    def test_falls_back_to_copying(self, tmp_path: Path, openclaw_config: Path, monkeypatch: pytest.MonkeyPatch):
+        def cross_device_link(*_args: object) -> None:
+            raise OSError(18, "Invalid cross-device link")
+
+        monkeypatch.setattr("askcc.functions.os.link", cross_device_link)
+
+        install_skills(tmp_path / "skills")
+
+        assert (tmp_path / "skills" / "request-askcc" / "SKILL.md").stat().st_nlink == 1
+
+    def test_missing_openclaw_config(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr("askcc.functions.OPENCLAW_CONFIG_PATH", tmp_path / "missing.json")
+
+        with pytest.raises(ValueError, match="not found"):
+            install_skills(tmp_path / "skills")
+
+    def test_check_reports_a_missing_openclaw_config(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        config_path = tmp_path / "missing.json"
+        monkeypatch.setattr("askcc.functions.OPENCLAW_CONFIG_PATH", config_path)
+
+        changes = install_skills(tmp_path / "skills", check=True)
+
+        assert any(change.startswith(f"{config_path} entry") for change in changes)
+        assert not config_path.exists()
+        assert not (tmp_path / "skills").exists()
+
 
 class TestLoadTemplate:
     def test_reads_custom_content(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
@@ -210,3 +349,585 @@ class TestStringTemplateSubstitution:
         result = Template(template_str).safe_substitute(issue_content=issue)
         assert '{"json": true' in result
         assert "$issue_content" not in result
+
+
+class TestReadIssueUrls:
+    def test_skips_blank_lines_comments_and_duplicates(self):
+        lines = [
+            "https://github.com/monkut/askcc-cli/issues/1\n",
+            "\n",
+            "# nightly triage\n",
+            "  https://github.com/monkut/askcc-cli/issues/2  \n",
+            "https://github.com/monkut/askcc-cli/issues/1\n",
+        ]
+        assert read_issue_urls(lines) == [
+            "https://github.com/monkut/askcc-cli/issues/1",
+            "https://github.com/monkut/askcc-cli/issues/2",
+        ]
+
+    def test_reads_from_file(self, tmp_path: Path):
+        urls_file = tmp_path / "urls.txt"
+        urls_file.write_text("https://github.com/monkut/askcc-cli/issues/3\n")
+        assert read_issue_urls(urls_file) == ["https://github.com/monkut/askcc-cli/issues/3"]
+
+    def test_invalid_url_raises(self):
+        with pytest.raises(ValueError):
+            read_issue_urls(["https://github.com/monkut/askcc-cli/pull/1"])
+
+
+def _issue_for_url(url: str) -> GithubIssue:
+    return GithubIssue(owner="monkut", repo="askcc-cli", number=int(url.rsplit("/", 1)[1]), title="Title", body="")
+
+
+class TestRunBatch:
+    def test_reports_exit_code_per_issue(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(runner, "fetch_issue", lambda url, _options: _issue_for_url(url))
+        prompts = []
+
+        def fake_run_claude(prompt: str, config: AgentConfig, **_kwargs) -> int:  # noqa: ARG001
+            prompts.append(prompt)
+            return 2 if prompt.endswith("Issue #2:\nTitle") else 0
+
+        monkeypatch.setattr(runner, "run_claude", fake_run_claude)
+        urls = [f"https://github.com/monkut/askcc-cli/issues/{number}" for number in (1, 2, 3)]
+
+        results = runner.run_batch(urls, AGENT_CONFIGS[AgentType.REVIEW], jobs=2)
+
+        assert [result.github_issue_url for result in results] == urls
+        assert [result.exit_code for result in results] == [0, 2, 0]
+        assert len(prompts) == 3
+
+    def test_fetch_failure_does_not_stop_batch(self, monkeypatch: pytest.MonkeyPatch):
+        def fake_fetch(url: str, _options: FetchOptions | None) -> GithubIssue:
+            if url.endswith("/1"):
+                raise ValueError("boom")
+            return _issue_for_url(url)
+
+        monkeypatch.setattr(runner, "fetch_issue", fake_fetch)
+        monkeypatch.setattr(runner, "run_claude", lambda *_args, **_kwargs: 0)
+        urls = ["https://github.com/monkut/askcc-cli/issues/1", "https://github.com/monkut/askcc-cli/issues/2"]
+
+        results = runner.run_batch(urls, AGENT_CONFIGS[AgentType.PLAN], jobs=4)
+
+        assert results[0].exit_code == 1
+        assert results[0].error == "boom"
+        assert results[1].exit_code == 0
+        assert results[1].error is None
+
+
+class TestFetchRetries:
+    URL = "https://github.com/monkut/askcc-cli/issues/7"
+
+    def _failing_fetch(self, errors: list[Exception]) -> Callable[..., GithubIssue]:
+        def fetch(url: str, _options: FetchOptions | None) -> GithubIssue:
+            if errors:
+                raise errors.pop(0)
+            return _issue_for_url(url)
+
+        return fetch
+
+    def test_transient_errors_are_retried(self, monkeypatch: pytest.MonkeyPatch):
+        delays = []
+        monkeypatch.setattr(runner.time, "sleep", delays.append)
+        errors: list[Exception] = [GithubAPIError("bad gateway", 502), ConnectionResetError("reset")]
+        monkeypatch.setattr(runner, "fetch_issue", self._failing_fetch(errors))
+
+        issue = runner.fetch_issue_with_retries(self.URL)
+
+        assert issue.number == 7
+        assert len(delays) == 2
+
+    @pytest.mark.parametrize(
+        "error", [GithubAPIError("not found", 404), GithubAPIError("gh auth login", 0), PermissionError("denied")]
+    )
+    def test_permanent_errors_are_not_retried(self, error: Exception, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(runner.time, "sleep", lambda _delay: pytest.fail("should not retry"))
+        monkeypatch.setattr(runner, "fetch_issue", self._failing_fetch([error]))
+
+        with pytest.raises(type(error), match=str(error)):
+            runner.fetch_issue_with_retries(self.URL)
+
+    def test_gives_up_after_max_attempts(self, monkeypatch: pytest.MonkeyPatch):
+        delays = []
+        monkeypatch.setattr(runner.time, "sleep", delays.append)
+        errors: list[Exception] = [GithubAPIError("unavailable", 503) for _ in range(10)]
+        monkeypatch.setattr(runner, "fetch_issue", self._failing_fetch(errors))
+
+        with pytest.raises(GithubAPIError):
+            runner.fetch_issue_with_retries(self.URL)
+
+        assert len(delays) == runner.FETCH_MAX_ATTEMPTS - 1
+
+    def test_retry_delay_grows_and_honors_retry_after(self):
+        delays = [runner._retry_delay(attempt, GithubAPIError("x", 502)) for attempt in range(1, 6)]
+        rate_limited = GithubAPIError("x", 403, {"retry-after": "7", "x-ratelimit-remaining": "0"})
+
+        assert all(
+            0 <= delay <= runner.FETCH_RETRY_BASE_DELAY * 2 ** (attempt - 1)
+            for attempt, delay in enumerate(delays, start=1)
+        )
+        assert runner._retry_delay(1, rate_limited) >= 7
+
+
+class FakePaginateClient:
+    def __init__(self, pages: list[list[dict]]) -> None:
+        self.pages = pages
+        self.calls: list[tuple[str, dict | None]] = []
+
+    def paginate(self, path: str, *, params: dict | None = None) -> Iterator[list[dict]]:
+        self.calls.append((path, params))
+        yield from self.pages
+
+
+class TestFetchNewComments:
+    def test_merges_new_and_edited_comments(self, monkeypatch: pytest.MonkeyPatch):
+        issue = replace(
+            _issue_for_url("https://github.com/monkut/askcc-cli/issues/5"),
+            comments=(
+                IssueComment(author="alice", body="old", created_at="2026-01-01T00:00:00Z", is_minimized=True),
+                IssueComment(author="bob", body="plan v1", created_at="2026-01-02T00:00:00Z"),
+            ),
+        )
+        client = FakePaginateClient(
+            [
+                [
+                    {"user": {"login": "bob"}, "body": "plan v2", "created_at": "2026-01-02T00:00:00Z"},
+                    {"user": {"login": "carol"}, "body": "new", "created_at": "2026-01-03T00:00:00Z"},
+                ]
+            ]
+        )
+        monkeypatch.setattr("askcc.functions.get_github_client", lambda: client)
+
+        updated = fetch_new_comments(issue, "2026-01-02T00:00:00Z")
+
+        assert client.calls == [("repos/monkut/askcc-cli/issues/5/comments", {"since": "2026-01-02T00:00:00Z"})]
+        assert [comment.body for comment in updated.comments] == ["old", "plan v2", "new"]
+        assert updated.comments[0].is_minimized
+
+    def test_no_new_comments_returns_same_issue(self, monkeypatch: pytest.MonkeyPatch):
+        issue = _issue_for_url("https://github.com/monkut/askcc-cli/issues/5")
+        monkeypatch.setattr("askcc.functions.get_github_client", lambda: FakePaginateClient([[]]))
+
+        assert fetch_new_comments(issue, "2026-01-02T00:00:00Z") is issue
+
+
+class TestListRepositoryIssues:
+    def test_streams_open_issues_and_skips_pull_requests(self, monkeypatch: pytest.MonkeyPatch):
+        client = FakePaginateClient(
+            [
+                [{"number": 1, "updated_at": "2026-01-01T00:00:00Z"}, {"number": 2, "pull_request": {}}],
+                [{"number": 3, "updated_at": "2026-01-03T00:00:00Z"}],
+            ]
+        )
+        monkeypatch.setattr("askcc.functions.get_github_client", lambda: client)
+
+        issues = list_repository_issues("monkut/askcc-cli", labels=["bug", "needs-triage"], since="2026-01-01")
+
+        assert [(issue.github_issue_url, issue.updated_at) for issue in issues] == [
+            ("https://github.com/monkut/askcc-cli/issues/1", "2026-01-01T00:00:00Z"),
+            ("https://github.com/monkut/askcc-cli/issues/3", "2026-01-03T00:00:00Z"),
+        ]
+        assert client.calls == [
+            (
+                "repos/monkut/askcc-cli/issues",
+                {
+                    "state": "open",
+                    "sort": "updated",
+                    "direction": "asc",
+                    "per_page": 100,
+                    "labels": "bug,needs-triage",
+                    "since": "2026-01-01",
+                },
+            )
+        ]
+
+    @pytest.mark.parametrize("repository", ["monkut", "monkut/askcc-cli/issues", "/askcc-cli"])
+    def test_invalid_repository(self, repository: str):
+        with pytest.raises(ValueError, match="owner/name"):
+            parse_repository(repository)
+
+
+class TestRunPipeline:
+    URLS = ("https://github.com/monkut/askcc-cli/issues/1", "https://github.com/monkut/askcc-cli/issues/2")
+    STAGES = (AGENT_CONFIGS[AgentType.REVIEW], AGENT_CONFIGS[AgentType.PLAN], AGENT_CONFIGS[AgentType.DEVELOP])
+
+    def test_fetches_once_and_refetches_only_new_comments(self, monkeypatch: pytest.MonkeyPatch):
+        fetched = []
+        since_values = []
+
+        def fake_fetch(url: str, _options: FetchOptions | None) -> GithubIssue:
+            fetched.append(url)
+            return _issue_for_url(url)
+
+        def fake_fetch_new_comments(issue: GithubIssue, since: str) -> GithubIssue:
+            since_values.append(since)
+            comment = IssueComment(author="askcc", body=f"stage {len(since_values)} done")
+            return replace(issue, comments=(*issue.comments, comment))
+
+        prompts = []
+        monkeypatch.setattr(runner, "fetch_issue", fake_fetch)
+        monkeypatch.setattr(runner, "fetch_new_comments", fake_fetch_new_comments)
+        monkeypatch.setattr(runner, "run_claude", lambda prompt, **_kwargs: prompts.append(prompt) or 0)
+
+        results = runner.run_pipeline(list(self.URLS[:1]), list(self.STAGES))
+
+        assert fetched == [self.URLS[0]]
+        assert len(since_values) == 2
+        assert all(since.endswith("Z") for since in since_values)
+        assert "stage 1 done" not in prompts[0]
+        assert "stage 1 done" in prompts[1]
+        assert "stage 2 done" in prompts[2]
+        assert [result.agent_name for result in results] == ["reviewer", "planner", "developer"]
+
+    def test_failing_stage_stops_the_issue_pipeline(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(runner, "fetch_issue", lambda url, _options: _issue_for_url(url))
+        monkeypatch.setattr(runner, "fetch_new_comments", lambda issue, _since: issue)
+        monkeypatch.setattr(runner, "run_claude", lambda prompt, **_kwargs: 4 if "Issue #1:" in prompt else 0)
+
+        results = runner.run_pipeline(list(self.URLS), list(self.STAGES))
+
+        assert [(result.github_issue_url, result.agent_name, result.exit_code) for result in results] == [
+            (self.URLS[0], "reviewer", 4),
+            (self.URLS[1], "reviewer", 0),
+            (self.URLS[1], "planner", 0),
+            (self.URLS[1], "developer", 0),
+        ]
+
+    def test_next_issue_is_prefetched_while_claude_runs(self, monkeypatch: pytest.MonkeyPatch):
+        second_issue_fetched = threading.Event()
+        prefetched_during_first_run = []
+
+        def fake_fetch(url: str, _options: FetchOptions | None) -> GithubIssue:
+            if url == self.URLS[1]:
+                second_issue_fetched.set()
+            return _issue_for_url(url)
+
+        def fake_run_claude(prompt: str, **_kwargs: object) -> int:
+            if "Issue #1:" in prompt:
+                prefetched_during_first_run.append(second_issue_fetched.wait(timeout=5))
+            return 0
+
+        monkeypatch.setattr(runner, "fetch_issue", fake_fetch)
+        monkeypatch.setattr(runner, "run_claude", fake_run_claude)
+
+        runner.run_pipeline(list(self.URLS), [AGENT_CONFIGS[AgentType.REVIEW]])
+
+        assert prefetched_during_first_run == [True]
+
+
+FAKE_GH_SCRIPT = """\
+import json, sys
+responses = json.load(open({responses_path!r}))
+args = [arg for arg in sys.argv[2:] if not arg.startswith("--")]
+if "--include" in sys.argv:
+    sys.stdout.write("HTTP/2.0 200 OK\\nEtag: W/\\"abc\\"\\n\\n")
+sys.stdout.write(responses[args[0]])
+"""
+
+
+def _write_fake_gh(tmp_path: Path, responses: dict[str, object]) -> str:
+    """Write a fake 'gh' executable answering `gh api <endpoint>` calls from canned JSON responses."""
+    responses_path = tmp_path / "responses.json"
+    responses_path.write_text(json.dumps({endpoint: json.dumps(data) for endpoint, data in responses.items()}))
+    gh_path = tmp_path / "gh"
+    gh_path.write_text(f"#!{sys.executable}\n" + FAKE_GH_SCRIPT.format(responses_path=str(responses_path)))
+    gh_path.chmod(0o755)
+    return str(gh_path)
+
+
+def _graphql_page(comments: list[dict], *, has_next_page: bool = False, end_cursor: str | None = None) -> dict:
+    issue = {
+        "title": "Crash on start",
+        "body": "It crashes.",
+        "updatedAt": "2026-01-02T00:00:00Z",
+        "labels": {"nodes": [{"name": "bug"}]},
+        "comments": {"pageInfo": {"hasNextPage": has_next_page, "endCursor": end_cursor}, "nodes": comments},
+    }
+    return {"repository": {"issue": issue}}
+
+
+class FakeGraphqlClient:
+    def __init__(self, pages: list[dict]) -> None:
+        self.pages = pages
+        self.calls: list[dict] = []
+
+    def graphql(self, _query: str, variables: dict) -> dict:
+        self.calls.append(variables)
+        return self.pages[len(self.calls) - 1]
+
+
+class TestFetchIssueEngines:
+    def test_graphql_single_request(self):
+        comments = [{"author": {"login": "alice"}, "body": "Me too", "reactions": {"totalCount": 3}}]
+        client = FakeGraphqlClient([_graphql_page(comments)])
+
+        issue, etag = _fetch_issue_graphql(client, "monkut", "askcc-cli", 42)
+
+        assert len(client.calls) == 1
+        assert etag == ""
+        assert issue.title == "Crash on start"
+        assert issue.labels == ("bug",)
+        assert issue.comments == (IssueComment(author="alice", body="Me too", reactions=3),)
+
+    def test_graphql_follows_comment_pages(self):
+        client = FakeGraphqlClient(
+            [
+                _graphql_page([{"author": {"login": "alice"}, "body": "first"}], has_next_page=True, end_cursor="c1"),
+                _graphql_page([{"author": None, "body": "second"}]),
+            ]
+        )
+
+        issue, _etag = _fetch_issue_graphql(client, "monkut", "askcc-cli", 42)
+
+        assert client.calls[1]["cursor"] == "c1"
+        assert [comment.author for comment in issue.comments] == ["alice", "ghost"]
+
+    def test_graphql_missing_issue_raises(self):
+        with pytest.raises(ValueError, match="not found"):
+            _fetch_issue_graphql(FakeGraphqlClient([{"repository": {"issue": None}}]), "monkut", "askcc-cli", 42)
+
+    def test_rest_engine_with_gh_cli(self, tmp_path: Path):
+        gh = _write_fake_gh(
+            tmp_path,
+            {
+                "repos/monkut/askcc-cli/issues/42": {
+                    "title": "Crash on start",
+                    "body": None,
+                    "labels": [{"name": "bug"}],
+                    "updated_at": "2026-01-02T00:00:00Z",
+                },
+                "repos/monkut/askcc-cli/issues/42/comments": [{"user": {"login": "bob"}, "body": "Same here"}],
+            },
+        )
+
+        issue, _etag = _fetch_issue_rest(GhCliClient(gh), "monkut", "askcc-cli", 42)
+
+        assert issue.body == ""
+        assert issue.labels == ("bug",)
+        assert issue.comments == (IssueComment(author="bob", body="Same here"),)
+
+
+class TestFormatIssueContent:
+    def test_combines_issue_and_comments(self):
+        issue = GithubIssue(
+            owner="monkut",
+            repo="askcc-cli",
+            number=42,
+            title="Crash on start",
+            body="It crashes.",
+            comments=(IssueComment(author="alice", body="Me too"), IssueComment(author="bob", body="Same")),
+        )
+        assert format_issue_content(issue) == (
+            "Issue #42:\nCrash on start\nIt crashes.\n\n"
+            "Comments:\nComment by @alice:\nMe too\n---\nComment by @bob:\nSame"
+        )
+
+    def test_no_comments_section_without_comments(self):
+        issue = GithubIssue(owner="monkut", repo="askcc-cli", number=1, title="Title", body="")
+        assert format_issue_content(issue) == "Issue #1:\nTitle"
+
+
+REFERENCED_BODIES = {
+    1: "Caused by #2, see also monkut/other#5 and https://github.com/monkut/askcc-cli/pull/3. Not &#4; or #1 itself.",
+    2: "Regression from GH-6.",
+    3: "Fixes #1 and #2.",
+    6: "Started with " + "a very long description " * 20,
+}
+
+
+class TestFetchReferences:
+    @pytest.fixture
+    def fetched(self, monkeypatch: pytest.MonkeyPatch) -> list[tuple[str, int]]:
+        fetched: list[tuple[str, int]] = []
+
+        def fake_engine(_client: object, owner: str, repo: str, issue_number: int) -> tuple[GithubIssue, str]:
+            fetched.append((repo, issue_number))
+            if issue_number == 404:
+                raise GithubAPIError("not found", 404)
+            return GithubIssue(
+                owner=owner,
+                repo=repo,
+                number=issue_number,
+                title=f"Title {issue_number}",
+                body=REFERENCED_BODIES.get(issue_number, ""),
+                state="closed" if issue_number == 3 else "open",
+                is_pull_request=issue_number == 3,
+            ), "etag"
+
+        monkeypatch.setattr(functions, "get_github_client", lambda: None)
+        monkeypatch.setattr(functions, "_revalidate_issue", lambda *_args: (True, "etag"))
+        for engine in functions.ISSUE_FETCH_ENGINES:
+            monkeypatch.setitem(functions.ISSUE_FETCH_ENGINES, engine, fake_engine)
+        return fetched
+
+    def test_find_references(self):
+        issue = GithubIssue(
+            owner="monkut",
+            repo="askcc-cli",
+            number=1,
+            title="",
+            body=REFERENCED_BODIES[1],
+            comments=(IssueComment(author="alice", body="Dup of #2, related to #7"),),
+        )
+
+        assert find_references(issue) == [
+            ("monkut", "askcc-cli", 2),
+            ("monkut", "other", 5),
+            ("monkut", "askcc-cli", 3),
+            ("monkut", "askcc-cli", 1),
+            ("monkut", "askcc-cli", 7),
+        ]
+
+    @pytest.mark.parametrize(
+        "text",
+        [
+            "color: #000000 and #1234567",
+            "see page#12 or item-#3",
+            "documented in docs/setup.md#12 and ./src/foo#3",
+            "see lib/src/foo#3",
+            "run `git log #12` first",
+            "```\nerror at #12\n```",
+            "~~~python\nx = 1  #12\n",
+        ],
+    )
+    def test_not_references(self, text: str):
+        issue = GithubIssue(owner="monkut", repo="askcc-cli", number=1, title="", body=text)
+
+        assert find_references(issue) == []
+
+    def test_references_per_issue_are_capped(self, fetched: list[tuple[str, int]], monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(functions, "MAX_REFERENCES_PER_ISSUE", 2)
+        issue = GithubIssue(owner="monkut", repo="askcc-cli", number=1, title="", body="#10 #11 #12 (#13)")
+
+        references = fetch_references(issue, FetchOptions(use_cache=False, reference_depth=1))
+
+        assert [reference.number for reference in references] == [10, 11]
+        assert len(fetched) == 2
+
+    def test_depth_one(self, fetched: list[tuple[str, int]]):
+        issue = functions.fetch_issue(
+            "https://github.com/monkut/askcc-cli/issues/1", FetchOptions(use_cache=False, reference_depth=1)
+        )
+
+        assert sorted(fetched[1:]) == [("askcc-cli", 2), ("askcc-cli", 3), ("other", 5)]
+        assert [(reference.repo, reference.number) for reference in issue.references] == [
+            ("askcc-cli", 2),
+            ("other", 5),
+            ("askcc-cli", 3),
+        ]
+        assert issue.references[2].is_pull_request
+
+    def test_deeper_references_are_fetched_once(self, fetched: list[tuple[str, int]]):
+        issue = GithubIssue(owner="monkut", repo="askcc-cli", number=1, title="", body=REFERENCED_BODIES[1])
+
+        references = fetch_references(issue, FetchOptions(use_cache=False, reference_depth=2))
+
+        assert sorted(fetched) == [("askcc-cli", 2), ("askcc-cli", 3), ("askcc-cli", 6), ("other", 5)]
+        assert [(reference.number, reference.depth) for reference in references] == [(2, 1), (5, 1), (3, 1), (6, 2)]
+        assert len(references[3].summary) == functions.REFERENCE_SUMMARY_CHARS
+        assert references[3].summary.endswith("…")
+
+    def test_total_is_capped(self, fetched: list[tuple[str, int]], monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(functions, "MAX_REFERENCES", 2)
+        issue = GithubIssue(owner="monkut", repo="askcc-cli", number=1, title="", body=REFERENCED_BODIES[1])
+
+        references = fetch_references(issue, FetchOptions(use_cache=False, reference_depth=3))
+
+        assert [reference.number for reference in references] == [2, 5]
+        assert len(fetched) == 2
+
+    def test_failed_references_are_skipped(self, fetched: list[tuple[str, int]]):
+        issue = GithubIssue(owner="monkut", repo="askcc-cli", number=1, title="", body="See #404 and #2")
+
+        references = fetch_references(issue, FetchOptions(use_cache=False, reference_depth=1))
+
+        assert [reference.number for reference in references] == [2]
+
+    def test_references_are_cached(self, fetched: list[tuple[str, int]]):
+        issue = GithubIssue(owner="monkut", repo="askcc-cli", number=1, title="", body="See #2")
+
+        fetch_references(issue, FetchOptions(reference_depth=1))
+        fetch_references(issue, FetchOptions(reference_depth=1))
+
+        assert fetched == [("askcc-cli", 2)]
+
+    def test_formatted_after_the_comments(self):
+        reference = IssueReference(
+            owner="monkut", repo="askcc-cli", number=3, title="Fix crash", state="closed", is_pull_request=True
+        )
+        issue = GithubIssue(owner="monkut", repo="askcc-cli", number=1, title="Title", body="", references=(reference,))
+
+        assert format_issue_content(issue) == (
+            "Issue #1:\nTitle\n\nReferenced issues and pull requests:\n"
+            "- monkut/askcc-cli#3 (closed pull request) Fix crash"
+        )
+        assert format_references([replace(reference, depth=2, summary="Fixes #1.")]).endswith(
+            "(closed pull request, 2 references away) Fix crash: Fixes #1."
+        )
+
+
+class TestPromptTransport:
+    def test_small_prompt_passed_as_argument(self, fake_claude: FakeClaude):
+        assert runner.run_claude("Plan this", AGENT_CONFIGS[AgentType.PLAN]) == 0
+
+        assert fake_claude.args[:2] == ["-p", "Plan this"]
+        assert fake_claude.stdin == ""
+
+    def test_large_prompt_piped_through_stdin(self, fake_claude: FakeClaude, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(runner, "PROMPT_ARGV_MAX_BYTES", 1024)
+        prompt = "x" * 4096
+
+        assert runner.run_claude(prompt, AGENT_CONFIGS[AgentType.PLAN]) == 0
+
+        assert prompt not in fake_claude.args
+        assert fake_claude.args[0] == "-p"
+        assert fake_claude.stdin == prompt
+
+    def test_prompt_larger_than_arg_limit_in_stream_mode(self, fake_claude: FakeClaude):
+        prompt = "x" * (runner.MAX_ARG_STRLEN + 1)
+
+        assert runner.run_claude(prompt, AGENT_CONFIGS[AgentType.PLAN], stream=True) == 0
+
+        assert fake_claude.stdin == prompt
+
+    def test_forced_transport(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(runner, "PROMPT_TRANSPORT", "stdin")
+        assert runner._use_stdin_transport("short")
+        monkeypatch.setattr(runner, "PROMPT_TRANSPORT", "argv")
+        assert not runner._use_stdin_transport("x" * (runner.PROMPT_ARGV_MAX_BYTES + 1))
+
+    def test_agents_argument_too_large_raises(self):
+        config = replace(AGENT_CONFIGS[AgentType.PLAN], system_prompt="x" * runner.MAX_ARG_STRLEN)
+        with pytest.raises(ValueError, match="too large"):
+            runner._agents_argument(config)
+
+
+COMMENTS = (
+    IssueComment(author="alice", body="old", created_at="2026-01-01T00:00:00Z"),
+    IssueComment(author="dependabot[bot]", body="bump", created_at="2026-01-02T00:00:00Z"),
+    IssueComment(author="ci", body="build ok", created_at="2026-01-03T00:00:00Z", is_bot=True),
+    IssueComment(author="bob", body="off-topic", created_at="2026-01-04T00:00:00Z", is_minimized=True),
+    IssueComment(author="carol", body="new", created_at="2026-01-05T00:00:00Z"),
+)
+
+
+class TestFilterComments:
+    def test_no_filter_keeps_everything(self):
+        assert list(filter_comments(COMMENTS, CommentFilter())) == list(COMMENTS)
+
+    def test_skip_bots(self):
+        kept = filter_comments(COMMENTS, CommentFilter(skip_bots=True))
+        assert [comment.author for comment in kept] == ["alice", "bob", "carol"]
+
+    def test_skip_minimized(self):
+        kept = filter_comments(COMMENTS, CommentFilter(skip_minimized=True))
+        assert "bob" not in [comment.author for comment in kept]
+
+    def test_since(self):
+        kept = filter_comments(COMMENTS, CommentFilter(since="2026-01-04"))
+        assert [comment.author for comment in kept] == ["bob", "carol"]
+
+    def test_format_issue_content_applies_filter(self):
+        issue = GithubIssue(owner="monkut", repo="askcc-cli", number=1, title="Title", body="", comments=COMMENTS)
+        content = format_issue_content(issue, CommentFilter(skip_bots=True, skip_minimized=True, since="2026-01-02"))
+        assert content == "Issue #1:\nTitle\n\nComments:\nComment by @carol:\nnew"
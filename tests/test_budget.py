@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from dataclasses import replace
+
+from askcc import runner
+from askcc.budget import budget_issue_content, estimate_tokens
+from askcc.definitions import AGENT_CONFIGS, AgentType, CommentFilter, GithubIssue, IssueComment, IssueReference
+from askcc.functions import format_issue_content
+
+
+def _issue(comments: list[IssueComment]) -> GithubIssue:
+    return GithubIssue(
+        owner="monkut",
+        repo="askcc-cli",
+        number=7,
+        title="Slow fetch",
+        body="Fetching is slow.",
+        comments=tuple(comments),
+    )
+
+
+def _comment(index: int, *, reactions: int = 0, size: int = 400) -> IssueComment:
+    return IssueComment(
+        author=f"user{index}",
+        body=f"comment {index} " + "x" * size,
+        created_at=f"2026-01-{index + 1:02d}T00:00:00Z",
+        reactions=reactions,
+    )
+
+
+class TestEstimateTokens:
+    def test_rounds_up(self):
+        assert estimate_tokens("") == 0
+        assert estimate_tokens("abc") == 1
+        assert estimate_tokens("abcde") == 2
+
+
+class TestBudgetIssueContent:
+    def test_within_budget_is_unchanged(self):
+        issue = _issue([_comment(0), _comment(1)])
+
+        content, report = budget_issue_content(issue, max_tokens=10_000)
+
+        assert content == format_issue_content(issue)
+        assert report.dropped == ()
+        assert report.kept_comments == 2
+
+    def test_keeps_body_newest_and_most_reacted(self):
+        comments = [_comment(i, reactions=10 if i == 1 else 0) for i in range(10)]
+        issue = _issue(comments)
+
+        content, report = budget_issue_content(issue, max_tokens=400)
+
+        assert content.startswith("Issue #7:\nSlow fetch\nFetching is slow.\n\nComments:\n")
+        assert "comment 9 " in content  # newest
+        assert "comment 1 " in content  # most reacted
+        assert "comment 5 " not in content
+        assert "[... 1 comment(s) trimmed to fit the prompt budget ...]" in content
+        assert "[... 7 comment(s) trimmed to fit the prompt budget ...]" in content
+        assert report.kept_comments == 2
+        assert [comment.author for comment in report.dropped] == [f"user{i}" for i in (0, 2, 3, 4, 5, 6, 7, 8)]
+        assert estimate_tokens(content) <= 400
+
+    def test_references_are_kept(self):
+        reference = IssueReference(
+            owner="monkut", repo="askcc-cli", number=3, title="Fix slow fetch", summary="x" * 200
+        )
+        issue = replace(_issue([_comment(i) for i in range(10)]), references=(reference,))
+
+        content, _ = budget_issue_content(issue, max_tokens=400)
+
+        assert content.endswith(f"- monkut/askcc-cli#3 (issue) Fix slow fetch: {'x' * 200}")
+        assert estimate_tokens(content) <= 400
+
+    def test_kept_comments_stay_in_chronological_order(self):
+        comments = [_comment(0, reactions=5), _comment(1), _comment(2)]
+
+        content, _ = budget_issue_content(_issue(comments), max_tokens=300)
+
+        assert content.index("comment 0 ") < content.index("comment 2 ")
+
+    def test_comment_filter_is_applied_first(self):
+        comments = [_comment(0), replace(_comment(1), is_bot=True)]
+
+        content, report = budget_issue_content(
+            _issue(comments), max_tokens=10_000, comment_filter=CommentFilter(skip_bots=True)
+        )
+
+        assert "comment 1 " not in content
+        assert report.kept_comments == 1
+
+    def test_summary_lists_dropped_comments(self):
+        _, report = budget_issue_content(_issue([_comment(i) for i in range(3)]), max_tokens=200)
+
+        assert "2 trimmed" in report.summary()
+        assert "@user0 2026-01-01T00:00:00Z" in report.summary()
+
+
+class TestRenderPromptBudget:
+    def test_agent_budget_trims_prompt(self):
+        config = replace(AGENT_CONFIGS[AgentType.PLAN], max_prompt_tokens=500)
+
+        prompt = runner.render_prompt(config, _issue([_comment(i) for i in range(20)]))
+
+        assert estimate_tokens(prompt) <= 500
+        assert "trimmed to fit the prompt budget" in prompt
+
+    def test_no_budget_keeps_everything(self):
+        config = runner.with_prompt_budget(AGENT_CONFIGS[AgentType.PLAN], 0)
+        issue = _issue([_comment(i) for i in range(20)])
+
+        prompt = runner.render_prompt(config, issue)
+
+        assert config.max_prompt_tokens is None
+        assert format_issue_content(issue) in prompt
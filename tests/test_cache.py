@@ -0,0 +1,373 @@
+from __future__ import annotations
+
+import io
+import json
+import os
+from typing import TYPE_CHECKING
+
+import pytest
+
+from askcc import cli, functions, runner
+from askcc.cache import IssueCache, ResultCache, enable_memory_cache, result_key
+from askcc.definitions import AGENT_CONFIGS, AgentType, CommentFilter, FetchOptions, GithubIssue, IssueComment
+from askcc.github import GithubAPIError, GithubResponse
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from tests.conftest import FakeClaude
+
+ISSUE_URL = "https://github.com/monkut/askcc-cli/issues/42"
+
+
+def _issue(number: int = 42, body: str = "It crashes.") -> GithubIssue:
+    return GithubIssue(
+        owner="monkut",
+        repo="askcc-cli",
+        number=number,
+        title="Crash on start",
+        body=body,
+        labels=("bug",),
+        comments=(IssueComment(author="alice", body="Me too", reactions=2),),
+        updated_at="2026-01-02T00:00:00Z",
+    )
+
+
+class TestIssueCache:
+    def test_round_trip(self, tmp_path: Path):
+        cache = IssueCache(tmp_path)
+        cache.put(_issue(), 'W/"abc"')
+
+        cached = cache.get("monkut", "askcc-cli", 42)
+
+        assert cached is not None
+        assert cached.issue == _issue()
+        assert cached.etag == 'W/"abc"'
+
+    def test_missing_entry(self, tmp_path: Path):
+        assert IssueCache(tmp_path).get("monkut", "askcc-cli", 1) is None
+
+    def test_corrupt_entry_is_ignored(self, tmp_path: Path):
+        cache = IssueCache(tmp_path)
+        cache.put(_issue(), "etag")
+        next(cache.directory.rglob("42.json")).write_text("{not json")
+
+        assert cache.get("monkut", "askcc-cli", 42) is None
+
+    def test_memory_cache_skips_reading_the_entry(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        enable_memory_cache(max_entries=1)
+        cache = IssueCache(tmp_path)
+        cache.put(_issue(), "etag")
+        assert cache.get("monkut", "askcc-cli", 42) is not None
+        monkeypatch.setattr("askcc.cache.json.loads", pytest.fail)
+
+        cached = cache.get("monkut", "askcc-cli", 42)
+
+        assert cached is not None
+        assert cached.issue == _issue()
+
+    def test_memory_cache_rereads_a_replaced_entry(self, tmp_path: Path):
+        enable_memory_cache(max_entries=1)
+        cache = IssueCache(tmp_path)
+        cache.put(_issue(), "etag-1")
+        assert cache.get("monkut", "askcc-cli", 42) is not None
+
+        # e.g. written by another askcc process
+        IssueCache(tmp_path).put(_issue(body="updated"), "etag-2")
+        cached = cache.get("monkut", "askcc-cli", 42)
+
+        assert cached is not None
+        assert (cached.issue.body, cached.etag) == ("updated", "etag-2")
+
+    def test_memory_cache_forgets_evicted_entries(self, tmp_path: Path):
+        enable_memory_cache(max_entries=1)
+        cache = IssueCache(tmp_path)
+        cache.put(_issue(), "etag")
+        assert cache.get("monkut", "askcc-cli", 42) is not None
+
+        next(cache.directory.rglob("42.json")).unlink()
+
+        assert cache.get("monkut", "askcc-cli", 42) is None
+
+    def test_evicts_least_recently_used(self, tmp_path: Path):
+        cache = IssueCache(tmp_path, max_bytes=10**9)
+        for number in (1, 2, 3):
+            cache.put(_issue(number, body="x" * 1000), "etag")
+        paths = {number: next(cache.directory.rglob(f"{number}.json")) for number in (1, 2, 3)}
+        for age, number in enumerate((2, 1, 3)):
+            os.utime(paths[number], (1000 + age, 1000 + age))
+        entry_size = paths[1].stat().st_size
+
+        cache.max_bytes = entry_size * 2
+        cache.evict()
+
+        assert not paths[2].exists()
+        assert paths[1].exists()
+        assert paths[3].exists()
+
+
+class FakeRestClient:
+    def __init__(self, response: GithubResponse) -> None:
+        self.response = response
+        self.headers: list[dict[str, str] | None] = []
+
+    def get(self, _path: str, *, headers: dict[str, str] | None = None) -> GithubResponse:
+        self.headers.append(headers)
+        return self.response
+
+
+class TestFetchIssueCaching:
+    _revalidate = staticmethod(functions._revalidate_issue)
+
+    def _setup(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path, *, not_modified: bool) -> list[int]:
+        engine_calls: list[int] = []
+
+        def fake_engine(_client: object, _owner: str, _repo: str, issue_number: int) -> tuple[GithubIssue, str]:
+            engine_calls.append(issue_number)
+            return _issue(issue_number, body="fresh"), ""
+
+        monkeypatch.setattr(functions, "get_github_client", lambda: None)
+        monkeypatch.setitem(functions.ISSUE_FETCH_ENGINES, functions.GITHUB_FETCH_ENGINE, fake_engine)
+        monkeypatch.setattr(functions, "_revalidate_issue", lambda *_args: (not_modified, "etag-2"))
+        monkeypatch.setattr(functions, "IssueCache", lambda: IssueCache(tmp_path))
+        return engine_calls
+
+    def test_not_modified_uses_cached_copy(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+        engine_calls = self._setup(monkeypatch, tmp_path, not_modified=True)
+        IssueCache(tmp_path).put(_issue(body="cached"), "etag-1")
+
+        issue = functions.fetch_issue(ISSUE_URL)
+
+        assert issue.body == "cached"
+        assert engine_calls == []
+
+    def test_modified_refetches_and_stores(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+        engine_calls = self._setup(monkeypatch, tmp_path, not_modified=False)
+        IssueCache(tmp_path).put(_issue(body="cached"), "etag-1")
+
+        issue = functions.fetch_issue(ISSUE_URL)
+
+        assert issue.body == "fresh"
+        assert engine_calls == [42]
+        cached = IssueCache(tmp_path).get("monkut", "askcc-cli", 42)
+        assert cached is not None
+        assert cached.etag == "etag-2"
+
+    @pytest.mark.parametrize(("cached_engine", "hit"), [("graphql", True), ("rest", False)])
+    def test_skip_minimized_only_reuses_graphql_entries(
+        self, cached_engine: str, hit: bool, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ):
+        engine_calls = self._setup(monkeypatch, tmp_path, not_modified=True)
+        fake_engine = functions.ISSUE_FETCH_ENGINES[functions.GITHUB_FETCH_ENGINE]
+        monkeypatch.setitem(functions.ISSUE_FETCH_ENGINES, "graphql", fake_engine)
+        IssueCache(tmp_path).put(_issue(body="cached"), "etag-1", cached_engine)
+
+        options = FetchOptions(comment_filter=CommentFilter(skip_minimized=True))
+        issue, _cache_status = functions._fetch_issue(ISSUE_URL, options, engine="graphql")
+
+        assert issue.body == ("cached" if hit else "fresh")
+        assert engine_calls == ([] if hit else [42])
+        cached = IssueCache(tmp_path).get("monkut", "askcc-cli", 42)
+        assert cached is not None
+        assert cached.engine == "graphql"
+
+    def test_cold_fetch_skips_revalidation(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+        engine_calls = self._setup(monkeypatch, tmp_path, not_modified=False)
+        monkeypatch.setattr(functions, "_revalidate_issue", pytest.fail)
+
+        issue = functions.fetch_issue(ISSUE_URL)
+
+        assert issue.body == "fresh"
+        assert engine_calls == [42]
+        assert IssueCache(tmp_path).get("monkut", "askcc-cli", 42) is not None
+
+    @pytest.mark.parametrize(("updated_at", "hit"), [("2026-01-02T00:00:00Z", True), ("2026-02-01T00:00:00Z", False)])
+    def test_entry_without_etag_is_validated_by_updated_at(
+        self, updated_at: str, hit: bool, monkeypatch: pytest.MonkeyPatch, tmp_path: Path
+    ):
+        engine_calls = self._setup(monkeypatch, tmp_path, not_modified=False)
+        monkeypatch.setattr(functions, "_revalidate_issue", self._revalidate)
+        client = FakeRestClient(GithubResponse(200, {"etag": "etag-2"}, json.dumps({"updated_at": updated_at})))
+        monkeypatch.setattr(functions, "get_github_client", lambda: client)
+        IssueCache(tmp_path).put(_issue(body="cached"), "")
+
+        issue = functions.fetch_issue(ISSUE_URL)
+
+        assert client.headers == [None]
+        assert issue.body == ("cached" if hit else "fresh")
+        assert engine_calls == ([] if hit else [42])
+        cached = IssueCache(tmp_path).get("monkut", "askcc-cli", 42)
+        assert cached is not None
+        assert cached.etag == "etag-2"
+
+    def test_no_cache_skips_revalidation(self, monkeypatch: pytest.MonkeyPatch, tmp_path: Path):
+        engine_calls = self._setup(monkeypatch, tmp_path, not_modified=True)
+
+        def fail_revalidate(*_args: object) -> tuple[bool, str]:
+            raise GithubAPIError("rate limited", 403)
+
+        monkeypatch.setattr(functions, "_revalidate_issue", fail_revalidate)
+
+        functions.fetch_issue(ISSUE_URL, FetchOptions(use_cache=False))
+
+        assert engine_calls == [42]
+        assert IssueCache(tmp_path).get("monkut", "askcc-cli", 42) is None
+
+
+class TestResultCache:
+    def test_round_trip(self, tmp_path: Path):
+        cache = ResultCache(tmp_path)
+        key = result_key("reviewer", "system", "prompt", "abc123")
+        cache.put(key, 0, "Looks good.\n")
+
+        cached = cache.get(key)
+
+        assert cached is not None
+        assert (cached.exit_code, cached.output) == (0, "Looks good.\n")
+        assert cached.created_at > 0
+
+    def test_key_depends_on_prompt_and_commit(self):
+        key = result_key("reviewer", "system", "prompt", "abc123")
+
+        assert key == result_key("reviewer", "system", "prompt", "abc123")
+        assert key != result_key("reviewer", "system", "other prompt", "abc123")
+        assert key != result_key("reviewer", "system", "prompt", "def456")
+        assert key != result_key("reviewer", "system", "prompt", None)
+
+    def test_corrupt_entry_is_ignored(self, tmp_path: Path):
+        cache = ResultCache(tmp_path)
+        key = result_key("reviewer", "system", "prompt", None)
+        cache.put(key, 0, "output")
+        next(cache.directory.rglob(f"{key}.json")).write_text("{not json")
+
+        assert cache.get(key) is None
+
+    def test_entry_evicted_while_read_is_not_recreated(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        cache = ResultCache(tmp_path)
+        key = result_key("reviewer", "system", "prompt", None)
+        cache.put(key, 0, "output")
+        path = next(cache.directory.rglob(f"{key}.json"))
+        loads = json.loads
+
+        def load_then_evict(text: str) -> object:
+            path.unlink()  # another process evicts the entry right after it was read
+            return loads(text)
+
+        monkeypatch.setattr("askcc.cache.json.loads", load_then_evict)
+
+        assert cache.get(key) is not None
+        assert not path.exists()
+
+    def test_memory_cache_skips_reading_the_entry(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        enable_memory_cache(max_entries=1)
+        cache = IssueCache(tmp_path)
+        cache.put(_issue(), "etag")
+        assert cache.get("monkut", "askcc-cli", 42) is not None
+        monkeypatch.setattr("askcc.cache.json.loads", pytest.fail)
+
+        cached = cache.get("monkut", "askcc-cli", 42)
+
+        assert cached is not None
+        assert cached.issue == _issue()
+
+    def test_memory_cache_rereads_a_replaced_entry(self, tmp_path: Path):
+        enable_memory_cache(max_entries=1)
+        cache = IssueCache(tmp_path)
+        cache.put(_issue(), "etag-1")
+        assert cache.get("monkut", "askcc-cli", 42) is not None
+
+        # e.g. written by another askcc process
+        IssueCache(tmp_path).put(_issue(body="updated"), "etag-2")
+        cached = cache.get("monkut", "askcc-cli", 42)
+
+        assert cached is not None
+        assert (cached.issue.body, cached.etag) == ("updated", "etag-2")
+
+    def test_memory_cache_forgets_evicted_entries(self, tmp_path: Path):
+        enable_memory_cache(max_entries=1)
+        cache = IssueCache(tmp_path)
+        cache.put(_issue(), "etag")
+        assert cache.get("monkut", "askcc-cli", 42) is not None
+
+        next(cache.directory.rglob("42.json")).unlink()
+
+        assert cache.get("monkut", "askcc-cli", 42) is None
+
+    def test_evicts_least_recently_used(self, tmp_path: Path):
+        cache = ResultCache(tmp_path, max_bytes=10**9)
+        keys = [result_key("reviewer", "system", str(number), None) for number in range(3)]
+        for key in keys:
+            cache.put(key, 0, "x" * 1000)
+        paths = [next(cache.directory.rglob(f"{key}.json")) for key in keys]
+        for age, index in enumerate((1, 0, 2)):
+            os.utime(paths[index], (1000 + age, 1000 + age))
+
+        cache.max_bytes = paths[0].stat().st_size + paths[2].stat().st_size
+        cache.evict()
+
+        assert not paths[1].exists()
+        assert paths[0].exists()
+        assert paths[2].exists()
+
+
+class TestResultMemoization:
+    def test_successful_result_is_replayed(self, fake_claude: FakeClaude):
+        config = AGENT_CONFIGS[AgentType.REVIEW]
+        fake_claude.set_output("Looks good.\n")
+        assert runner.run_claude("Review this", config, output=io.StringIO()) == 0
+        fake_claude.calls_path.unlink()
+
+        output = io.StringIO()
+        assert runner.run_claude("Review this", config, output=output) == 0
+
+        assert output.getvalue() == "Looks good.\n"
+        assert not fake_claude.calls_path.exists()
+
+    def test_changed_prompt_runs_claude(self, fake_claude: FakeClaude):
+        config = AGENT_CONFIGS[AgentType.REVIEW]
+        runner.run_claude("Review this", config, output=io.StringIO())
+        fake_claude.calls_path.unlink()
+
+        runner.run_claude("Review this again", config, output=io.StringIO())
+
+        assert fake_claude.calls_path.exists()
+
+    def test_force_runs_claude(self, fake_claude: FakeClaude):
+        config = AGENT_CONFIGS[AgentType.REVIEW]
+        runner.run_claude("Review this", config, output=io.StringIO())
+        fake_claude.calls_path.unlink()
+
+        runner.run_claude("Review this", runner.with_result_cache(config, force=True), output=io.StringIO())
+
+        assert fake_claude.calls_path.exists()
+
+    @pytest.mark.parametrize("flag", ["--force", "--no-cache"])
+    def test_cli_flags_disable_replay(self, flag: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr("askcc.functions.TEMPLATES_DIR", tmp_path / "templates")
+        args = cli._build_parser().parse_args(["review", flag, "--github-issue-url", ISSUE_URL])
+
+        assert not cli._agent_config(args, AgentType.REVIEW).memoize_results
+
+    def test_develop_is_not_memoized(self, fake_claude: FakeClaude):
+        config = AGENT_CONFIGS[AgentType.DEVELOP]
+        runner.run_claude("Implement this", config, output=io.StringIO())
+        fake_claude.calls_path.unlink()
+
+        runner.run_claude("Implement this", config, output=io.StringIO())
+
+        assert fake_claude.calls_path.exists()
+
+    def test_failed_result_is_not_stored(self, monkeypatch: pytest.MonkeyPatch):
+        calls: list[str] = []
+
+        def failing_process(_cmd: list[str], prompt: str, **_kwargs: object) -> int:
+            calls.append(prompt)
+            return 1
+
+        monkeypatch.setattr(runner, "_run_claude_process", failing_process)
+        config = AGENT_CONFIGS[AgentType.REVIEW]
+
+        assert runner.run_claude("Review this", config, output=io.StringIO()) == 1
+        assert runner.run_claude("Review this", config, output=io.StringIO()) == 1
+
+        assert calls == ["Review this", "Review this"]
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import TYPE_CHECKING, ClassVar
+
+import pytest
+
+from askcc import functions
+from askcc.cache import IssueCache
+from askcc.github import (
+    GhCliClient,
+    GithubAPIError,
+    GithubHttpClient,
+    _gh_status_code,
+    _next_page_url,
+    _parse_gh_include_output,
+    iter_json_documents,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+ISSUE = {
+    "title": "Crash on start",
+    "body": "It crashes.",
+    "labels": [{"name": "bug"}],
+    "updated_at": "2026-01-02T00:00:00Z",
+}
+COMMENT_PAGES = [
+    [{"user": {"login": "alice"}, "body": "Me too", "reactions": {"total_count": 2}}],
+    [{"user": {"login": "bob"}, "body": "Same here"}],
+]
+ETAG = 'W/"issue-42"'
+
+
+class StubGithubHandler(BaseHTTPRequestHandler):
+    """Minimal stand-in for the GitHub REST and GraphQL APIs."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    connections: ClassVar[set[int]] = set()
+    requests: ClassVar[list[str]] = []
+
+    def log_message(self, *_args: object) -> None:
+        pass
+
+    def _send(self, status: int, payload: object = None, headers: dict[str, str] | None = None) -> None:
+        body = b"" if payload is None else json.dumps(payload).encode()
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self) -> None:
+        self.connections.add(self.client_address[1])
+        self.requests.append(self.path)
+        if self.headers.get("Authorization") != "Bearer test-token":
+            self._send(401, {"message": "Bad credentials"})
+        elif self.path == "/repos/monkut/askcc-cli/issues/42":
+            if self.headers.get("If-None-Match") == ETAG:
+                self._send(304, headers={"ETag": ETAG})
+            else:
+                self._send(200, ISSUE, headers={"ETag": ETAG})
+        elif self.path.startswith("/repos/monkut/askcc-cli/issues/42/comments"):
+            page = 2 if "page=2" in self.path else 1
+            headers = {}
+            if page == 1:
+                next_url = (
+                    f"http://{self.headers['Host']}/repos/monkut/askcc-cli/issues/42/comments?per_page=100&page=2"
+                )
+                headers["Link"] = f'<{next_url}>; rel="next"'
+            self._send(200, COMMENT_PAGES[page - 1], headers=headers)
+        else:
+            self._send(404, {"message": "Not Found"})
+
+    def do_POST(self) -> None:
+        self.connections.add(self.client_address[1])
+        self.requests.append(self.path)
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if payload["variables"]["number"] != 42:
+            self._send(200, {"data": None, "errors": [{"message": "Could not resolve to an Issue"}]})
+            return
+        issue = {
+            "title": ISSUE["title"],
+            "body": ISSUE["body"],
+            "updatedAt": ISSUE["updated_at"],
+            "labels": {"nodes": [{"name": "bug"}]},
+            "comments": {
+                "pageInfo": {"hasNextPage": False, "endCursor": None},
+                "nodes": [{"author": {"login": "alice"}, "body": "Me too", "reactions": {"totalCount": 2}}],
+            },
+        }
+        self._send(200, {"data": {"repository": {"issue": issue}}})
+
+
+@pytest.fixture
+def stub_github() -> Iterator[str]:
+    StubGithubHandler.connections = set()
+    StubGithubHandler.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubGithubHandler)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+class TestGithubHttpClient:
+    def test_reuses_connection(self, stub_github: str):
+        client = GithubHttpClient(stub_github, "test-token")
+
+        for _ in range(3):
+            assert client.get("repos/monkut/askcc-cli/issues/42").json()["title"] == "Crash on start"
+
+        assert len(StubGithubHandler.connections) == 1
+        client.close()
+
+    def test_conditional_request_returns_not_modified(self, stub_github: str):
+        client = GithubHttpClient(stub_github, "test-token")
+
+        response = client.get("repos/monkut/askcc-cli/issues/42", headers={"If-None-Match": ETAG})
+
+        assert response.status_code == 304
+        assert response.headers["etag"] == ETAG
+
+    def test_paginate_follows_link_header(self, stub_github: str):
+        client = GithubHttpClient(stub_github, "test-token")
+
+        pages = list(client.paginate("repos/monkut/askcc-cli/issues/42/comments"))
+
+        assert pages == COMMENT_PAGES
+
+    def test_error_status_raises(self, stub_github: str):
+        client = GithubHttpClient(stub_github, "bad-token")
+
+        with pytest.raises(GithubAPIError) as exc_info:
+            client.get("repos/monkut/askcc-cli/issues/42")
+
+        assert exc_info.value.status_code == 401
+
+    def test_graphql_errors_raise(self, stub_github: str):
+        client = GithubHttpClient(stub_github, "test-token")
+
+        with pytest.raises(GithubAPIError, match="Could not resolve"):
+            client.graphql("query", {"number": 1})
+
+
+class TestFetchIssueHttpBackend:
+    @pytest.mark.parametrize("engine", ["graphql", "rest"])
+    def test_fetch_and_revalidate(self, stub_github: str, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, engine: str):
+        client = GithubHttpClient(stub_github, "test-token")
+        monkeypatch.setattr(functions, "get_github_client", lambda: client)
+        monkeypatch.setattr(functions, "GITHUB_FETCH_ENGINE", engine)
+        monkeypatch.setattr(functions, "IssueCache", lambda: IssueCache(tmp_path))
+        url = "https://github.com/monkut/askcc-cli/issues/42"
+
+        first = functions.fetch_github_issue(url)
+        request_count = len(StubGithubHandler.requests)
+        second = functions.fetch_github_issue(url)
+
+        assert first == second
+        assert first.startswith("Issue #42:\nCrash on start\nIt crashes.")
+        assert "Comment by @alice:\nMe too" in first
+        # the second fetch is answered by a single conditional request
+        assert len(StubGithubHandler.requests) == request_count + 1
+        # pooled connections are reused, the REST engine opens one per concurrent request
+        assert len(StubGithubHandler.connections) <= 2
+
+
+class TestHelpers:
+    def test_parse_gh_include_output(self):
+        output = 'HTTP/2.0 304 Not Modified\r\nEtag: W/"abc"\r\nX-Ratelimit-Remaining: 4999\r\n\r\n'
+        status_code, headers, body = _parse_gh_include_output(output)
+        assert status_code == 304
+        assert headers["etag"] == 'W/"abc"'
+        assert headers["x-ratelimit-remaining"] == "4999"
+        assert body == ""
+
+    def test_gh_status_code(self):
+        assert _gh_status_code("gh: API rate limit exceeded for user ID 1. (HTTP 403)") == 403
+        assert _gh_status_code("connection refused") == 0
+
+    def test_next_page_url(self):
+        link = '<https://api.github.com/x?page=2>; rel="next", <https://api.github.com/x?page=5>; rel="last"'
+        assert _next_page_url(link) == "https://api.github.com/x?page=2"
+        assert _next_page_url('<https://api.github.com/x?page=1>; rel="prev"') is None
+
+
+class TestIterJsonDocuments:
+    def test_decodes_concatenated_pages(self):
+        stream = json.dumps(COMMENT_PAGES[0]) + json.dumps(COMMENT_PAGES[1])
+        assert list(iter_json_documents([stream])) == COMMENT_PAGES
+
+    @pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64])
+    def test_documents_split_across_chunks(self, chunk_size: int):
+        pages = [
+            [{"body": 'tricky "quotes" ] and [brackets] {braces}', "user": {"login": "a"}}],
+            [{"body": 'backslash \\ and escaped quote \\"', "user": {"login": "b"}}],
+            [],
+        ]
+        stream = "\n".join(json.dumps(page) for page in pages)
+        chunks = [stream[i : i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+        assert list(iter_json_documents(chunks)) == pages
+
+    def test_yields_each_page_before_reading_the_rest(self):
+        chunks_read = []
+
+        def chunks() -> Iterator[str]:
+            for page in COMMENT_PAGES:
+                chunks_read.append(page)
+                yield json.dumps(page)
+
+        documents = iter_json_documents(chunks())
+
+        assert next(documents) == COMMENT_PAGES[0]
+        assert len(chunks_read) == 1
+
+    def test_truncated_stream_raises(self):
+        with pytest.raises(ValueError, match="Truncated"):
+            list(iter_json_documents(['[{"body": "no end"']))
+
+
+class TestGhCliClientPaginate:
+    def _write_gh(self, tmp_path: Path, script: str) -> str:
+        gh_path = tmp_path / "gh"
+        gh_path.write_text(f"#!{sys.executable}\nimport sys\n{script}")
+        gh_path.chmod(0o755)
+        return str(gh_path)
+
+    def test_yields_each_page(self, tmp_path: Path):
+        stream = json.dumps(COMMENT_PAGES[0]) + json.dumps(COMMENT_PAGES[1])
+        gh = self._write_gh(tmp_path, f"sys.stdout.write({stream!r})")
+
+        assert list(GhCliClient(gh).paginate("repos/monkut/askcc-cli/issues/42/comments")) == COMMENT_PAGES
+
+    def test_failure_raises(self, tmp_path: Path):
+        gh = self._write_gh(tmp_path, "sys.stderr.write('HTTP 502')\nsys.exit(1)")
+
+        with pytest.raises(GithubAPIError, match="HTTP 502"):
+            list(GhCliClient(gh).paginate("repos/monkut/askcc-cli/issues/42/comments"))
+
+    def test_connection_failure_raises_connection_error(self, tmp_path: Path):
+        gh = self._write_gh(tmp_path, "sys.stderr.write('error connecting to api.github.com')\nsys.exit(1)")
+
+        with pytest.raises(ConnectionError, match="error connecting"):
+            list(GhCliClient(gh).paginate("repos/monkut/askcc-cli/issues/42/comments"))
+
+    def test_unauthenticated_is_not_transient(self, tmp_path: Path):
+        gh = self._write_gh(
+            tmp_path, "sys.stderr.write('To get started with GitHub CLI, run: gh auth login')\nsys.exit(4)"
+        )
+
+        with pytest.raises(GithubAPIError) as exc_info:
+            list(GhCliClient(gh).paginate("repos/monkut/askcc-cli/issues/42/comments"))
+        assert not exc_info.value.is_transient
+
+
+class TestGithubAPIError:
+    @pytest.mark.parametrize(
+        ("status_code", "headers", "expected"),
+        [
+            (0, {}, False),
+            (502, {}, True),
+            (429, {}, True),
+            (403, {"x-ratelimit-remaining": "0"}, True),
+            (403, {"retry-after": "60"}, True),
+            (403, {"x-ratelimit-remaining": "4000"}, False),
+            (404, {}, False),
+            (200, {}, False),
+        ],
+    )
+    def test_is_transient(self, status_code: int, headers: dict[str, str], expected: bool):
+        assert GithubAPIError("failed", status_code, headers).is_transient is expected
+
+    @pytest.mark.parametrize(
+        ("status_code", "headers", "expected"),
+        [
+            (429, {}, True),
+            (403, {"x-ratelimit-remaining": "0"}, True),
+            (403, {"retry-after": "60"}, True),
+            (200, {"x-ratelimit-remaining": "0"}, True),
+            (403, {"x-ratelimit-remaining": "4000"}, False),
+            (502, {}, False),
+        ],
+    )
+    def test_is_rate_limited(self, status_code: int, headers: dict[str, str], expected: bool):
+        assert GithubAPIError("failed", status_code, headers).is_rate_limited is expected
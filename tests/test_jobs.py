@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import sqlite3
+from typing import TYPE_CHECKING
+
+import pytest
+
+from askcc import cli, runner
+from askcc.definitions import AGENT_CONFIGS, AgentType, BatchResult, GithubIssue, JobStatus, RepositoryIssue
+from askcc.github import GithubAPIError
+from askcc.jobs import SCHEMA, JobStore
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+URLS = [f"https://github.com/monkut/askcc-cli/issues/{number}" for number in (1, 2, 3)]
+
+
+def _issue_for_url(url: str) -> GithubIssue:
+    return GithubIssue(owner="monkut", repo="askcc-cli", number=int(url.rsplit("/", 1)[1]), title="Title", body="")
+
+
+class TestJobStore:
+    def test_uses_wal_mode(self, tmp_path: Path):
+        with JobStore(tmp_path / "jobs.db"):
+            pass
+
+        with sqlite3.connect(tmp_path / "jobs.db") as connection:
+            assert connection.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+
+    def test_records_job_lifecycle(self, tmp_path: Path):
+        with JobStore(tmp_path / "jobs.db") as store:
+            store.enqueue(URLS[:1], AgentType.REVIEW)
+            assert store.get(URLS[0], AgentType.REVIEW).status == JobStatus.QUEUED
+
+            store.mark_running(URLS[0], AgentType.REVIEW)
+            store.mark_finished(AgentType.REVIEW, BatchResult(URLS[0], exit_code=2, error="failed"))
+            record = store.get(URLS[0], AgentType.REVIEW)
+
+        assert record.status == JobStatus.FINISHED
+        assert record.runs == 1
+        assert record.exit_code == 2
+        assert record.error == "failed"
+        assert record.started_at <= record.finished_at
+
+    def test_renames_the_attempts_column(self, tmp_path: Path):
+        with sqlite3.connect(tmp_path / "jobs.db") as connection:
+            connection.executescript(SCHEMA.replace("runs INTEGER", "attempts INTEGER"))
+            connection.execute(
+                "INSERT INTO jobs (github_issue_url, agent, status, attempts, queued_at) VALUES (?, ?, ?, 3, 0)",
+                (URLS[0], AgentType.REVIEW.value, JobStatus.RUNNING.value),
+            )
+        connection.close()
+
+        with JobStore(tmp_path / "jobs.db") as store:
+            assert store.get(URLS[0], AgentType.REVIEW).runs == 3
+
+    def test_unfinished_jobs_survive_reopening(self, tmp_path: Path):
+        with JobStore(tmp_path / "jobs.db") as store:
+            store.enqueue(URLS, AgentType.PLAN)
+            store.enqueue(URLS[:1], AgentType.REVIEW)
+            store.mark_running(URLS[0], AgentType.PLAN)
+            store.mark_running(URLS[1], AgentType.PLAN)
+            store.mark_finished(AgentType.PLAN, BatchResult(URLS[1], exit_code=0))
+
+        with JobStore(tmp_path / "jobs.db") as store:
+            # URLS[0] was interrupted while running, URLS[2] never started
+            assert store.unfinished(AgentType.PLAN) == [URLS[0], URLS[2]]
+            assert store.unfinished(AgentType.REVIEW) == [URLS[0]]
+
+    def test_failed_jobs(self, tmp_path: Path):
+        with JobStore(tmp_path / "jobs.db") as store:
+            store.enqueue(URLS, AgentType.PLAN)
+            for url, exit_code in zip(URLS[:2], (1, 0), strict=True):
+                store.mark_running(url, AgentType.PLAN)
+                store.mark_finished(AgentType.PLAN, BatchResult(url, exit_code=exit_code))
+
+            assert store.failed(AgentType.PLAN) == [URLS[0]]
+            assert store.failed(AgentType.REVIEW) == []
+
+    def test_enqueue_resets_finished_job(self, tmp_path: Path):
+        with JobStore(tmp_path / "jobs.db") as store:
+            store.enqueue(URLS[:1], AgentType.PLAN)
+            store.mark_running(URLS[0], AgentType.PLAN)
+            store.mark_finished(AgentType.PLAN, BatchResult(URLS[0], exit_code=1))
+
+            store.enqueue(URLS[:1], AgentType.PLAN)
+            record = store.get(URLS[0], AgentType.PLAN)
+
+        assert record.status == JobStatus.QUEUED
+        assert record.runs == 0
+        assert record.exit_code is None
+
+    def test_watermarks_are_kept_per_repository_and_agent(self, tmp_path: Path):
+        with JobStore(tmp_path / "jobs.db") as store:
+            assert store.watermark("monkut/askcc-cli", AgentType.REVIEW) is None
+            store.set_watermark("monkut/askcc-cli", AgentType.REVIEW, "2026-01-01T00:00:00Z")
+            store.set_watermark("monkut/askcc-cli", AgentType.REVIEW, "2026-01-02T00:00:00Z")
+            store.set_watermark("monkut/askcc-cli", AgentType.PLAN, "2026-01-03T00:00:00Z")
+
+        with JobStore(tmp_path / "jobs.db") as store:
+            assert store.watermark("monkut/askcc-cli", AgentType.REVIEW) == "2026-01-02T00:00:00Z"
+            assert store.watermark("monkut/askcc-cli", AgentType.PLAN) == "2026-01-03T00:00:00Z"
+            assert store.watermark("monkut/other", AgentType.REVIEW) is None
+
+
+class TestRunBatchWithJobStore:
+    def test_records_results(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(runner, "fetch_issue", lambda url, _options: _issue_for_url(url))
+        monkeypatch.setattr(runner, "run_claude", lambda prompt, **_kwargs: 3 if "Issue #2:" in prompt else 0)
+
+        with JobStore(tmp_path / "jobs.db") as store:
+            store.enqueue(URLS, AgentType.REVIEW)
+            runner.run_batch(URLS, AGENT_CONFIGS[AgentType.REVIEW], job_store=store, agent=AgentType.REVIEW)
+
+            assert store.unfinished(AgentType.REVIEW) == []
+            assert [store.get(url, AgentType.REVIEW).exit_code for url in URLS] == [0, 3, 0]
+
+
+class TestBatchRetryFailed:
+    def test_reruns_failed_jobs_without_reading_stdin(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr("askcc.jobs.JOBS_DB_PATH", tmp_path / "jobs.db")
+        monkeypatch.setattr(cli.sys, "stdin", None)
+        monkeypatch.setattr(runner, "fetch_issue", lambda url, _options: _issue_for_url(url))
+        monkeypatch.setattr(runner, "run_claude", lambda _prompt, **_kwargs: 0)
+        with JobStore() as store:
+            store.enqueue(URLS[:2], AgentType.REVIEW)
+            for url, exit_code in zip(URLS[:2], (0, 1), strict=True):
+                store.mark_running(url, AgentType.REVIEW)
+                store.mark_finished(AgentType.REVIEW, BatchResult(url, exit_code=exit_code))
+        args = cli._build_parser().parse_args(["batch", "review", "--retry-failed"])
+
+        assert cli._run_batch(args, AgentType.REVIEW, cli._fetch_options(args)) == 0
+
+        with JobStore() as store:
+            record = store.get(URLS[1], AgentType.REVIEW)
+            assert (record.exit_code, record.runs) == (0, 2)
+            assert store.get(URLS[0], AgentType.REVIEW).runs == 1
+            assert store.failed(AgentType.REVIEW) == []
+
+
+class TestRunSweep:
+    REPOSITORY = "monkut/askcc-cli"
+
+    def _listing(self, monkeypatch: pytest.MonkeyPatch, issues: list[RepositoryIssue]) -> list[str | None]:
+        since_values: list[str | None] = []
+
+        def fake_list(repository: str, *, labels: list[str], since: str | None) -> list[RepositoryIssue]:
+            assert repository == self.REPOSITORY
+            assert labels == ["needs-triage"]
+            since_values.append(since)
+            return [issue for issue in issues if since is None or issue.updated_at >= since]
+
+        monkeypatch.setattr(runner, "list_repository_issues", fake_list)
+        monkeypatch.setattr(runner, "fetch_issue", lambda url, _options: _issue_for_url(url))
+        return since_values
+
+    def _sweep(self, store: JobStore) -> list[BatchResult]:
+        return runner.run_sweep(
+            self.REPOSITORY,
+            AGENT_CONFIGS[AgentType.REVIEW],
+            AgentType.REVIEW,
+            store,
+            labels=["needs-triage"],
+            since="auto",
+        )
+
+    def test_only_changed_issues_are_dispatched(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        issues = [
+            RepositoryIssue(URLS[0], 1, "2026-01-01T00:00:00Z"),
+            RepositoryIssue(URLS[1], 2, "2026-01-02T00:00:00Z"),
+        ]
+        since_values = self._listing(monkeypatch, issues)
+        prompts = []
+        monkeypatch.setattr(runner, "run_claude", lambda prompt, **_kwargs: prompts.append(prompt) or 0)
+
+        with JobStore(tmp_path / "jobs.db") as store:
+            first = self._sweep(store)
+            assert store.watermark(self.REPOSITORY, AgentType.REVIEW) == "2026-01-02T00:00:00Z"
+
+            # issue 2 is listed again (since is inclusive) but did not change after its run finished
+            issues.append(RepositoryIssue(URLS[2], 3, "2026-01-03T00:00:00Z"))
+            second = self._sweep(store)
+
+            assert since_values == [None, "2026-01-02T00:00:00Z"]
+            assert [result.github_issue_url for result in first] == URLS[:2]
+            assert [result.github_issue_url for result in second] == URLS[2:]
+            assert store.watermark(self.REPOSITORY, AgentType.REVIEW) == "2026-01-03T00:00:00Z"
+        assert len(prompts) == 3
+
+    def test_failed_issue_holds_back_the_watermark(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        issues = [
+            RepositoryIssue(URLS[0], 1, "2026-01-01T00:00:00Z"),
+            RepositoryIssue(URLS[1], 2, "2026-01-02T00:00:00Z"),
+            RepositoryIssue(URLS[2], 3, "2026-01-03T00:00:00Z"),
+        ]
+        self._listing(monkeypatch, issues)
+        exit_codes = {"Issue #2:": 1}
+        monkeypatch.setattr(
+            runner,
+            "run_claude",
+            lambda prompt, **_kwargs: next((code for marker, code in exit_codes.items() if marker in prompt), 0),
+        )
+
+        with JobStore(tmp_path / "jobs.db") as store:
+            self._sweep(store)
+            assert store.watermark(self.REPOSITORY, AgentType.REVIEW) == "2026-01-02T00:00:00Z"
+
+            exit_codes.clear()
+            retried = self._sweep(store)
+
+            assert [result.github_issue_url for result in retried] == [URLS[1]]
+            assert store.watermark(self.REPOSITORY, AgentType.REVIEW) == "2026-01-03T00:00:00Z"
+
+    @pytest.mark.parametrize("error", [OSError("gh: command not found"), GithubAPIError("server error", 502)])
+    def test_listing_failure_exits_with_an_error(
+        self, error: Exception, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+    ):
+        def failing_list(*_args: object, **_kwargs: object) -> list[RepositoryIssue]:
+            raise error
+
+        monkeypatch.setattr(runner, "list_repository_issues", failing_list)
+        monkeypatch.setattr("askcc.jobs.JOBS_DB_PATH", tmp_path / "jobs.db")
+        monkeypatch.setattr("askcc.functions.TEMPLATES_DIR", tmp_path / "templates")
+        args = cli._build_parser().parse_args(["review", "--repo", self.REPOSITORY])
+
+        assert cli._run_sweep(args, AgentType.REVIEW, cli._fetch_options(args)) == 1
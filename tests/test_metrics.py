@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from askcc import runner
+from askcc.definitions import AGENT_CONFIGS, AgentType, GithubIssue, IssueComment
+from askcc.metrics import configure_metrics, in_current_context, span
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+@pytest.fixture
+def metrics_file(tmp_path: Path) -> Iterator[Path]:
+    path = tmp_path / "metrics" / "spans.jsonl"
+    configure_metrics(path)
+    yield path
+    configure_metrics(None)
+
+
+def _spans(path: Path) -> dict[str, dict]:
+    return {record["name"]: record for record in map(json.loads, path.read_text().splitlines())}
+
+
+def _attributes(record: dict) -> dict[str, dict]:
+    return {attribute["key"]: attribute["value"] for attribute in record["attributes"]}
+
+
+class TestSpan:
+    def test_disabled_spans_are_shared_noops(self):
+        assert span("fetch_issue") is span("render_prompt", comment_count=3)
+
+        start = time.perf_counter()
+        for _ in range(100_000):
+            with span("phase", attempt=1) as phase_span:
+                phase_span.set_attribute("exit_code", 0)
+        assert time.perf_counter() - start < 1.0
+
+    def test_writes_otlp_shaped_spans(self, metrics_file: Path):
+        with span("askcc", command="review") as root_span:
+            with span("render_prompt", comment_count=3, ratio=0.5, trimmed=False) as child_span:
+                child_span.set_attribute("prompt_bytes", 1024)
+            root_span.set_attribute("exit_code", 0)
+
+        spans = _spans(metrics_file)
+        root, child = spans["askcc"], spans["render_prompt"]
+        assert root["traceId"] == child["traceId"]
+        assert len(root["traceId"]) == 32
+        assert root["parentSpanId"] == ""
+        assert child["parentSpanId"] == root["spanId"]
+        assert int(root["startTimeUnixNano"]) <= int(child["startTimeUnixNano"])
+        assert int(child["endTimeUnixNano"]) <= int(root["endTimeUnixNano"])
+        assert _attributes(child) == {
+            "comment_count": {"intValue": "3"},
+            "ratio": {"doubleValue": 0.5},
+            "trimmed": {"boolValue": False},
+            "prompt_bytes": {"intValue": "1024"},
+        }
+        assert child["status"] == {"code": "STATUS_CODE_OK"}
+        resource = {attribute["key"]: attribute["value"] for attribute in root["resource"]["attributes"]}
+        assert resource["service.name"] == {"stringValue": "askcc"}
+
+    def test_exception_marks_span_as_failed(self, metrics_file: Path):
+        with pytest.raises(ValueError, match="bad template"), span("load_agent_config"):
+            raise ValueError("bad template")
+
+        assert _spans(metrics_file)["load_agent_config"]["status"] == {
+            "code": "STATUS_CODE_ERROR",
+            "message": "ValueError: bad template",
+        }
+
+    def test_worker_thread_spans_keep_their_parent(self, metrics_file: Path):
+        def work() -> None:
+            with span("worker"):
+                pass
+
+        with span("batch"):
+            thread = threading.Thread(target=in_current_context(work))
+            thread.start()
+            thread.join()
+
+        spans = _spans(metrics_file)
+        assert spans["worker"]["parentSpanId"] == spans["batch"]["spanId"]
+
+
+class TestRunnerSpans:
+    def test_process_issue_records_phases(self, metrics_file: Path, monkeypatch: pytest.MonkeyPatch):
+        issue = GithubIssue(
+            owner="monkut",
+            repo="askcc-cli",
+            number=1,
+            title="Title",
+            body="Body",
+            comments=(IssueComment(author="alice", body="hello"),),
+        )
+        monkeypatch.setattr(runner, "fetch_issue", lambda _url, _options: issue)
+        monkeypatch.setattr(runner, "_run_claude_process", lambda *_args, **_kwargs: 3)
+
+        runner.process_issue("https://github.com/monkut/askcc-cli/issues/1", AGENT_CONFIGS[AgentType.REVIEW])
+
+        spans = _spans(metrics_file)
+        assert spans["render_prompt"]["parentSpanId"] == spans["agent_run"]["spanId"]
+        assert spans["claude"]["parentSpanId"] == spans["agent_run"]["spanId"]
+        assert _attributes(spans["render_prompt"])["comment_count"] == {"intValue": "1"}
+        claude_attributes = _attributes(spans["claude"])
+        assert claude_attributes["exit_code"] == {"intValue": "3"}
+        assert int(claude_attributes["prompt_bytes"]["intValue"]) == int(
+            _attributes(spans["render_prompt"])["prompt_bytes"]["intValue"]
+        )
+        assert _attributes(spans["agent_run"])["exit_code"] == {"intValue": "3"}
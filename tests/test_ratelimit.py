@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from askcc import github, ratelimit
+from askcc.github import GithubAPIError, GithubResponse, _send_rate_limited
+from askcc.metrics import configure_metrics
+from askcc.ratelimit import RateLimiter
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+
+class FakeClock:
+    """Stands in for the time module of askcc.ratelimit and askcc.github, sleeping advances the clock instantly."""
+
+    def __init__(self) -> None:
+        self.now = 1_000_000.0
+        self.sleeps: list[float] = []
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch: pytest.MonkeyPatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", fake)
+    monkeypatch.setattr(github, "time", fake)
+    return fake
+
+
+def _headers(remaining: int, reset: float, limit: int = 5000) -> dict[str, str]:
+    return {
+        "x-ratelimit-remaining": str(remaining),
+        "x-ratelimit-limit": str(limit),
+        "x-ratelimit-reset": str(int(reset)),
+        "x-ratelimit-resource": "core",
+    }
+
+
+def _state(limiter: RateLimiter) -> dict:
+    return json.loads((limiter.directory / "state.json").read_text())
+
+
+class TestConcurrency:
+    @pytest.mark.parametrize(
+        ("remaining", "expected"),
+        [(5000, 8), (1000, 8), (500, 4), (100, 1), (0, 1)],
+    )
+    def test_shrinks_as_the_budget_runs_low(self, tmp_path: Path, remaining: int, expected: int):
+        limiter = RateLimiter(tmp_path, max_concurrency=8, throttle_below=0.2)
+
+        assert limiter.concurrency({"remaining": remaining, "limit": 5000, "reset": 0}) == expected
+
+    def test_unknown_budget_uses_full_concurrency(self, tmp_path: Path):
+        assert RateLimiter(tmp_path, max_concurrency=8).concurrency(None) == 8
+
+    def test_slots_are_shared_between_threads(self, tmp_path: Path):
+        limiter = RateLimiter(tmp_path, max_concurrency=1)
+        acquired = threading.Event()
+        release = threading.Event()
+
+        def hold_slot() -> None:
+            with limiter.slot("core"):
+                acquired.set()
+                release.wait()
+
+        thread = threading.Thread(target=hold_slot)
+        thread.start()
+        acquired.wait()
+        threading.Timer(0.2, release.set).start()
+        start = time.monotonic()
+        with limiter.slot("core"):
+            waited = time.monotonic() - start
+        thread.join()
+
+        assert waited >= 0.15
+
+    def test_slot_wait_is_bounded(self, tmp_path: Path, clock: FakeClock, monkeypatch: pytest.MonkeyPatch):
+        limiter = RateLimiter(tmp_path, max_concurrency=1, slot_max_wait=1.0)
+        monkeypatch.setattr(limiter, "SLOT_POLL_SECONDS", 0.25)
+
+        with limiter.slot("core"), limiter.slot("core"):  # the first holder never releases its slot
+            pass
+
+        assert sum(clock.sleeps) == 1.0
+
+
+class TestTokenBucket:
+    def test_requests_take_tokens_until_the_next_response(self, tmp_path: Path, clock: FakeClock):
+        limiter = RateLimiter(tmp_path)
+        limiter.record("core", _headers(100, clock.now + 60))
+
+        for _ in range(3):
+            with limiter.slot("core"):
+                pass
+
+        assert _state(limiter)["resources"]["core"]["remaining"] == 97
+
+    def test_budget_only_decreases_within_a_window(self, tmp_path: Path, clock: FakeClock):
+        limiter = RateLimiter(tmp_path)
+        limiter.record("core", _headers(90, clock.now + 60))
+        limiter.record("core", _headers(95, clock.now + 60))
+        assert _state(limiter)["resources"]["core"]["remaining"] == 90
+
+        limiter.record("core", _headers(4999, clock.now + 3600))
+        assert _state(limiter)["resources"]["core"]["remaining"] == 4999
+
+    def test_exhausted_budget_waits_for_the_reset(self, tmp_path: Path, clock: FakeClock):
+        limiter = RateLimiter(tmp_path)
+        limiter.record("core", _headers(0, clock.now + 30))
+
+        with limiter.slot("core"):
+            pass
+
+        assert clock.sleeps == [30.0]
+
+    def test_retry_after_blocks_every_resource(self, tmp_path: Path, clock: FakeClock):
+        limiter = RateLimiter(tmp_path)
+        limiter.record("core", {"retry-after": "10"}, rate_limited=True)
+
+        assert limiter.wait_seconds("graphql") == 10.0
+
+    def test_request_is_sent_when_the_reset_is_past_the_deadline(self, tmp_path: Path, clock: FakeClock):
+        limiter = RateLimiter(tmp_path, max_wait=5)
+        limiter.record("core", _headers(0, clock.now + 30))
+
+        with limiter.slot("core"):
+            pass
+
+        assert clock.sleeps == []
+
+
+class TestSendRateLimited:
+    def test_rate_limited_request_is_retried_after_the_reset(self, tmp_path: Path, clock: FakeClock):
+        limiter = RateLimiter(tmp_path)
+        calls: list[float] = []
+
+        def send() -> GithubResponse:
+            calls.append(clock.now)
+            if len(calls) == 1:
+                raise GithubAPIError("rate limited", 403, _headers(0, clock.now + 20))
+            return GithubResponse(200, _headers(4999, clock.now + 3600), "{}")
+
+        response = _send_rate_limited(limiter, "core", send)
+
+        assert response.status_code == 200
+        assert calls[1] - calls[0] == 20.0
+
+    def test_other_errors_are_raised(self, tmp_path: Path, clock: FakeClock):
+        def send() -> GithubResponse:
+            raise GithubAPIError("not found", 404)
+
+        with pytest.raises(GithubAPIError, match="not found"):
+            _send_rate_limited(RateLimiter(tmp_path), "core", send)
+        assert clock.sleeps == []
+
+    def test_rate_limit_past_max_wait_is_raised(self, tmp_path: Path, clock: FakeClock):
+        def send() -> GithubResponse:
+            raise GithubAPIError("rate limited", 403, _headers(0, clock.now + 3600))
+
+        with pytest.raises(GithubAPIError, match="rate limited"):
+            _send_rate_limited(RateLimiter(tmp_path, max_wait=60), "core", send)
+
+
+@pytest.fixture
+def metrics_file(tmp_path: Path) -> Iterator[Path]:
+    path = tmp_path / "spans.jsonl"
+    configure_metrics(path)
+    yield path
+    configure_metrics(None)
+
+
+def test_state_is_recorded_in_request_spans(tmp_path: Path, metrics_file: Path):
+    limiter = RateLimiter(tmp_path / "ratelimit")
+
+    _send_rate_limited(limiter, "core", lambda: GithubResponse(200, _headers(4000, time.time() + 60), "{}"))
+
+    (record,) = map(json.loads, metrics_file.read_text().splitlines())
+    attributes = {attribute["key"]: attribute["value"] for attribute in record["attributes"]}
+    assert record["name"] == "github.request"
+    assert attributes["resource"] == {"stringValue": "core"}
+    assert attributes["concurrency"] == {"intValue": "8"}
+    assert attributes["remaining"] == {"intValue": "4000"}
+    assert attributes["rate_limited"] == {"boolValue": False}
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import subprocess
+from dataclasses import replace
+from typing import TYPE_CHECKING
+
+import pytest
+
+from askcc import runner
+from askcc.definitions import AGENT_CONFIGS, AgentType, GithubIssue, RelevantFile
+from askcc.repoindex import RepositoryIndex, format_relevant_files, relevant_files_section
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+
+FILES = {
+    "src/billing/invoice.py": (
+        "class InvoiceBuilder:\n    def total(self):\n        return sum(line.amount for line in self.lines)\n\n\n"
+        "def render_invoice(builder):\n    return builder.total()\n"
+    ),
+    "src/billing/tax.py": "TAX_RATE = 0.2\n\n\ndef apply_tax(amount):\n    return amount * (1 + TAX_RATE)\n",
+    "src/users/accounts.py": "def create_account(email):\n    return {'email': email}\n",
+    "src/users/__init__.py": "",
+    "src/billing/__init__.py": "",
+    "src/__init__.py": "",
+    "tests/__init__.py": "",
+    "web/checkout.ts": "export function checkoutTotal(cart) {\n  return cart.items.length;\n}\n",
+    "assets/logo.png": "\x89PNG\r\n\x1a\n\0\0\0",
+}
+
+
+def _git(*args: str, cwd: Path) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()  # noqa: S603, S607
+
+
+def _commit(path: Path, message: str) -> None:
+    _git("add", "--all", ".", cwd=path)
+    _git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "--quiet", "-m", message, cwd=path)
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> Path:
+    path = tmp_path / "repo"
+    for name, content in FILES.items():
+        (path / name).parent.mkdir(parents=True, exist_ok=True)
+        (path / name).write_text(content)
+    _git("init", "--quiet", cwd=path)
+    _commit(path, "init")
+    return path
+
+
+@pytest.fixture
+def index(repository: Path, tmp_path: Path) -> Iterator[RepositoryIndex]:
+    with RepositoryIndex(repository, tmp_path / "index") as repository_index:
+        repository_index.update(repository)
+        yield repository_index
+
+
+def _paths(files: list[RelevantFile]) -> list[str]:
+    return [relevant_file.path for relevant_file in files]
+
+
+class TestUpdate:
+    def test_only_changed_files_are_reindexed(self, repository: Path, tmp_path: Path):
+        with RepositoryIndex(repository, tmp_path / "index") as index:
+            assert index.update(repository) == len(FILES)
+            assert index.update(repository) == 0
+
+            (repository / "src" / "billing" / "tax.py").write_text("def apply_discount(amount):\n    return amount\n")
+            (repository / "src" / "users" / "accounts.py").unlink()
+            _commit(repository, "change")
+
+            assert index.update(repository) == 1
+            assert _paths(index.relevant_files("apply_discount is wrong")) == ["src/billing/tax.py"]
+            assert index.relevant_files("create_account fails") == []
+
+    def test_uncommitted_changes_are_not_indexed(self, repository: Path, index: RepositoryIndex):
+        (repository / "src" / "billing" / "tax.py").write_text("def apply_discount(amount):\n    return amount\n")
+
+        assert index.update(repository) == 0
+
+    def test_index_is_shared_between_instances(self, repository: Path, index: RepositoryIndex, tmp_path: Path):
+        with RepositoryIndex(repository, tmp_path / "index") as other:
+            assert other.update(repository) == 0
+
+
+class TestRelevantFiles:
+    def test_named_symbols(self, index: RepositoryIndex):
+        (relevant_file, *_) = index.relevant_files("The totals from InvoiceBuilder are off by one.")
+
+        assert relevant_file.path == "src/billing/invoice.py"
+        assert relevant_file.symbols == ("InvoiceBuilder",)
+
+    def test_stack_trace_frames(self, index: RepositoryIndex):
+        trace = (
+            "Traceback (most recent call last):\n"
+            '  File "/srv/app/src/billing/tax.py", line 5, in apply_tax\n'
+            "TypeError: can't multiply sequence by non-int of type 'float'\n"
+        )
+
+        (relevant_file, *_) = index.relevant_files(trace)
+
+        assert relevant_file.path == "src/billing/tax.py"
+        assert relevant_file.mentioned
+
+    def test_ambiguous_names_are_ignored(self, index: RepositoryIndex):
+        assert index.relevant_files("The __init__.py files are empty") == []
+
+    def test_shared_identifiers(self, index: RepositoryIndex):
+        files = index.relevant_files("The checkout total ignores the cart items")
+
+        assert _paths(files)[0] == "web/checkout.ts"
+        assert "cart" in files[0].terms
+
+    def test_limit(self, index: RepositoryIndex):
+        assert len(index.relevant_files("invoice.py tax.py accounts.py checkout.ts", limit=2)) == 2
+
+    def test_binary_files_are_not_read(self, index: RepositoryIndex):
+        assert _paths(index.relevant_files("PNG logo")) == []
+
+
+def test_format_relevant_files():
+    section = format_relevant_files(
+        [RelevantFile("src/billing/tax.py", 12.0, mentioned=True, symbols=("apply_tax",), terms=("amount",))]
+    )
+
+    assert section.splitlines()[1] == "- src/billing/tax.py (named in the issue; defines apply_tax; uses amount)"
+    assert format_relevant_files([]) == ""
+
+
+def test_section_outside_a_repository_is_empty(tmp_path: Path):
+    assert relevant_files_section(tmp_path, "apply_tax fails") == ""
+
+
+class TestRenderPrompt:
+    ISSUE = GithubIssue(
+        owner="o", repo="r", number=1, title="apply_tax rounds wrong", body="See src/billing/tax.py", comments=()
+    )
+
+    def test_relevant_files_are_listed(self, repository: Path):
+        prompt = runner.render_prompt(AGENT_CONFIGS[AgentType.PLAN], self.ISSUE, cwd=repository)
+
+        assert "Likely relevant files" in prompt
+        assert "- src/billing/tax.py (named in the issue; defines apply_tax" in prompt
+
+    def test_agents_without_the_index(self, repository: Path):
+        config = replace(AGENT_CONFIGS[AgentType.PLAN], index_repository=False)
+
+        prompt = runner.render_prompt(config, self.ISSUE, cwd=repository)
+
+        assert "Likely relevant files" not in prompt
+        assert "$relevant_files" not in prompt
+
+    def test_disabled(self, repository: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(runner, "REPO_INDEX", False)
+
+        assert "Likely relevant files" not in runner.render_prompt(
+            AGENT_CONFIGS[AgentType.PLAN], self.ISSUE, cwd=repository
+        )
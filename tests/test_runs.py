@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import sys
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from askcc import cli, runner
+from askcc.definitions import AGENT_CONFIGS, AgentType
+from askcc.runs import RunArchive
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    from .conftest import FakeClaude
+
+ISSUE_URL = "https://github.com/owner/repo/issues/1"
+
+
+def _add_run(archive: RunArchive, agent_name: str = "developer", output: bytes = b"done\n", **kwargs: object) -> str:
+    run_log = archive.start(agent_name, **kwargs)
+    run_log.write_stdout(output)
+    run_log.exit_code = 0
+    return archive.finish(run_log).run_id
+
+
+class TestRunArchive:
+    def test_output_is_archived_compressed(self, tmp_path: Path):
+        output = b"the same line of output\n" * 1000
+        with RunArchive(tmp_path) as archive:
+            run_id = _add_run(archive, output=output)
+
+            record = archive.get(run_id)
+            assert record is not None
+            assert record.stdout_bytes == len(output)
+            assert record.log_bytes < len(output) / 10
+            assert b"".join(archive.read_log(run_id)) == output
+            assert list(archive.read_log(run_id, "stderr")) == []
+
+    def test_history_is_newest_first_and_filtered(self, tmp_path: Path):
+        with RunArchive(tmp_path) as archive:
+            first = _add_run(archive, "planner", github_issue_url=ISSUE_URL)
+            second = _add_run(archive, "developer", github_issue_url=ISSUE_URL)
+            _add_run(archive, "developer")
+
+            assert [record.run_id for record in archive.history(github_issue_url=ISSUE_URL)] == [second, first]
+            assert [record.agent_name for record in archive.history(agent_name="planner")] == ["planner"]
+            assert len(archive.history(limit=1)) == 1
+
+    def test_get_by_unique_prefix(self, tmp_path: Path):
+        with RunArchive(tmp_path) as archive:
+            run_id = _add_run(archive)
+            _add_run(archive)
+
+            record = archive.get(run_id[:-2])
+            assert record is not None
+            assert record.run_id == run_id
+            assert archive.get(run_id[:8]) is None  # both runs started today
+            assert archive.get("unknown") is None
+
+    def test_prune_by_size_keeps_the_newest_runs(self, tmp_path: Path):
+        with RunArchive(tmp_path, max_bytes=0) as archive:
+            run_ids = [_add_run(archive, output=str(i).encode() * 100) for i in range(3)]
+            archive.max_bytes = sum(record.log_bytes for record in archive.history()[:2])
+
+            assert archive.prune() == 1
+            assert [record.run_id for record in archive.history()] == run_ids[:0:-1]
+            assert not (archive.logs_directory / f"{run_ids[0]}.stdout.gz").exists()
+
+    def test_prune_by_age(self, tmp_path: Path):
+        with RunArchive(tmp_path, max_age_days=1) as archive:
+            old = _add_run(archive)
+            new = _add_run(archive)
+            archive._connection.execute("UPDATE runs SET started_at = started_at - 2 * 86400 WHERE run_id = ?", (old,))
+
+            assert archive.prune() == 1
+            assert [record.run_id for record in archive.history()] == [new]
+            assert not (archive.logs_directory / f"{old}.stdout.gz").exists()
+
+
+class TestRunClaudeArchive:
+    def test_output_and_exit_code_are_archived(
+        self, fake_claude: FakeClaude, tmp_path: Path, capsys: pytest.CaptureFixture[str]
+    ):
+        fake_claude.set_output("Plan:\n1. fix it\n")
+
+        runner.run_claude("Plan this", AGENT_CONFIGS[AgentType.PLAN], github_issue_url=ISSUE_URL)
+
+        assert capsys.readouterr().out == "Plan:\n1. fix it\n"
+        with RunArchive(tmp_path / "runs") as archive:
+            (record,) = archive.history()
+            assert record.agent_name == AGENT_CONFIGS[AgentType.PLAN].agent_name
+            assert record.github_issue_url == ISSUE_URL
+            assert record.exit_code == 0
+            assert b"".join(archive.read_log(record.run_id)) == b"Plan:\n1. fix it\n"
+
+    def test_stderr_is_archived(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        bin_dir = tmp_path / "bin"
+        bin_dir.mkdir()
+        claude_path = bin_dir / "claude"
+        claude_path.write_text(f"#!{sys.executable}\nimport sys\nsys.stderr.write('auth failed\\n')\nsys.exit(3)\n")
+        claude_path.chmod(0o755)
+        monkeypatch.setenv("PATH", str(bin_dir), prepend=":")
+
+        assert runner.run_claude("Implement this", AGENT_CONFIGS[AgentType.DEVELOP]) == 3
+
+        with RunArchive(tmp_path / "runs") as archive:
+            (record,) = archive.history()
+            assert record.exit_code == 3
+            assert b"".join(archive.read_log(record.run_id, "stderr")) == b"auth failed\n"
+
+    def test_disabled_archive(self, fake_claude: FakeClaude, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr("askcc.runs.RUN_ARCHIVE", False)
+
+        runner.run_claude("Plan this", AGENT_CONFIGS[AgentType.PLAN])
+
+        assert not (tmp_path / "runs").exists()
+
+
+class TestHistoryCommand:
+    def _main(self, monkeypatch: pytest.MonkeyPatch, *args: str) -> int:
+        monkeypatch.setattr(sys, "argv", ["askcc", "history", *args])
+        with pytest.raises(SystemExit) as exit_info:
+            cli.main()
+        return exit_info.value.code
+
+    def test_lists_runs(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]):
+        with RunArchive(tmp_path / "runs") as archive:
+            run_id = _add_run(archive, AGENT_CONFIGS[AgentType.REVIEW].agent_name, github_issue_url=ISSUE_URL)
+            _add_run(archive, AGENT_CONFIGS[AgentType.PLAN].agent_name)
+
+        assert self._main(monkeypatch, "--agent", "review") == 0
+
+        header, *rows = capsys.readouterr().out.splitlines()
+        assert header.startswith("RUN ID")
+        assert len(rows) == 1
+        assert rows[0].startswith(run_id)
+        assert rows[0].endswith(ISSUE_URL)
+        assert time.strftime("%Y-%m-%d") in rows[0]
+
+    def test_prints_the_output_of_a_run(
+        self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        with RunArchive(tmp_path / "runs") as archive:
+            run_id = _add_run(archive, output=b"archived output\n")
+
+        assert self._main(monkeypatch, run_id[:-1]) == 0
+        assert capsys.readouterr().out == "archived output\n"
+
+    def test_unknown_run(self, monkeypatch: pytest.MonkeyPatch):
+        assert self._main(monkeypatch, "unknown") == 1
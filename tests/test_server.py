@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import asdict
+from typing import TYPE_CHECKING
+
+import pytest
+
+from askcc import server
+from askcc.client import DaemonError, job_status, send_message, submit_job
+from askcc.definitions import AgentType, BatchResult, CommentFilter, FetchOptions, JobRequest
+from askcc.server import AskccServer, _job_request_from_dict
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+    from pathlib import Path
+    from typing import TextIO
+
+    from askcc.definitions import AgentConfig
+
+ISSUE_URL = "https://github.com/monkut/askcc-cli/issues/42"
+
+
+class FakeProcessIssue:
+    """Stands in for runner.process_issue, recording calls and the peak number of concurrent runs."""
+
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls: list[tuple[str, AgentConfig, dict]] = []
+        self.running = 0
+        self.peak_running = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, github_issue_url: str, config: AgentConfig, **kwargs: object) -> BatchResult:
+        with self._lock:
+            self.calls.append((github_issue_url, config, kwargs))
+            self.running += 1
+            self.peak_running = max(self.peak_running, self.running)
+        time.sleep(self.delay)
+        with self._lock:
+            self.running -= 1
+        return BatchResult(github_issue_url=github_issue_url, exit_code=3, duration_seconds=self.delay)
+
+
+@pytest.fixture
+def socket_path(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Path:
+    monkeypatch.setattr("askcc.functions.TEMPLATES_DIR", tmp_path / "templates")
+    return tmp_path / "askcc.sock"
+
+
+@contextmanager
+def _start_server(socket_path: Path, jobs: int = 2) -> Iterator[AskccServer]:
+    askcc_server = AskccServer(socket_path, jobs=jobs)
+    thread = threading.Thread(target=askcc_server.serve_forever, kwargs={"poll_interval": 0.01}, daemon=True)
+    thread.start()
+    yield askcc_server
+    askcc_server.shutdown()
+    askcc_server.server_close()
+
+
+@pytest.fixture
+def running_server(socket_path: Path) -> Iterator[AskccServer]:
+    with _start_server(socket_path) as askcc_server:
+        yield askcc_server
+
+
+class TestAskccServer:
+    def test_submit_and_wait(self, running_server: AskccServer, socket_path: Path, monkeypatch: pytest.MonkeyPatch):
+        fake_process_issue = FakeProcessIssue()
+        monkeypatch.setattr(server, "process_issue", fake_process_issue)
+        request = JobRequest(agent=AgentType.REVIEW, github_issue_url=ISSUE_URL, cwd="/srv/repo", max_prompt_tokens=0)
+
+        job = submit_job(socket_path, request, wait=True)
+
+        assert job["status"] == "finished"
+        assert job["result"]["exit_code"] == 3
+        url, config, kwargs = fake_process_issue.calls[0]
+        assert url == ISSUE_URL
+        assert config.agent_name == "reviewer"
+        assert config.max_prompt_tokens is None
+        assert str(kwargs["cwd"]) == "/srv/repo"
+        assert job_status(socket_path, job["job_id"]) == job
+
+    def test_wait_receives_the_output(
+        self,
+        running_server: AskccServer,
+        socket_path: Path,
+        monkeypatch: pytest.MonkeyPatch,
+        capsys: pytest.CaptureFixture[str],
+    ):
+        text = "Looks good.\n" + "x" * (server.MAX_OUTPUT_MESSAGE_CHARS + 1)
+
+        def process_issue(github_issue_url: str, _config: AgentConfig, **kwargs: TextIO) -> BatchResult:
+            kwargs["output"].write(text)
+            return BatchResult(github_issue_url=github_issue_url, exit_code=0)
+
+        monkeypatch.setattr(server, "process_issue", process_issue)
+        request = JobRequest(agent=AgentType.REVIEW, github_issue_url=ISSUE_URL)
+        chunks: list[str] = []
+
+        job = submit_job(socket_path, request, wait=True, on_output=chunks.append)
+
+        assert job["result"]["exit_code"] == 0
+        assert len(chunks) == 2
+        assert "".join(chunks) == text
+        assert capsys.readouterr().out == text  # still written to the daemon's stdout
+
+    def test_concurrency_is_capped(self, socket_path: Path, monkeypatch: pytest.MonkeyPatch):
+        fake_process_issue = FakeProcessIssue(delay=0.05)
+        monkeypatch.setattr(server, "process_issue", fake_process_issue)
+        request = JobRequest(agent=AgentType.PLAN, github_issue_url=ISSUE_URL)
+
+        with _start_server(socket_path, jobs=2):
+            job_ids = [submit_job(socket_path, request)["job_id"] for _ in range(5)]
+            for job_id in job_ids:
+                send_message(socket_path, {"action": "wait", "job_id": job_id})
+
+        assert len(fake_process_issue.calls) == 5
+        assert fake_process_issue.peak_running == 2
+
+    def test_unknown_job_is_an_error(self, running_server: AskccServer, socket_path: Path):
+        with pytest.raises(DaemonError, match="unknown job"):
+            job_status(socket_path, "missing")
+
+    def test_invalid_request_is_an_error(self, running_server: AskccServer, socket_path: Path):
+        with pytest.raises(DaemonError, match="'nonsense' is not a valid AgentType"):
+            send_message(socket_path, {"action": "submit", "request": {"agent": "nonsense", "github_issue_url": ""}})
+
+    def test_socket_is_private(self, running_server: AskccServer, socket_path: Path):
+        assert socket_path.stat().st_mode & 0o777 == 0o600
+
+    def test_socket_is_created_private(self, socket_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(server.Path, "chmod", lambda *_args: pytest.fail("socket must not be chmod-ed after bind"))
+        previous_umask = os.umask(0)
+        try:
+            with _start_server(socket_path):
+                assert socket_path.stat().st_mode & 0o777 == 0o600
+                assert os.umask(0) == 0  # restored once the socket is bound
+        finally:
+            os.umask(previous_umask)
+
+    def test_refuses_to_replace_live_daemon(self, running_server: AskccServer, socket_path: Path):
+        with pytest.raises(OSError, match="already running"):
+            AskccServer(socket_path)
+
+    def test_replaces_stale_socket(self, socket_path: Path):
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(str(socket_path))
+        stale.close()
+
+        with _start_server(socket_path), pytest.raises(DaemonError, match="unknown job"):
+            job_status(socket_path, "missing")
+
+        assert not socket_path.exists()
+
+
+class TestClient:
+    def test_daemon_not_running(self, socket_path: Path):
+        with pytest.raises(DaemonError, match="not running"):
+            job_status(socket_path, "abc")
+
+    def test_request_round_trip(self):
+        request = JobRequest(
+            agent=AgentType.DIAGNOSE,
+            github_issue_url=ISSUE_URL,
+            fetch_options=FetchOptions(use_cache=False, comment_filter=CommentFilter(skip_bots=True)),
+            stream=True,
+        )
+
+        assert _job_request_from_dict(asdict(request)) == request
@@ -0,0 +1,37 @@
+from __future__ import annotations
+
+import statistics
+import subprocess
+import sys
+import time
+
+# modules that are only needed once a command actually runs
+HEAVY_MODULES = ("asyncio", "importlib.metadata", "json", "ssl", "subprocess")
+MAX_STARTUP_OVERHEAD_SECONDS = 0.5
+RUNS = 5
+
+
+def _python(*args: str) -> subprocess.CompletedProcess[str]:
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, check=True)  # noqa: S603
+
+
+def _median_runtime(*args: str) -> float:
+    durations = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        _python(*args)
+        durations.append(time.perf_counter() - start)
+    return statistics.median(durations)
+
+
+class TestStartup:
+    def test_cli_import_is_lazy(self):
+        script = f"import sys, askcc.cli; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+
+        assert _python("-c", script).stdout.split() == []
+
+    def test_version_cold_start(self):
+        interpreter = _median_runtime("-c", "pass")
+        version = _median_runtime("-c", "import sys; sys.argv[1:] = ['--version']; from askcc.cli import main; main()")
+
+        assert version - interpreter < MAX_STARTUP_OVERHEAD_SECONDS
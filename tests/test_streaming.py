@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import io
+import json
+from typing import TYPE_CHECKING
+
+from askcc import runner
+from askcc.definitions import AGENT_CONFIGS, AgentType
+from askcc.streaming import consume_stream
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    import pytest
+
+    from tests.conftest import FakeClaude
+
+EVENTS = [
+    {"type": "system", "subtype": "init", "session_id": "abc"},
+    {
+        "type": "assistant",
+        "message": {
+            "content": [
+                {"type": "text", "text": "Looking at the code."},
+                {"type": "tool_use", "name": "Read", "input": {"file_path": "askcc/cli.py"}},
+            ]
+        },
+    },
+    {"type": "user", "message": {"content": [{"type": "tool_result", "content": "..."}]}},
+    {"type": "assistant", "message": {"content": [{"type": "tool_use", "name": "Read", "input": {}}]}},
+    {"type": "assistant", "message": {"content": [{"type": "text", "text": "Done."}]}},
+    {
+        "type": "result",
+        "subtype": "success",
+        "usage": {"input_tokens": 10, "output_tokens": 20, "cache_read_input_tokens": 5},
+        "total_cost_usd": 0.01,
+        "num_turns": 3,
+    },
+]
+
+
+class TestConsumeStream:
+    def test_renders_text_and_collects_stats(self):
+        out = io.StringIO()
+        lines = [json.dumps(event) + "\n" for event in EVENTS]
+
+        stats = consume_stream(lines, out)
+
+        assert out.getvalue() == "Looking at the code.\n[tool] Read\n[tool] Read\nDone.\n"
+        assert stats.event_count == len(EVENTS)
+        assert stats.tool_calls == {"Read": 2}
+        assert stats.usage["input_tokens"] == 10
+        assert stats.usage["output_tokens"] == 20
+        assert stats.usage["cache_creation_input_tokens"] == 0
+        assert stats.num_turns == 3
+        assert stats.time_to_first_event is not None
+
+    def test_non_json_lines_are_passed_through(self):
+        out = io.StringIO()
+
+        stats = consume_stream(["not json\n", "\n"], out)
+
+        assert out.getvalue() == "not json\n"
+        assert stats.event_count == 0
+
+    def test_renders_each_event_before_reading_the_next(self):
+        out = io.StringIO()
+        rendered_before_next_line = []
+
+        def lines() -> Iterator[str]:
+            for event in EVENTS:
+                rendered_before_next_line.append(out.getvalue())
+                yield json.dumps(event)
+
+        consume_stream(lines(), out)
+
+        # the text of the 2nd event is already on screen when the 3rd event is read
+        assert rendered_before_next_line[2] == "Looking at the code.\n[tool] Read\n"
+
+
+class TestRunClaudeStreaming:
+    def test_stream_mode_parses_events(self, fake_claude: FakeClaude, capsys: pytest.CaptureFixture[str]):
+        fake_claude.set_output("".join(json.dumps(event) + "\n" for event in EVENTS))
+
+        return_code = runner.run_claude("Plan this", AGENT_CONFIGS[AgentType.PLAN], stream=True)
+
+        assert return_code == 0
+        assert fake_claude.args[fake_claude.args.index("--output-format") + 1] == "stream-json"
+        assert "--verbose" in fake_claude.args
+        assert "Looking at the code." in capsys.readouterr().out
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import os
+import resource
+import subprocess
+import sys
+import time
+from typing import TYPE_CHECKING
+
+import pytest
+
+from askcc import runner, supervisor
+from askcc.definitions import AGENT_CONFIGS, AgentType
+from askcc.supervisor import EXIT_STALLED, EXIT_TIMEOUT, Watchdog, apply_resource_limits, wait_for_admission
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+
+@pytest.fixture(autouse=True)
+def fast_watchdog(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(Watchdog, "POLL_SECONDS", 0.05)
+
+
+def _spawn(script: str, **kwargs: object) -> subprocess.Popen:
+    return subprocess.Popen(  # noqa: S603
+        [sys.executable, "-c", script], start_new_session=True, text=True, **kwargs
+    )
+
+
+def _wait_until_gone(pid: int, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestWatchdog:
+    def test_timeout(self):
+        with _spawn("import time; time.sleep(30)") as process, Watchdog(process, timeout=0.3) as watchdog:
+            process.wait()
+
+        assert watchdog.exit_code() == EXIT_TIMEOUT
+
+    def test_escalates_to_sigkill_for_the_whole_group(self, tmp_path: Path):
+        pid_path = tmp_path / "grandchild.pid"
+        script = (
+            "import signal, subprocess, sys, time\n"
+            "signal.signal(signal.SIGTERM, signal.SIG_IGN)\n"
+            "child = subprocess.Popen([sys.executable, '-c', 'import signal, time; "
+            "signal.signal(signal.SIGTERM, signal.SIG_IGN); time.sleep(30)'])\n"
+            f"open({str(pid_path)!r}, 'w').write(str(child.pid))\n"
+            "time.sleep(30)\n"
+        )
+        start = time.monotonic()
+        with _spawn(script) as process:
+            while not pid_path.exists() or not pid_path.read_text():
+                time.sleep(0.05)
+            with Watchdog(process, timeout=0.2, kill_grace=0.3) as watchdog:
+                process.wait()
+
+        assert watchdog.exit_code() == EXIT_TIMEOUT
+        assert time.monotonic() - start < 10
+        assert _wait_until_gone(int(pid_path.read_text()))
+
+    def test_stall(self):
+        script = "import time; print('started', flush=True); time.sleep(30)"
+        with _spawn(script, stdout=subprocess.PIPE) as process, Watchdog(process, stall_timeout=0.3) as watchdog:
+            assert process.stdout is not None
+            lines = list(watchdog.observe(process.stdout))
+
+        assert lines == ["started\n"]
+        assert watchdog.exit_code() == EXIT_STALLED
+
+    def test_steady_output_is_not_a_stall(self):
+        script = "import time\nfor i in range(8):\n    print(i, flush=True)\n    time.sleep(0.1)\n"
+        with _spawn(script, stdout=subprocess.PIPE) as process, Watchdog(process, stall_timeout=0.5) as watchdog:
+            assert process.stdout is not None
+            lines = list(watchdog.observe(process.stdout))
+
+        assert len(lines) == 8
+        assert watchdog.exit_code() == 0
+
+    def test_interrupt_stops_the_process(self):
+        with pytest.raises(KeyboardInterrupt), _spawn("import time; time.sleep(30)") as process, Watchdog(process):
+            raise KeyboardInterrupt
+
+        assert process.poll() is not None
+
+
+class TestAdmission:
+    def test_waits_while_the_host_is_saturated(self, monkeypatch: pytest.MonkeyPatch):
+        loads = iter([64.0, 64.0, 0.0])
+        sleeps: list[float] = []
+        monkeypatch.setattr(supervisor, "ADMISSION_MAX_LOAD", 1.0)
+        monkeypatch.setattr(supervisor.os, "cpu_count", lambda: 4)
+        monkeypatch.setattr(supervisor.os, "getloadavg", lambda: (next(loads), 0.0, 0.0))
+        monkeypatch.setattr(supervisor.time, "sleep", sleeps.append)
+
+        wait_for_admission()
+
+        assert len(sleeps) == 2
+
+    def test_gives_up_after_max_wait(self, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(supervisor, "ADMISSION_MAX_LOAD", 1.0)
+        monkeypatch.setattr(supervisor, "ADMISSION_MAX_WAIT", 0.0)
+        monkeypatch.setattr(supervisor.os, "getloadavg", lambda: (1000.0, 0.0, 0.0))
+
+        assert wait_for_admission() < 1
+
+
+@pytest.mark.skipif(not hasattr(resource, "prlimit"), reason="prlimit is Linux only")
+def test_resource_limits(monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(supervisor, "CLAUDE_MAX_CPU_SECONDS", 100)
+    monkeypatch.setattr(supervisor, "CLAUDE_MAX_MEMORY_MB", 4096)
+    with _spawn("import time; time.sleep(30)") as process:
+        apply_resource_limits(process.pid)
+        try:
+            assert resource.prlimit(process.pid, resource.RLIMIT_CPU) == (100, 105)
+            assert resource.prlimit(process.pid, resource.RLIMIT_AS) == (4096 * 1024 * 1024,) * 2
+        finally:
+            process.kill()
+
+
+def test_run_claude_reports_timeout(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    claude_path = bin_dir / "claude"
+    claude_path.write_text(f"#!{sys.executable}\nimport time\ntime.sleep(30)\n")
+    claude_path.chmod(0o755)
+    monkeypatch.setenv("PATH", str(bin_dir), prepend=":")
+    monkeypatch.setattr(runner, "CLAUDE_TIMEOUT", 0.3)
+    config = AGENT_CONFIGS[AgentType.DEVELOP]
+
+    assert runner.run_claude("Implement this", config) == EXIT_TIMEOUT
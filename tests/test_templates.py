@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING
+
+from askcc.definitions import AgentType
+from askcc.functions import bootstrap_templates, validate_agent_templates
+from askcc.templates import TemplateRegistry, compile_template
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+    import pytest
+
+
+class TestCompileTemplate:
+    def test_collects_identifiers(self):
+        compiled = compile_template("Do $task for ${issue_content}, costs $$5")
+
+        assert compiled.identifiers == {"task", "issue_content"}
+        assert compiled.missing_variables(("issue_content", "repo")) == ("repo",)
+
+    def test_same_text_is_compiled_once(self):
+        assert compile_template("Hello $name") is compile_template("Hello $name")
+
+
+class TestTemplateRegistry:
+    def test_unchanged_file_is_not_reread(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        path = tmp_path / "PLAN_USER_PROMPT.md"
+        path.write_text("Plan $issue_content")
+        registry = TemplateRegistry()
+        first = registry.get(path, "default")
+
+        monkeypatch.setattr("pathlib.Path.read_text", lambda *_args: "unexpected read")
+
+        assert registry.get(path, "default") is first
+
+    def test_modified_file_is_reloaded(self, tmp_path: Path):
+        path = tmp_path / "PLAN_USER_PROMPT.md"
+        path.write_text("Plan $issue_content")
+        registry = TemplateRegistry()
+        registry.get(path, "default")
+
+        path.write_text("Plan carefully $issue_content")
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+        assert registry.get(path, "default").text == "Plan carefully $issue_content"
+
+    def test_missing_file_uses_default(self, tmp_path: Path):
+        compiled = TemplateRegistry().get(tmp_path / "missing.md", "Default $issue_content")
+
+        assert compiled.text == "Default $issue_content"
+
+
+class TestValidateAgentTemplates:
+    def test_reports_every_broken_agent(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        templates_dir = tmp_path / "templates"
+        monkeypatch.setattr("askcc.functions.TEMPLATES_DIR", templates_dir)
+        bootstrap_templates()
+        (templates_dir / "PLAN_USER_PROMPT.md").write_text("No variable here")
+        (templates_dir / "REVIEW_USER_PROMPT.md").write_text("Nor here")
+
+        errors = validate_agent_templates()
+
+        assert set(errors) == {AgentType.PLAN, AgentType.REVIEW}
+        assert "missing required variable '$issue_content'" in errors[AgentType.PLAN]
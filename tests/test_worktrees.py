@@ -0,0 +1,298 @@
+from __future__ import annotations
+
+import subprocess
+import threading
+from typing import TYPE_CHECKING
+
+import pytest
+
+from askcc import runner, worktrees
+from askcc.definitions import AGENT_CONFIGS, AgentType, GithubIssue
+from askcc.worktrees import WorktreeError, WorktreePool, get_pool, repository_root, temporary_worktree
+
+if TYPE_CHECKING:
+    from pathlib import Path
+
+ISSUE_URL = "https://github.com/monkut/askcc-cli/issues/7"
+
+
+def _git(*args: str, cwd: Path) -> str:
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True).stdout.strip()  # noqa: S603, S607
+
+
+@pytest.fixture
+def repository(tmp_path: Path) -> Path:
+    path = tmp_path / "repo"
+    (path / "src").mkdir(parents=True)
+    (path / "src" / "app.py").write_text("print('hello')\n")
+    _git("init", "--quiet", cwd=path)
+    _git("add", ".", cwd=path)
+    _git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "--quiet", "-m", "init", cwd=path)
+    return path
+
+
+def _commit(path: Path, message: str) -> None:
+    _git("add", ".", cwd=path)
+    _git("-c", "user.name=test", "-c", "user.email=test@example.com", "commit", "--quiet", "-m", message, cwd=path)
+
+
+@pytest.fixture
+def clone(tmp_path: Path) -> Path:
+    """A clone of a bare 'origin' repository with a main branch, an ignored directory and one commit."""
+    origin = tmp_path / "origin.git"
+    _git("init", "--quiet", "--bare", "--initial-branch=main", str(origin), cwd=tmp_path)
+    path = tmp_path / "clone"
+    _git("clone", "--quiet", str(origin), str(path), cwd=tmp_path)
+    _git("checkout", "--quiet", "-b", "main", cwd=path)
+    (path / ".gitignore").write_text(".venv/\n")
+    (path / "app.py").write_text("version = 1\n")
+    _commit(path, "init")
+    _git("push", "--quiet", "origin", "main", cwd=path)
+    return path
+
+
+def _worktrees(repository: Path) -> list[str]:
+    return [
+        line
+        for line in _git("worktree", "list", "--porcelain", cwd=repository).splitlines()
+        if line.startswith("worktree ")
+    ]
+
+
+class TestTemporaryWorktree:
+    def test_checks_out_head_and_removes_clean_worktree(self, repository: Path):
+        with temporary_worktree(repository / "src", name="explore") as worktree:
+            assert worktree.name == "src"
+            assert (worktree / "app.py").read_text() == "print('hello')\n"
+            assert worktree.parent != repository
+            assert len(_worktrees(repository)) == 2
+
+        assert not worktree.parent.exists()
+        assert len(_worktrees(repository)) == 1
+
+    def test_keeps_worktree_with_changes(self, repository: Path):
+        with temporary_worktree(repository, name="develop") as worktree:
+            (worktree / "src" / "app.py").write_text("print('changed')\n")
+
+        assert worktree.exists()
+        assert len(_worktrees(repository)) == 2
+        assert (repository / "src" / "app.py").read_text() == "print('hello')\n"
+        _git("worktree", "remove", "--force", str(worktree), cwd=repository)
+
+    def test_concurrent_worktrees_of_one_repository(self, repository: Path):
+        count = 8
+        barrier = threading.Barrier(count, timeout=10)
+        errors: list[Exception] = []
+
+        def use_worktree() -> None:
+            try:
+                barrier.wait()
+                with temporary_worktree(repository, name="concurrent") as worktree:
+                    assert (worktree / "src" / "app.py").exists()
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+
+        threads = [threading.Thread(target=use_worktree) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert len(_worktrees(repository)) == 1
+
+    def test_broken_worktree_keeps_the_original_exception(self, repository: Path):
+        worktrees_used: list[Path] = []
+
+        def break_worktree_and_fail() -> None:
+            with temporary_worktree(repository) as worktree:
+                worktrees_used.append(worktree)
+                (worktree / ".git").unlink()  # git no longer sees a repository there
+                msg = "agent failed"
+                raise RuntimeError(msg)
+
+        with pytest.raises(RuntimeError, match="agent failed"):
+            break_worktree_and_fail()
+
+        assert worktrees_used[0].exists()
+        _git("worktree", "prune", cwd=repository)
+
+    def test_not_a_repository(self, tmp_path: Path):
+        with pytest.raises(WorktreeError), temporary_worktree(tmp_path):
+            pass
+
+        with pytest.raises(WorktreeError):
+            repository_root(tmp_path / "missing")
+
+
+class TestRunFanOut:
+    AGENTS = (AgentType.EXPLORE, AgentType.DIAGNOSE, AgentType.PLAN)
+
+    def test_runs_agents_concurrently_in_separate_worktrees(
+        self, repository: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+    ):
+        fetched = []
+        cwds = []
+        # every agent must be running at the same time for the barrier to release
+        barrier = threading.Barrier(len(self.AGENTS), timeout=5)
+
+        def fake_fetch(url: str, _options: object) -> GithubIssue:
+            fetched.append(url)
+            return GithubIssue(owner="monkut", repo="askcc-cli", number=7, title="Outage", body="")
+
+        def fake_run_claude(_prompt: str, *, config: object, cwd: Path, output: object, **_kwargs: object) -> int:
+            cwds.append(cwd)
+            barrier.wait()
+            output.write(f"{config.agent_name} report\n")
+            return 2 if config.agent_name == "diagnostician" else 0
+
+        monkeypatch.setattr(runner, "fetch_issue", fake_fetch)
+        monkeypatch.setattr(runner, "run_claude", fake_run_claude)
+
+        results = runner.run_fan_out(ISSUE_URL, [AGENT_CONFIGS[agent] for agent in self.AGENTS], cwd=repository)
+
+        assert fetched == [ISSUE_URL]
+        assert len(set(cwds)) == len(self.AGENTS)
+        assert repository not in cwds
+        names = [AGENT_CONFIGS[agent].agent_name for agent in self.AGENTS]
+        assert [(result.agent_name, result.exit_code) for result in results] == [
+            (name, 2 if name == "diagnostician" else 0) for name in names
+        ]
+        assert all(result.output == f"{result.agent_name} report\n" for result in results)
+        report = capsys.readouterr().out
+        assert all(f"===== {name} (exit" in report for name in names)
+        assert all(not cwd.exists() for cwd in cwds)
+
+    def test_requires_git_repository(self, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(runner, "fetch_issue", pytest.fail)
+
+        with pytest.raises(WorktreeError):
+            runner.run_fan_out(ISSUE_URL, [AGENT_CONFIGS[AgentType.EXPLORE]], cwd=tmp_path)
+
+
+class TestWorktreePool:
+    def test_leases_distinct_worktrees_at_base_ref(self, clone: Path, tmp_path: Path):
+        pool = WorktreePool(clone, size=2, directory=tmp_path / "worktrees")
+
+        with pool.lease() as first, pool.lease() as second:
+            assert first != second
+            assert first.parent == second.parent == pool.directory
+            assert (first / "app.py").read_text() == "version = 1\n"
+            assert _git("rev-parse", "HEAD", cwd=first) == _git("rev-parse", "origin/main", cwd=clone)
+
+    def test_waits_for_a_free_worktree(self, clone: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(WorktreePool, "LEASE_POLL_SECONDS", 0.01)
+        pool = WorktreePool(clone, size=1, directory=tmp_path / "worktrees")
+        leased = threading.Event()
+
+        def lease_second() -> None:
+            with pool.lease():
+                leased.set()
+
+        with pool.lease():
+            waiter = threading.Thread(target=lease_second)
+            waiter.start()
+            assert not leased.wait(timeout=0.2)
+        assert leased.wait(timeout=5)
+        waiter.join()
+
+    def test_recycles_worktree_keeping_ignored_files(self, clone: Path, tmp_path: Path):
+        pool = WorktreePool(clone, size=1, directory=tmp_path / "worktrees")
+        with pool.lease() as worktree:
+            (worktree / ".venv").mkdir()
+            (worktree / ".venv" / "marker").write_text("warm")
+            (worktree / "app.py").write_text("version = 2\n")
+            (worktree / "notes.txt").write_text("draft")
+
+        with pool.lease() as worktree:
+            assert (worktree / "app.py").read_text() == "version = 1\n"
+            assert not (worktree / "notes.txt").exists()
+            assert (worktree / ".venv" / "marker").read_text() == "warm"
+        assert "askcc: left in worktree" in _git("stash", "list", cwd=clone)
+
+    def test_commits_on_the_detached_head_are_saved_as_a_branch(self, clone: Path, tmp_path: Path):
+        pool = WorktreePool(clone, size=1, directory=tmp_path / "worktrees")
+        with pool.lease() as worktree:
+            (worktree / "app.py").write_text("version = 2\n")
+            _commit(worktree, "fix")
+            commit = _git("rev-parse", "HEAD", cwd=worktree)
+
+        with pool.lease() as worktree:
+            assert (worktree / "app.py").read_text() == "version = 1\n"
+        (branch,) = _git("branch", "--list", "askcc/*", "--format=%(refname:short)", cwd=clone).splitlines()
+        assert branch.startswith("askcc/0-")
+        assert _git("rev-parse", branch, cwd=clone) == commit
+
+    def test_commits_on_a_branch_are_not_saved_again(self, clone: Path, tmp_path: Path):
+        pool = WorktreePool(clone, size=1, directory=tmp_path / "worktrees")
+        with pool.lease() as worktree:
+            _git("checkout", "--quiet", "-b", "feature", cwd=worktree)
+            (worktree / "app.py").write_text("version = 2\n")
+            _commit(worktree, "fix")
+
+        with pool.lease():
+            pass
+        assert _git("branch", "--list", "askcc/*", cwd=clone) == ""
+        assert _git("show", "feature:app.py", cwd=clone) == "version = 2"
+
+    def test_concurrent_leases_create_worktrees(self, clone: Path, tmp_path: Path):
+        pool = WorktreePool(clone, size=6, directory=tmp_path / "worktrees")
+        barrier = threading.Barrier(pool.size, timeout=10)
+        errors: list[Exception] = []
+
+        def lease() -> None:
+            try:
+                barrier.wait()
+                with pool.lease() as worktree:
+                    assert (worktree / "app.py").exists()
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+
+        threads = [threading.Thread(target=lease) for _ in range(pool.size)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+
+    def test_refresh_resets_idle_worktrees_to_new_base(self, clone: Path, tmp_path: Path):
+        pool = WorktreePool(clone, size=2, directory=tmp_path / "worktrees")
+        pool.refresh()
+        assert sorted(path.name for path in pool.directory.iterdir() if path.is_dir()) == ["0", "1"]
+
+        (clone / "app.py").write_text("version = 2\n")
+        _commit(clone, "bump")
+        _git("push", "--quiet", "origin", "main", cwd=clone)
+        _git("update-ref", "-d", "refs/remotes/origin/main", cwd=clone)  # only a fetch brings it back
+        pool.refresh()
+
+        assert all((pool.directory / name / "app.py").read_text() == "version = 2\n" for name in ("0", "1"))
+
+    def test_pool_is_shared_by_linked_worktrees(self, clone: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(worktrees, "_POOLS", {})
+        monkeypatch.setattr(worktrees, "WORKTREES_DIR", tmp_path / "worktrees")
+        with temporary_worktree(clone) as linked:
+            assert get_pool(linked) is get_pool(clone)
+
+
+class TestDevelopUsesWorktreePool:
+    def test_develop_runs_in_leased_worktree(self, clone: Path, tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+        monkeypatch.setattr(worktrees, "_POOLS", {})
+        monkeypatch.setattr(worktrees, "WORKTREES_DIR", tmp_path / "worktrees")
+        monkeypatch.setattr(runner, "WORKTREE_POOL_SIZE", 2)
+        monkeypatch.setattr(
+            runner, "fetch_issue", lambda _url, _options: GithubIssue(owner="o", repo="r", number=1, title="T", body="")
+        )
+        cwds = {}
+        monkeypatch.setattr(
+            runner,
+            "run_claude",
+            lambda _prompt, *, config, cwd, **_kwargs: cwds.setdefault(config.agent_name, cwd) and 0,
+        )
+
+        runner.process_issue(ISSUE_URL, AGENT_CONFIGS[AgentType.DEVELOP], cwd=clone)
+        runner.process_issue(ISSUE_URL, AGENT_CONFIGS[AgentType.REVIEW], cwd=clone)
+
+        assert cwds["developer"].parent.parent == tmp_path / "worktrees"
+        assert cwds["reviewer"] == clone